@@ -3,37 +3,51 @@ import pandas as pd
 import os
 
 from insights.journey_builder import (
-    build_user_journey,
+    build_journey,
     format_journey_for_display,
     get_journey_dataframe,
-    build_mermaid_flowchart,
-    split_into_sessions
+    build_mermaid_flowchart
 )
 from insights.payload_builder import build_ai_payload
 from insights.journey_interpreter import interpret_journey_safe
 from insights.insights_generator import generate_insights_safe, generate_insights_stream
 from insights.components.session_renderer import render_session_cards
 from insights.components.ai_session_renderer import render_ai_session_cards
+from pipelines.app_data import load_table, load_user_index
+from pipelines.dedup import DERIVED_COLUMNS, add_derived_columns
+from pipelines.storage import find_table
+from pipelines.user_summary import SESSIONS_TABLE, USER_SUMMARY_TABLE, read_event_counts, summarize_users
 
 BASE_DIR = "pipeline_deduplication"
-CLEANED_EVENTS_FILE = os.path.join(BASE_DIR, "cleaned_events.csv")
-REPETITION_SUMMARY_FILE = os.path.join(BASE_DIR, "repetition_summary.csv")
-UNIQUE_USERS_FILE = os.path.join(BASE_DIR, "unique_users_list.csv")
-
-for f in [CLEANED_EVENTS_FILE, REPETITION_SUMMARY_FILE, UNIQUE_USERS_FILE]:
-    if not os.path.exists(f):
-        st.error(f"Missing required file: {f}")
+CLEANED_EVENTS_TABLE = "cleaned_events"
+REPETITION_SUMMARY_TABLE = "repetition_summary"
+UNIQUE_USERS_TABLE = "unique_users_list"
+AI_PAYLOAD_FORMAT = "compact"
+
+for t in [CLEANED_EVENTS_TABLE, REPETITION_SUMMARY_TABLE, UNIQUE_USERS_TABLE]:
+    if find_table(BASE_DIR, t) is None:
+        st.error(f"Missing required file: {os.path.join(BASE_DIR, t)}.csv")
         st.stop()
 
-df = pd.read_csv(CLEANED_EVENTS_FILE)
-rep_df = pd.read_csv(REPETITION_SUMMARY_FILE)
-users_df = pd.read_csv(UNIQUE_USERS_FILE)
+events_index = load_user_index(BASE_DIR, CLEANED_EVENTS_TABLE, exclude=DERIVED_COLUMNS, application_only=True)
+rep_index = load_user_index(BASE_DIR, REPETITION_SUMMARY_TABLE, application_only=True, parse_times=False)
+summary_index = (
+    load_user_index(BASE_DIR, USER_SUMMARY_TABLE, parse_times=False)
+    if find_table(BASE_DIR, USER_SUMMARY_TABLE) is not None
+    else None
+)
+sessions_index = (
+    load_user_index(BASE_DIR, SESSIONS_TABLE, parse_times=False)
+    if find_table(BASE_DIR, SESSIONS_TABLE) is not None
+    else None
+)
+users_df = load_table(BASE_DIR, UNIQUE_USERS_TABLE)
 
 st.set_page_config(page_title="Product Analytics Dashboard", layout="wide")
 st.title("Product Analytics Dashboard")
 
 total_users = users_df["user_uuid"].nunique()
-total_events = len(df)
+total_events = events_index.table_rows
 
 g1, g2 = st.columns(2)
 g1.metric("Total Unique Users", total_users)
@@ -44,24 +58,18 @@ st.divider()
 user_ids = users_df["user_uuid"].sort_values().tolist()
 selected_user = st.selectbox("Select User ID", user_ids)
 
-user_df = df[df["user_uuid"] == selected_user]
-user_rep_df = rep_df[rep_df["user_uuid"] == selected_user]
+app_user_df = events_index.rows(selected_user)
+app_user_rep_df = rep_index.rows(selected_user)
 
-app_user_df = user_df[user_df["category"].str.lower() == "application"]
-app_user_rep_df = user_rep_df[
-    user_rep_df["category"].str.lower() == "application"] if "category" in user_rep_df.columns else user_rep_df
+user_summary = summary_index.rows(selected_user) if summary_index is not None else summarize_users(app_user_df)
+user_summary = user_summary.iloc[0] if len(user_summary) else None
 
-journey_data = build_user_journey(app_user_df)
+journey_data = build_journey(app_user_df)
 
 u1, u2, u3 = st.columns(3)
-u1.metric("Application Events", len(app_user_df))
-u2.metric("Unique Event Types", app_user_df["event_name"].nunique())
-u3.metric(
-    "Span (Days)",
-    journey_data["metadata"]["date_range"]["span_days"]
-    if journey_data["total_events"] > 0
-    else 0
-)
+u1.metric("Application Events", int(user_summary["application_events"]) if user_summary is not None else 0)
+u2.metric("Unique Event Types", int(user_summary["unique_event_types"]) if user_summary is not None else 0)
+u3.metric("Span (Days)", int(user_summary["span_days"]) if user_summary is not None else 0)
 
 st.divider()
 
@@ -78,7 +86,7 @@ with main_tab1:
     else:
         view_df = app_user_df[app_user_df["event_name"] == selected_event]
 
-    view_df = view_df.sort_values(["event_date", "event_time_only"])
+    view_df = add_derived_columns(view_df.sort_values("event_time", kind="mergesort"))
 
     st.subheader("Events")
 
@@ -114,7 +122,12 @@ with main_tab2:
             st.markdown(
                 f"**Time Range:** {journey_data['metadata']['date_range']['first_event']} to {journey_data['metadata']['date_range']['last_event']}")
 
-            sessions = split_into_sessions(journey_data["events"], gap_minutes=30)
+            session_lengths = (
+                sessions_index.rows(selected_user)["event_count"].to_numpy()
+                if sessions_index is not None
+                else None
+            )
+            sessions = journey_data.sessions(lengths=session_lengths)
             st.markdown(f"**Sessions Detected:** {len(sessions)} (based on 30-minute gaps)")
 
             render_session_cards(sessions, height=350)
@@ -122,7 +135,7 @@ with main_tab2:
             with st.expander("View Event Breakdown"):
                 breakdown_df = (
                     pd.DataFrame(
-                        journey_data["metadata"]["event_breakdown"].items(),
+                        read_event_counts(user_summary).items(),
                         columns=["Event Name", "Count"]
                     )
                     .sort_values("Count", ascending=False)
@@ -134,10 +147,12 @@ with main_tab2:
 
         if st.button("Generate AI Interpretation", key="btn_ai_journey"):
             with st.spinner("Analyzing user journey..."):
-                payload = build_ai_payload(app_user_df, app_user_rep_df, selected_user)
+                payload = build_ai_payload(app_user_df, app_user_rep_df, selected_user, AI_PAYLOAD_FORMAT)
                 result = interpret_journey_safe(payload)
 
             if result["success"]:
+                if result.get("cached"):
+                    st.caption("Loaded from the AI response cache.")
                 if result.get("is_structured") and result.get("parsed"):
                     render_ai_session_cards(result["parsed"], height=450)
                 else:
@@ -150,7 +165,7 @@ with main_tab2:
         st.subheader("AI-Generated Insights")
 
         if st.button("Generate AI Insights", key="btn_ai_insights"):
-            payload = build_ai_payload(app_user_df, app_user_rep_df, selected_user)
+            payload = build_ai_payload(app_user_df, app_user_rep_df, selected_user, AI_PAYLOAD_FORMAT)
             st.write_stream(generate_insights_stream(payload))
 
 st.divider()
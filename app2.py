@@ -1,21 +1,62 @@
 import streamlit as st
-import pandas as pd
+import argparse
 import os
 
+from pipelines.app_data import DEFAULT_USER_CACHE_MB, load_table, load_user_index, load_user_partition
+from pipelines.dedup import add_derived_columns
+from pipelines.storage import find_table
+from pipelines.timeline import TIMELINE_SUFFIX
+
 BASE_DIR = "pipeline_time_sequence"
+PER_USER_DIR = os.path.join(BASE_DIR, "per_user_timelines")
+
+TIMELINE_TABLE = "cleaned_events_chronological"
+UNIQUE_USERS_TABLE = "unique_users_list"
+TIMELINE_COLUMNS = [
+    "user_uuid",
+    "event_name",
+    "category",
+    "event_time"
+]
 
-TIMELINE_FILE = os.path.join(BASE_DIR, "cleaned_events_chronological.csv")
-UNIQUE_USERS_FILE = os.path.join(BASE_DIR, "unique_users_list.csv")
+parser = argparse.ArgumentParser(description="Explore one user's event timeline.")
+parser.add_argument(
+    "--lazy",
+    action="store_true",
+    help="Load only the user list at startup and read each selected user from the per-user partition."
+)
+parser.add_argument(
+    "--cache-mb",
+    type=int,
+    default=DEFAULT_USER_CACHE_MB,
+    help="Memory cap for cached per-user timelines in lazy mode (default: %(default)s)."
+)
+args = parser.parse_args()
 
-for f in [TIMELINE_FILE, UNIQUE_USERS_FILE]:
-    if not os.path.exists(f):
-        st.error(f"Missing required file: {f}")
+required_tables = [UNIQUE_USERS_TABLE] if args.lazy else [TIMELINE_TABLE, UNIQUE_USERS_TABLE]
+for t in required_tables:
+    if find_table(BASE_DIR, t) is None:
+        st.error(f"Missing required file: {os.path.join(BASE_DIR, t)}.csv")
         st.stop()
 
-df = pd.read_csv(TIMELINE_FILE)
-users_df = pd.read_csv(UNIQUE_USERS_FILE)
+if args.lazy:
+    try:
+        timelines = load_user_partition(
+            BASE_DIR,
+            PER_USER_DIR,
+            TIMELINE_SUFFIX,
+            columns=TIMELINE_COLUMNS,
+            max_bytes=args.cache_mb * 2**20,
+            table=TIMELINE_TABLE
+        )
+    except FileNotFoundError as e:
+        st.error(str(e))
+        st.stop()
+    read_user_events = timelines.rows
+else:
+    read_user_events = load_user_index(BASE_DIR, TIMELINE_TABLE, columns=TIMELINE_COLUMNS).rows
 
-df["event_time"] = pd.to_datetime(df["event_time"], format="ISO8601")
+users_df = load_table(BASE_DIR, UNIQUE_USERS_TABLE)
 
 st.set_page_config(
     page_title="User Event Timeline",
@@ -25,7 +66,6 @@ st.set_page_config(
 st.title("User Event Timeline")
 
 total_users = users_df["user_uuid"].nunique()
-total_events = len(df)
 
 col1, col2 = st.columns(2)
 col1.metric("Total Unique Users", total_users)
@@ -35,7 +75,11 @@ st.divider()
 user_ids = users_df["user_uuid"].sort_values().tolist()
 selected_user = st.selectbox("Select User ID", user_ids)
 
-user_df = df[df["user_uuid"] == selected_user]
+try:
+    user_df = read_user_events(selected_user)
+except FileNotFoundError as e:
+    st.error(f"No timeline found for {selected_user}: {e}")
+    st.stop()
 
 user_event_count = len(user_df)
 user_unique_events = user_df["event_name"].nunique()
@@ -63,7 +107,7 @@ if selected_event == "All Events":
 else:
     timeline_df = user_df[user_df["event_name"] == selected_event]
 
-timeline_df = timeline_df.sort_values("event_time")
+timeline_df = add_derived_columns(timeline_df.sort_values("event_time"))
 
 st.subheader("Event Timeline")
 
@@ -0,0 +1,96 @@
+import argparse
+import json
+import os
+import tempfile
+import time
+from typing import Any, Dict, Generator, List
+
+from insights.ai_cache import AiCache, cache_key
+
+
+class FakeProvider:
+    def __init__(self, latency: float, chunks: int):
+        self.latency = latency
+        self.chunks = chunks
+        self.calls = 0
+
+    def _text(self, prompt: str) -> List[str]:
+        return [f"chunk {i} for {len(prompt)} chars. " for i in range(self.chunks)]
+
+    def response(self, prompt: str) -> Dict[str, Any]:
+        self.calls += 1
+        time.sleep(self.latency)
+        return {"success": True, "content": "".join(self._text(prompt)), "provider": "fake"}
+
+    def stream(self, prompt: str) -> Generator[Dict[str, Any], None, None]:
+        self.calls += 1
+        for chunk in self._text(prompt):
+            time.sleep(self.latency / self.chunks)
+            yield {"success": True, "chunk": chunk, "provider": "fake"}
+
+
+def _timed(fn) -> float:
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def measure(latency: float, chunks: int, prompts: int) -> Dict[str, Any]:
+    provider = FakeProvider(latency, chunks)
+    now = [0.0]
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = AiCache(os.path.join(tmp, "responses.sqlite3"), max_bytes=2**20, ttl_seconds=3600, clock=lambda: now[0])
+        prompt = "x" * 10_000
+        key = cache_key("template", prompt, "model")
+
+        miss_s = _timed(lambda: cache.response(key, lambda: provider.response(prompt)))
+        hit_s = _timed(lambda: cache.response(key, lambda: provider.response(prompt)))
+        assert provider.calls == 1
+        assert cache.response(key, lambda: provider.response(prompt))["provider"] == "cache:fake"
+
+        stream_key = cache_key("stream template", prompt, "model")
+        fresh = [c["chunk"] for c in cache.stream(stream_key, lambda: provider.stream(prompt))]
+        replay_s = _timed(lambda: list(cache.stream(stream_key, lambda: provider.stream(prompt))))
+        replayed = [c["chunk"] for c in cache.stream(stream_key, lambda: provider.stream(prompt))]
+        assert replayed == fresh and provider.calls == 2
+
+        now[0] += 3601
+        cache.response(key, lambda: provider.response(prompt))
+        assert provider.calls == 3, "expired entry was served"
+
+        small = AiCache(os.path.join(tmp, "small.sqlite3"), max_bytes=50_000, clock=lambda: now[0])
+        keys = [cache_key("template", f"{i}" + prompt, "model") for i in range(prompts)]
+        for k in keys:
+            now[0] += 1
+            small.response(k, lambda: {"success": True, "content": "y" * 9_000, "provider": "fake"})
+        assert small.size <= small.max_bytes
+        assert small.get(keys[-1]) is not None and small.get(keys[0]) is None
+
+        return {
+            "provider_latency_ms": round(latency * 1000, 1),
+            "miss_ms": round(miss_s * 1000, 2),
+            "hit_ms": round(hit_s * 1000, 2),
+            "stream_replay_ms": round(replay_s * 1000, 2),
+            "entries_after_eviction": len(small),
+        }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Exercise the AI response cache against a fake provider: hits, stream replay, TTL and eviction."
+    )
+    parser.add_argument("--latency", type=float, default=2.0, help="Fake provider latency in seconds (default: %(default)s).")
+    parser.add_argument("--chunks", type=int, default=20, help="Chunks per streamed response (default: %(default)s).")
+    parser.add_argument("--prompts", type=int, default=20, help="Distinct prompts for the eviction check (default: %(default)s).")
+    parser.add_argument("--json", action="store_true", help="Print the result as JSON.")
+    args = parser.parse_args()
+
+    result = measure(args.latency, args.chunks, args.prompts)
+    if args.json:
+        print(json.dumps(result))
+    else:
+        print("  ".join(f"{key}: {value}" for key, value in result.items()))
+
+
+if __name__ == "__main__":
+    main()
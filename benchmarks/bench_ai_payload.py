@@ -0,0 +1,112 @@
+import numpy as np
+import argparse
+import json
+import re
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from insights.payload_builder import build_ai_payload, compact_payload, payload_to_prompt
+from pipelines.app_data import load_user_index
+from pipelines.dedup import DERIVED_COLUMNS
+
+
+def token_counter() -> Tuple[str, Callable[[str], int]]:
+    try:
+        import tiktoken
+    except ImportError:
+        pattern = re.compile(r"\w+|[^\w\s]")
+        return "approx", lambda text: len(pattern.findall(text))
+    encoding = tiktoken.get_encoding("o200k_base")
+    return "o200k_base", lambda text: len(encoding.encode(text))
+
+
+def expand_events(payload: Dict[str, Any]) -> List[Tuple[str, Optional[str], str]]:
+    names = payload["event_names"]
+    events = []
+    for day in payload["days"]:
+        for session in day["sessions"]:
+            h, m, s = (int(x) for x in session["start"].split(":"))
+            start = h * 3600 + m * 60 + s
+            for run in session["events"]:
+                seconds = start + run[1]
+                clock = f"{seconds // 3600:02d}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+                count = run[2] if len(run) > 2 else 1
+                events.append((day["date"], clock, names[run[0]]))
+                events.extend([(day["date"], None, names[run[0]])] * (count - 1))
+    return events
+
+
+def _matches(compact: Dict[str, Any], payload: Dict[str, Any]) -> bool:
+    expanded = expand_events(compact)
+    verbose = payload["events_ordered"]
+    return len(expanded) == len(verbose) and all(
+        date == e["event_date"] and name == e["event_name"] and clock in (None, e["event_time"][:8])
+        for (date, clock, name), e in zip(expanded, verbose)
+    )
+
+
+def _percentiles(values: List[float]) -> Dict[str, float]:
+    return {f"p{q}": round(float(np.percentile(values, q)), 1) for q in (50, 90, 99)}
+
+
+def measure(base_dir: str, users: int) -> Dict[str, Any]:
+    events = load_user_index(base_dir, "cleaned_events", exclude=DERIVED_COLUMNS, application_only=True)
+    repetitions = load_user_index(base_dir, "repetition_summary", application_only=True, parse_times=False)
+    sample = sorted(events.users, key=lambda user: -len(events.rows(user)))[:users]
+    tokenizer, count_tokens = token_counter()
+
+    verbose_tokens, compact_tokens, ratios = [], [], []
+    verbose_chars = compact_chars = build_s = compact_s = 0.0
+    for user in sample:
+        start = time.perf_counter()
+        payload = build_ai_payload(events.rows(user), repetitions.rows(user), user)
+        build_s += time.perf_counter() - start
+        start = time.perf_counter()
+        compact = compact_payload(payload)
+        compact_s += time.perf_counter() - start
+        if compact["categories"] == ["application"]:
+            assert _matches(compact, payload), user
+
+        verbose_prompt = payload_to_prompt(payload)
+        compact_prompt = payload_to_prompt(compact)
+        verbose_chars += len(verbose_prompt)
+        compact_chars += len(compact_prompt)
+        verbose_tokens.append(count_tokens(verbose_prompt))
+        compact_tokens.append(count_tokens(compact_prompt))
+        ratios.append(verbose_tokens[-1] / compact_tokens[-1])
+
+    return {
+        "users": len(sample),
+        "tokenizer": tokenizer,
+        "verbose_payload_tokens": _percentiles(verbose_tokens),
+        "compact_payload_tokens": _percentiles(compact_tokens),
+        "reduction": _percentiles(ratios),
+        "total_reduction": round(sum(verbose_tokens) / sum(compact_tokens), 1),
+        "chars_reduction": round(verbose_chars / compact_chars, 1),
+        "build_ms_per_user": round(build_s / len(sample) * 1000, 2),
+        "compact_ms_per_user": round(compact_s / len(sample) * 1000, 2),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Compare the prompt size of the verbose and compact AI payloads on real journeys."
+    )
+    parser.add_argument(
+        "--base-dir",
+        default="pipeline_deduplication",
+        help="Output folder of pipeline_deduplication.py (default: %(default)s)."
+    )
+    parser.add_argument("--users", type=int, default=500, help="Most active users to measure (default: %(default)s).")
+    parser.add_argument("--json", action="store_true", help="Print the result as JSON.")
+    args = parser.parse_args()
+
+    result = measure(args.base_dir, args.users)
+    if args.json:
+        print(json.dumps(result))
+    else:
+        print("  ".join(f"{key}: {value}" for key, value in result.items()))
+
+
+if __name__ == "__main__":
+    main()
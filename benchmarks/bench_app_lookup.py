@@ -0,0 +1,69 @@
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from benchmarks.generate_events import EventLogGenerator
+from pipelines.app_data import UserIndex, application_rows
+from pipelines.dedup import parse_raw_event_time, sort_events
+from pipelines.encoding import read_events_csv
+
+
+def _per_lookup(fn, users) -> float:
+    start = time.perf_counter()
+    for user in users:
+        fn(user)
+    return (time.perf_counter() - start) / len(users)
+
+
+def _scan(df):
+    def lookup(user):
+        user_df = df[df["user_uuid"] == user]
+        return user_df[user_df["category"].str.lower() == "application"]
+    return lookup
+
+
+def measure(path: str, lookups: int) -> dict:
+    df = sort_events(parse_raw_event_time(read_events_csv(path)))
+
+    start = time.perf_counter()
+    index = UserIndex(application_rows(df), table_rows=len(df))
+    build_s = time.perf_counter() - start
+
+    users = df["user_uuid"].cat.categories[:: max(1, len(df["user_uuid"].cat.categories) // lookups)][:lookups]
+    for user in users[:20]:
+        assert _scan(df)(user).reset_index(drop=True).equals(index.rows(user).reset_index(drop=True))
+
+    return {
+        "rows": len(df),
+        "users": len(index.users),
+        "index_build_seconds": round(build_s, 3),
+        "scan_lookup_ms": round(_per_lookup(_scan(df), users) * 1000, 3),
+        "index_lookup_ms": round(_per_lookup(index.rows, users) * 1000, 3),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Compare per-user boolean scans with the sorted per-user index used by the apps."
+    )
+    parser.add_argument("--rows", type=int, default=1_000_000, help="Rows to generate (default: %(default)s).")
+    parser.add_argument("--lookups", type=int, default=200, help="Users to look up (default: %(default)s).")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed (default: %(default)s).")
+    parser.add_argument("--json", action="store_true", help="Print the result as JSON.")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "events.csv")
+        EventLogGenerator(users=max(1, args.rows // 100), seed=args.seed).write_csv(path, args.rows)
+        result = measure(path, args.lookups)
+
+    if args.json:
+        print(json.dumps(result))
+    else:
+        print("  ".join(f"{key}: {value}" for key, value in result.items()))
+
+
+if __name__ == "__main__":
+    main()
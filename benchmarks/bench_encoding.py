@@ -0,0 +1,71 @@
+import pandas as pd
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from benchmarks.generate_events import EventLogGenerator
+from pipelines.dedup import mark_canonical, parse_raw_event_time, sort_events
+from pipelines.encoding import CATEGORICAL_COLUMNS, read_events_csv
+
+THRESHOLD_MS = 50
+
+
+def _timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def _loaders(path: str):
+    return {
+        "object": lambda: pd.read_csv(path, dtype={col: object for col in CATEGORICAL_COLUMNS}),
+        "string": lambda: pd.read_csv(path),
+        "categorical": lambda: read_events_csv(path),
+    }
+
+
+def measure(path: str, name: str, load) -> dict:
+    df, read_s = _timed(load)
+    df = parse_raw_event_time(df)
+    memory_mb = df.memory_usage(deep=True).sum() / 2**20
+
+    df, sort_s = _timed(lambda: sort_events(df))
+    _, mark_s = _timed(lambda: mark_canonical(df.copy(), THRESHOLD_MS))
+    user = df["user_uuid"].iat[len(df) // 2]
+    _, filter_s = _timed(lambda: df[df["user_uuid"] == user])
+
+    return {
+        "encoding": name,
+        "memory_mb": round(memory_mb, 1),
+        "read_seconds": round(read_s, 3),
+        "sort_seconds": round(sort_s, 3),
+        "mark_canonical_seconds": round(mark_s, 3),
+        "filter_user_seconds": round(filter_s, 4),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Compare memory and sort/group/filter time of object, string and categorical event columns."
+    )
+    parser.add_argument("--rows", type=int, default=5_000_000, help="Rows to generate (default: %(default)s).")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed (default: %(default)s).")
+    parser.add_argument("--json", action="store_true", help="Print one JSON object per encoding.")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "events.csv")
+        EventLogGenerator(users=max(1, args.rows // 100), seed=args.seed).write_csv(path, args.rows)
+        results = [measure(path, name, load) for name, load in _loaders(path).items()]
+
+    for result in results:
+        if args.json:
+            print(json.dumps({"rows": args.rows, **result}))
+        else:
+            print("  ".join(f"{key}: {value}" for key, value in result.items()))
+
+
+if __name__ == "__main__":
+    main()
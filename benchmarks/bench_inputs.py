@@ -0,0 +1,80 @@
+import argparse
+import json
+import os
+import tempfile
+import time
+from typing import List
+
+from benchmarks.generate_events import EventLogGenerator
+from pipelines.inputs import default_read_workers, read_raw_events, resolve_inputs
+
+LAYOUTS = ["single", "csv", "gz", "zst"]
+_SUFFIXES = {"csv": ".csv", "gz": ".csv.gz", "zst": ".csv.zst"}
+
+
+def write_inputs(root: str, rows: int, shards: int, seed: int) -> dict:
+    generator = EventLogGenerator(users=max(1, rows // 100), seed=seed)
+    frames = [generator.chunk(rows // shards + (i < rows % shards)) for i in range(shards)]
+
+    layouts = {"single": os.path.join(root, "single", "events.csv")}
+    os.makedirs(os.path.dirname(layouts["single"]))
+    with open(layouts["single"], "w", newline="") as fh:
+        for i, frame in enumerate(frames):
+            frame.to_csv(fh, header=i == 0, index=False)
+
+    for layout, suffix in _SUFFIXES.items():
+        folder = os.path.join(root, layout)
+        os.makedirs(folder)
+        for i, frame in enumerate(frames):
+            frame.to_csv(os.path.join(folder, f"events_{i:04d}{suffix}"), index=False)
+        layouts[layout] = folder
+    return layouts
+
+
+def measure(layout: str, spec: str, workers: int, rows: int) -> dict:
+    paths: List[str] = resolve_inputs(spec)
+    start = time.perf_counter()
+    df = read_raw_events(paths, workers)
+    seconds = time.perf_counter() - start
+    assert len(df) == rows
+    input_mb = sum(os.path.getsize(p) for p in paths) / 2**20
+
+    return {
+        "layout": layout,
+        "files": len(paths),
+        "workers": workers,
+        "input_mb": round(input_mb, 1),
+        "seconds": round(seconds, 3),
+        "rows_per_second": round(rows / seconds),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Compare reading one CSV with reading plain, gzip and zstd shards across a worker pool."
+    )
+    parser.add_argument("--rows", type=int, default=2_000_000, help="Rows to generate (default: %(default)s).")
+    parser.add_argument("--shards", type=int, default=16, help="Shards per sharded layout (default: %(default)s).")
+    parser.add_argument("--workers", type=int, default=None, help="Read workers for shards (default: one per shard, up to the CPU count).")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed (default: %(default)s).")
+    parser.add_argument("--json", action="store_true", help="Print one JSON object per layout.")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        layouts = write_inputs(tmp, args.rows, args.shards, args.seed)
+        results = [measure("single", layouts["single"], 1, args.rows)]
+        for layout in LAYOUTS[1:]:
+            workers = args.workers or default_read_workers(resolve_inputs(layouts[layout]))
+            results.append(measure(layout, layouts[layout], 1, args.rows))
+            if workers > 1:
+                results.append(measure(layout, layouts[layout], workers, args.rows))
+
+    for result in results:
+        if args.json:
+            print(json.dumps({"rows": args.rows, **result}))
+        else:
+            print("  ".join(f"{key}: {value}" for key, value in result.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+import pandas as pd
+import argparse
+import json
+import time
+from typing import Any, Dict
+
+from benchmarks.generate_events import EventLogGenerator
+from insights.journey_builder import build_journey, build_user_journey, split_into_sessions
+from pipelines.dedup import parse_raw_event_time
+from pipelines.encoding import encode_events
+
+SIZES = [1_000, 10_000, 100_000]
+
+
+def legacy_build_user_journey(user_df: pd.DataFrame) -> Dict[str, Any]:
+    if user_df.empty:
+        return {
+            "user_id": None,
+            "total_events": 0,
+            "unique_event_types": 0,
+            "events": [],
+            "metadata": {}
+        }
+
+    user_df = user_df.sort_values("event_time", kind="mergesort").reset_index(drop=True)
+    user_df = user_df.assign(
+        event_date=user_df["event_time"].dt.strftime("%Y-%m-%d"),
+        event_day=user_df["event_time"].dt.day_name(),
+        event_time_only=user_df["event_time"].dt.strftime("%H:%M:%S.%f")
+    )
+    user_id = user_df["user_uuid"].iloc[0]
+
+    events = []
+    for idx, row in user_df.iterrows():
+        events.append({
+            "sequence": idx + 1,
+            "event_name": row["event_name"],
+            "category": row["category"],
+            "date": row["event_date"],
+            "day": row["event_day"],
+            "time": row["event_time_only"]
+        })
+
+    first_event = user_df.iloc[0]
+    last_event = user_df.iloc[-1]
+
+    first_date = pd.to_datetime(first_event["event_date"])
+    last_date = pd.to_datetime(last_event["event_date"])
+    span_days = (last_date - first_date).days + 1
+
+    metadata = {
+        "total_events": len(user_df),
+        "unique_event_types": user_df["event_name"].nunique(),
+        "date_range": {
+            "first_event": f"{first_event['event_date']} {first_event['event_time_only']}",
+            "last_event": f"{last_event['event_date']} {last_event['event_time_only']}",
+            "span_days": span_days
+        },
+        "event_categories": user_df["category"].astype(str).value_counts().to_dict(),
+        "event_breakdown": user_df["event_name"].astype(str).value_counts().to_dict()
+    }
+
+    return {
+        "user_id": user_id,
+        "total_events": metadata["total_events"],
+        "unique_event_types": metadata["unique_event_types"],
+        "events": events,
+        "metadata": metadata
+    }
+
+
+def user_events(rows: int, seed: int) -> pd.DataFrame:
+    generator = EventLogGenerator(users=1, days=max(1, rows // 500), seed=seed)
+    return encode_events(parse_raw_event_time(generator.chunk(rows)))
+
+
+def _timed(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def measure(rows: int, seed: int, repeat: int) -> dict:
+    df = user_events(rows, seed)
+    legacy = legacy_build_user_journey(df)
+    journey = build_journey(df)
+    assert journey.to_dict() == legacy
+    assert build_user_journey(df) == legacy
+    assert journey.sessions() == split_into_sessions(legacy["events"])
+
+    legacy_s = _timed(lambda: legacy_build_user_journey(df), repeat)
+    columnar_s = _timed(lambda: build_journey(df), repeat)
+    with_events_s = _timed(lambda: build_journey(df).events, repeat)
+    legacy_sessions_s = _timed(lambda: split_into_sessions(legacy["events"]), repeat)
+    session_lengths_s = _timed(journey.session_lengths, repeat)
+    return {
+        "events": rows,
+        "legacy_seconds": round(legacy_s, 4),
+        "columnar_seconds": round(columnar_s, 4),
+        "columnar_with_events_seconds": round(with_events_s, 4),
+        "speedup": round(legacy_s / columnar_s, 1),
+        "legacy_sessions_seconds": round(legacy_sessions_s, 4),
+        "session_lengths_seconds": round(session_lengths_s, 5),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Compare the row-by-row and the columnar build_journey and sessionizer on one user's events."
+    )
+    parser.add_argument(
+        "--sizes",
+        type=lambda s: [int(x) for x in s.split(",")],
+        default=SIZES,
+        help="Comma-separated event counts (default: 1000,10000,100000)."
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per size; the best is reported (default: %(default)s).")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed (default: %(default)s).")
+    parser.add_argument("--json", action="store_true", help="Print one JSON object per size.")
+    args = parser.parse_args()
+
+    for rows in args.sizes:
+        result = measure(rows, args.seed, args.repeat)
+        if args.json:
+            print(json.dumps(result))
+        else:
+            print("  ".join(f"{key}: {value}" for key, value in result.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+import numpy as np
+import argparse
+import json
+import random
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional
+
+from insights.provider_pool import CircuitBreaker, Provider, ProviderPool
+
+
+class FakeError(RuntimeError):
+    def __init__(self, message: str, status_code: int):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class FakeProvider(Provider):
+    def __init__(
+        self,
+        name: str,
+        median: float,
+        tail: float,
+        tail_rate: float,
+        failure_rate: float,
+        chunks: int = 10,
+        failure_status: int = 503
+    ):
+        self.name = name
+        self.median = median
+        self.tail = tail
+        self.tail_rate = tail_rate
+        self.failure_rate = failure_rate
+        self.chunks = chunks
+        self.failure_status = failure_status
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def _plan(self, prompt: str):
+        with self._lock:
+            self.calls += 1
+        rng = random.Random(f"{self.name}:{prompt}")
+        latency = self.median * rng.lognormvariate(0, 0.3)
+        if rng.random() < self.tail_rate:
+            latency += self.tail
+        return latency, rng.random() < self.failure_rate
+
+    def complete(self, prompt: str) -> str:
+        latency, fails = self._plan(prompt)
+        time.sleep(latency)
+        if fails:
+            raise FakeError(f"{self.name} failed", self.failure_status)
+        return f"{self.name} answer to {prompt}"
+
+    def stream(self, prompt: str) -> Iterator[str]:
+        latency, fails = self._plan(prompt)
+        time.sleep(latency)
+        if fails:
+            raise FakeError(f"{self.name} failed", self.failure_status)
+        for i in range(self.chunks):
+            yield f"{self.name} chunk {i} "
+            time.sleep(self.median / self.chunks)
+
+
+def fake_providers(scale: float, dead_key: bool = False) -> List[FakeProvider]:
+    return [
+        FakeProvider("gemini_1", 0.8 * scale, 6.0 * scale, 0.05, 1.0 if dead_key else 0.10, failure_status=429 if dead_key else 503),
+        FakeProvider("gemini_2", 0.8 * scale, 6.0 * scale, 0.05, 0.02),
+        FakeProvider("openai", 1.0 * scale, 4.0 * scale, 0.03, 0.01),
+    ]
+
+
+def run(
+    requests: int,
+    scale: float,
+    hedge_delay: Optional[float],
+    stream: bool,
+    dead_key: bool = False,
+    breaker: bool = True
+) -> Dict[str, Any]:
+    providers = fake_providers(scale, dead_key)
+    base_delay = 30 * scale if breaker else 0.0
+    breakers = {p.name: CircuitBreaker(base_delay=base_delay, max_delay=900 * scale) for p in providers}
+    pool = ProviderPool(providers, hedge_delay, breakers=breakers)
+    latencies, failures = [], 0
+    for i in range(requests):
+        start = time.perf_counter()
+        if stream:
+            first = next(pool.stream(f"request {i}"))
+            ok = first["success"]
+        else:
+            ok = pool.response(f"request {i}")["success"]
+        latencies.append(time.perf_counter() - start)
+        failures += not ok
+    return {
+        "p50_s": round(float(np.percentile(latencies, 50)) / scale, 3),
+        "p99_s": round(float(np.percentile(latencies, 99)) / scale, 3),
+        "failures": failures,
+        "calls_per_request": round(sum(p.calls for p in providers) / requests, 2),
+        "gemini_1_calls": providers[0].calls,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Compare failover, circuit breakers and hedged requests on fake providers with injected latency and failures."
+    )
+    parser.add_argument("--requests", type=int, default=300, help="Requests per mode (default: %(default)s).")
+    parser.add_argument(
+        "--hedge-delay",
+        type=float,
+        default=1.2,
+        help="Seconds before the next provider is fired, in unscaled time (default: %(default)s)."
+    )
+    parser.add_argument(
+        "--scale",
+        type=float,
+        default=0.02,
+        help="Multiplier applied to every simulated latency; results are reported unscaled (default: %(default)s)."
+    )
+    parser.add_argument("--stream", action="store_true", help="Measure time to first chunk of a streamed response.")
+    parser.add_argument("--dead-key", action="store_true", help="Make gemini_1 fail every call with HTTP 429.")
+    parser.add_argument("--json", action="store_true", help="Print one JSON object per mode.")
+    args = parser.parse_args()
+
+    modes = [
+        ("sequential, no breaker", None, False),
+        ("sequential", None, True),
+        ("hedged", args.hedge_delay * args.scale, True),
+    ]
+    for mode, delay, breaker in modes:
+        result = {"mode": mode, **run(args.requests, args.scale, delay, args.stream, args.dead_key, breaker)}
+        if args.json:
+            print(json.dumps(result))
+        else:
+            print("  ".join(f"{key}: {value}" for key, value in result.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+import pandas as pd
+import numpy as np
+import argparse
+import json
+import time
+
+from benchmarks.generate_events import format_raw_event_times
+from pipelines.dedup import RAW_TIME_FORMAT
+from pipelines.timestamps import parse_event_times, to_datetime_series
+
+START = pd.Timestamp("2025-01-01", tz="UTC").value
+SPAN_NS = 400 * 86400 * 10**9
+
+
+def make_raw_event_times(rows: int, mixed_offsets: bool, seed: int) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    offsets = rng.choice([-300, 0, 330, 60], size=rows) if mixed_offsets else np.full(rows, 330)
+    utc_ns = START + rng.integers(0, SPAN_NS, size=rows) // 1000 * 1000
+    return format_raw_event_times(utc_ns, offsets)
+
+
+def _timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Compare pd.to_datetime with the fixed-width event_time parser."
+    )
+    parser.add_argument("--rows", type=int, default=10_000_000, help="Rows to parse (default: %(default)s).")
+    parser.add_argument("--mixed-offsets", action="store_true", help="Draw UTC offsets from several zones.")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed (default: %(default)s).")
+    parser.add_argument("--json", action="store_true", help="Print the result as JSON.")
+    args = parser.parse_args()
+
+    values = pd.Series(make_raw_event_times(args.rows, args.mixed_offsets, args.seed), name="event_time")
+
+    baseline, baseline_s = _timed(lambda: pd.to_datetime(
+        values,
+        format=RAW_TIME_FORMAT,
+        utc=args.mixed_offsets,
+        cache=False
+    ))
+    parsed, fast_s = _timed(lambda: parse_event_times(values, RAW_TIME_FORMAT))
+
+    fast = to_datetime_series(parsed, index=values.index)
+    result = {
+        "rows": args.rows,
+        "mixed_offsets": args.mixed_offsets,
+        "pandas_seconds": round(baseline_s, 3),
+        "fixed_width_seconds": round(fast_s, 3),
+        "speedup": round(baseline_s / fast_s, 2),
+        "fallback_rows": parsed.fallback_rows,
+        "identical": bool((fast == baseline).all()),
+    }
+
+    if args.json:
+        print(json.dumps(result))
+    else:
+        for key, value in result.items():
+            print(f"{key}: {value}")
+
+
+if __name__ == "__main__":
+    main()
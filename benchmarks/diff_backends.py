@@ -0,0 +1,91 @@
+import pandas as pd
+import argparse
+import filecmp
+import os
+import shlex
+import subprocess
+import sys
+import tempfile
+from typing import List
+
+from benchmarks.generate_events import EventLogGenerator, add_generator_arguments, generator_settings
+from pipelines.backends import BACKENDS, DEFAULT_BACKEND
+from pipelines.instrumentation import MANIFEST_FILE
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+OUTPUT_DIR = "pipeline_deduplication"
+
+
+def run_backend(backend: str, input_file: str, run_dir: str, extra_args: List[str]) -> str:
+    os.makedirs(run_dir)
+    subprocess.run(
+        [sys.executable, os.path.join(REPO_DIR, "pipeline_deduplication.py"),
+         "--input", input_file, "--backend", backend] + extra_args,
+        cwd=run_dir,
+        check=True
+    )
+    return os.path.join(run_dir, OUTPUT_DIR)
+
+
+def _files(root: str) -> List[str]:
+    return sorted(
+        os.path.relpath(os.path.join(path, name), root)
+        for path, _, names in os.walk(root)
+        for name in names
+        if name != MANIFEST_FILE
+    )
+
+
+def _same_parquet(a: str, b: str) -> bool:
+    left, right = pd.read_parquet(a), pd.read_parquet(b)
+    for df in (left, right):
+        for col in df.columns:
+            if isinstance(df[col].dtype, pd.CategoricalDtype):
+                df[col] = df[col].astype(str)
+    return left.equals(right)
+
+
+def compare_outputs(expected: str, actual: str) -> List[str]:
+    expected_files, actual_files = _files(expected), _files(actual)
+    problems = [f"only in {expected}: {p}" for p in sorted(set(expected_files) - set(actual_files))]
+    problems += [f"only in {actual}: {p}" for p in sorted(set(actual_files) - set(expected_files))]
+
+    for rel in sorted(set(expected_files) & set(actual_files)):
+        a, b = os.path.join(expected, rel), os.path.join(actual, rel)
+        same = _same_parquet(a, b) if rel.endswith(".parquet") else filecmp.cmp(a, b, shallow=False)
+        if not same:
+            problems.append(f"differs: {rel}")
+    return problems
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Run pipeline_deduplication.py with two backends on a synthetic log and compare every output."
+    )
+    parser.add_argument("--rows", type=int, default=200_000, help="Rows to generate (default: %(default)s).")
+    parser.add_argument("--input", default=None, help="Use this raw event log instead of generating one.")
+    parser.add_argument("--expected", choices=BACKENDS, default=DEFAULT_BACKEND, help="Reference backend (default: %(default)s).")
+    parser.add_argument("--actual", choices=BACKENDS, default="duckdb", help="Backend under test (default: %(default)s).")
+    parser.add_argument("--dedup-args", default="", help="Extra arguments for both runs, e.g. \"--format both\".")
+    add_generator_arguments(parser)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="diff_backends_") as tmp:
+        input_file = os.path.abspath(args.input) if args.input else os.path.join(tmp, "events.csv")
+        if not args.input:
+            EventLogGenerator(**generator_settings(args)).write_csv(input_file, args.rows)
+
+        extra_args = shlex.split(args.dedup_args)
+        expected = run_backend(args.expected, input_file, os.path.join(tmp, args.expected), extra_args)
+        actual = run_backend(args.actual, input_file, os.path.join(tmp, args.actual), extra_args)
+        problems = compare_outputs(expected, actual)
+
+    for problem in problems:
+        print(problem)
+    if problems:
+        sys.exit(f"{args.actual} outputs differ from {args.expected} ({len(problems)} problems).")
+    print(f"{args.actual} outputs match {args.expected}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+import numpy as np
+import argparse
+import os
+import shlex
+import sys
+import tempfile
+from typing import List
+
+from benchmarks.diff_backends import compare_outputs, run_backend
+from benchmarks.generate_events import EventLogGenerator, format_raw_event_times, parse_offset
+from pipelines.backends import DEFAULT_BACKEND
+from pipelines.timestamps import parse_event_times
+
+DEFAULT_MODES = ["--streaming --memory-budget 16MB", "--workers 4", "--backend duckdb"]
+
+
+def write_split_offsets_log(path: str, rows: int, offsets: List[str], seed: int) -> None:
+    df = EventLogGenerator(users=max(1, rows // 100), seed=seed).chunk(rows)
+    df = df.sort_values("user_uuid", kind="stable")
+    users = np.sort(df["user_uuid"].unique())
+    block = np.searchsorted(users, df["user_uuid"].to_numpy()) * len(offsets) // len(users)
+    minutes = np.array([parse_offset(o) for o in offsets], dtype=np.int64)
+    df["event_time"] = format_raw_event_times(parse_event_times(df["event_time"]).utc_ns, minutes[block])
+    df.to_csv(path, index=False)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Run pipeline_deduplication.py in several modes on a log whose users are split into blocks "
+        "with different UTC offsets, and compare every output with the in-memory run."
+    )
+    parser.add_argument("--rows", type=int, default=200_000, help="Rows to generate (default: %(default)s).")
+    parser.add_argument("--offsets", default="+05:30,-03:00", help="Comma-separated UTC offsets, one per user block (default: %(default)s).")
+    parser.add_argument(
+        "--mode",
+        action="append",
+        default=None,
+        help="Arguments of a run to compare, repeatable (default: %s)." % "; ".join(DEFAULT_MODES)
+    )
+    parser.add_argument("--seed", type=int, default=0, help="Random seed (default: %(default)s).")
+    args = parser.parse_args()
+
+    problems = []
+    with tempfile.TemporaryDirectory(prefix="diff_offsets_") as tmp:
+        input_file = os.path.join(tmp, "events.csv")
+        write_split_offsets_log(input_file, args.rows, args.offsets.split(","), args.seed)
+        expected = run_backend(DEFAULT_BACKEND, input_file, os.path.join(tmp, "in_memory"), [])
+        for i, mode in enumerate(args.mode or DEFAULT_MODES):
+            actual = run_backend(DEFAULT_BACKEND, input_file, os.path.join(tmp, f"mode_{i}"), shlex.split(mode))
+            problems += [f"{mode}: {problem}" for problem in compare_outputs(expected, actual)]
+
+    for problem in problems:
+        print(problem)
+    if problems:
+        sys.exit(f"Outputs differ from the in-memory run ({len(problems)} problems).")
+    print("All modes match the in-memory run.")
+
+
+if __name__ == "__main__":
+    main()
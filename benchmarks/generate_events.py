@@ -0,0 +1,177 @@
+import pandas as pd
+import numpy as np
+import argparse
+import os
+import uuid
+from typing import Any, Dict, List
+
+THRESHOLD_MS = 50
+DEFAULT_START = "2026-01-01"
+CATEGORIES = ["application", "system"]
+RAW_COLUMNS = ["user_uuid", "event_name", "category", "event_time"]
+
+
+def _put(chars: np.ndarray, start: int, width: int, values: np.ndarray) -> None:
+    values = np.asarray(values, dtype=np.int64)
+    for i in range(width - 1, -1, -1):
+        chars[:, start + i] = ord("0") + values % 10
+        values = values // 10
+
+
+def format_raw_event_times(utc_ns: np.ndarray, offset_minutes: np.ndarray) -> np.ndarray:
+    local = pd.DatetimeIndex((utc_ns + offset_minutes * 60 * 10**9).view("M8[ns]"))
+    chars = np.zeros((len(utc_ns), 33), dtype=np.uint8)
+    for pos, ch in [(4, "-"), (7, "-"), (10, " "), (13, ":"), (16, ":"), (19, "."), (26, " "), (30, ":")]:
+        chars[:, pos] = ord(ch)
+    _put(chars, 0, 4, local.year)
+    _put(chars, 5, 2, local.month)
+    _put(chars, 8, 2, local.day)
+    _put(chars, 11, 2, local.hour)
+    _put(chars, 14, 2, local.minute)
+    _put(chars, 17, 2, local.second)
+    _put(chars, 20, 6, local.microsecond)
+    chars[:, 27] = np.where(offset_minutes < 0, ord("-"), ord("+"))
+    _put(chars, 28, 2, np.abs(offset_minutes) // 60)
+    _put(chars, 31, 2, np.abs(offset_minutes) % 60)
+    return chars.view("S33").ravel().astype(str).astype(object)
+
+
+def parse_offset(value: str) -> int:
+    sign = -1 if value.startswith("-") else 1
+    hours, minutes = value.lstrip("+-").split(":")
+    return sign * (int(hours) * 60 + int(minutes))
+
+
+def _zipf_weights(n: int, skew: float) -> np.ndarray:
+    weights = 1.0 / np.arange(1, n + 1) ** skew
+    return weights / weights.sum()
+
+
+class EventLogGenerator:
+    def __init__(
+        self,
+        users: int,
+        event_types: int = 60,
+        burst_rate: float = 0.2,
+        burst_window_ms: float = THRESHOLD_MS,
+        skew: float = 1.0,
+        offsets: List[str] = None,
+        start: str = DEFAULT_START,
+        days: int = 30,
+        app_share: float = 0.7,
+        seed: int = 0
+    ):
+        self.rng = np.random.default_rng(seed)
+        self.burst_rate = burst_rate
+        self.burst_window_us = int(burst_window_ms * 1000)
+        self.offsets = np.array([parse_offset(o) for o in (offsets or ["+05:30"])], dtype=np.int64)
+        self.start_ns = pd.Timestamp(start, tz="UTC").value
+        self.span_us = days * 86_400 * 10**6
+
+        self.user_ids = np.array(
+            [str(uuid.UUID(bytes=self.rng.bytes(16), version=4)) for _ in range(users)],
+            dtype=object
+        )
+        self.user_weights = _zipf_weights(users, skew)
+        self.user_offsets = self.rng.choice(self.offsets, size=users)
+
+        self.event_names = np.array([f"event_{i:03d}" for i in range(event_types)], dtype=object)
+        self.event_weights = _zipf_weights(event_types, skew)
+        self.event_categories = np.where(
+            self.rng.random(event_types) < app_share, CATEGORIES[0], CATEGORIES[1]
+        ).astype(object)
+
+    def chunk(self, rows: int) -> pd.DataFrame:
+        bursts = int(rows * self.burst_rate)
+        base = rows - bursts
+
+        users = self.rng.choice(len(self.user_ids), size=base, p=self.user_weights)
+        events = self.rng.choice(len(self.event_names), size=base, p=self.event_weights)
+        micros = self.rng.integers(0, self.span_us, size=base) // 1000 * 1000
+
+        if bursts and base:
+            source = self.rng.integers(0, base, size=bursts)
+            jitter = self.rng.integers(0, self.burst_window_us + 1, size=bursts) // 1000 * 1000
+            users = np.concatenate([users, users[source]])
+            events = np.concatenate([events, events[source]])
+            micros = np.concatenate([micros, micros[source] + jitter])
+
+        order = self.rng.permutation(len(users))
+        users, events, micros = users[order], events[order], micros[order]
+
+        return pd.DataFrame({
+            "user_uuid": self.user_ids[users],
+            "event_name": self.event_names[events],
+            "category": self.event_categories[events],
+            "event_time": format_raw_event_times(self.start_ns + micros * 1000, self.user_offsets[users]),
+        }, columns=RAW_COLUMNS)
+
+    def write_csv(self, path: str, rows: int, chunk_rows: int = 1_000_000) -> None:
+        written = 0
+        with open(path, "w", newline="") as fh:
+            fh.write(",".join(RAW_COLUMNS) + "\n")
+            while written < rows:
+                n = min(chunk_rows, rows - written)
+                self.chunk(n).to_csv(fh, header=False, index=False)
+                written += n
+
+
+def generator_settings(args: argparse.Namespace) -> Dict[str, Any]:
+    return {
+        "users": args.users or max(1, args.rows // 100),
+        "event_types": args.event_types,
+        "burst_rate": args.burst_rate,
+        "burst_window_ms": args.burst_window_ms,
+        "skew": args.skew,
+        "offsets": args.offsets.split(","),
+        "start": args.start,
+        "days": args.days,
+        "app_share": args.app_share,
+        "seed": args.seed,
+    }
+
+
+def add_generator_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--users", type=int, default=None, help="Distinct users (default: rows / 100).")
+    parser.add_argument("--event-types", type=int, default=60, help="Event name vocabulary size (default: %(default)s).")
+    parser.add_argument(
+        "--burst-rate",
+        type=float,
+        default=0.2,
+        help="Share of rows that repeat another row within --burst-window-ms (default: %(default)s)."
+    )
+    parser.add_argument(
+        "--burst-window-ms",
+        type=float,
+        default=THRESHOLD_MS,
+        help="Maximum gap of a burst repeat (default: %(default)s, the dedup threshold)."
+    )
+    parser.add_argument(
+        "--skew",
+        type=float,
+        default=1.0,
+        help="Zipf exponent for user activity and event popularity; 0 is uniform (default: %(default)s)."
+    )
+    parser.add_argument("--offsets", default="+05:30", help="Comma-separated UTC offsets assigned per user (default: %(default)s).")
+    parser.add_argument("--start", default=DEFAULT_START, help="First day of the log (default: %(default)s).")
+    parser.add_argument("--days", type=int, default=30, help="Days covered by the log (default: %(default)s).")
+    parser.add_argument("--app-share", type=float, default=0.7, help="Share of event types in the application category (default: %(default)s).")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed (default: %(default)s).")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Write a seeded synthetic raw event log in the pipeline input schema."
+    )
+    parser.add_argument("output", help="CSV file to write.")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="Rows to generate (default: %(default)s).")
+    parser.add_argument("--chunk-rows", type=int, default=1_000_000, help="Rows generated per write (default: %(default)s).")
+    add_generator_arguments(parser)
+    args = parser.parse_args()
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    EventLogGenerator(**generator_settings(args)).write_csv(args.output, args.rows, args.chunk_rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+import argparse
+import hashlib
+import json
+import os
+import platform
+import shlex
+import shutil
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List
+
+from benchmarks.generate_events import EventLogGenerator, add_generator_arguments, generator_settings
+from pipelines.instrumentation import MANIFEST_FILE
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_SIZES = "100k,1m,10m,50m"
+DEFAULT_RESULTS = os.path.join("benchmarks", "results.jsonl")
+DEFAULT_WORK_DIR = os.path.join("benchmarks", ".work")
+_SUFFIXES = {"k": 10**3, "m": 10**6, "g": 10**9}
+
+
+def parse_size(value: str) -> int:
+    value = value.strip().lower()
+    if value and value[-1] in _SUFFIXES:
+        return int(float(value[:-1]) * _SUFFIXES[value[-1]])
+    return int(value)
+
+
+def _git_revision() -> Dict[str, Any]:
+    def git(*args):
+        return subprocess.run(
+            ["git", *args], cwd=REPO_DIR, capture_output=True, text=True
+        ).stdout.strip()
+
+    return {"commit": git("rev-parse", "HEAD"), "dirty": bool(git("status", "--porcelain", "--untracked-files=no"))}
+
+
+def run_stage(name: str, command: List[str], cwd: str, rows: int) -> Dict[str, Any]:
+    start = time.perf_counter()
+    proc = subprocess.Popen(command, cwd=cwd)
+    _, status, usage = os.wait4(proc.pid, 0)
+    wall = time.perf_counter() - start
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    if proc.returncode != 0:
+        raise RuntimeError(f"{name} exited with status {proc.returncode}")
+
+    manifest_path = os.path.join(cwd, name, MANIFEST_FILE)
+    breakdown = None
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as fh:
+            breakdown = json.load(fh)["stages"]
+
+    return {
+        "stage": name,
+        "rows": rows,
+        "wall_seconds": round(wall, 3),
+        "cpu_seconds": round(usage.ru_utime + usage.ru_stime, 3),
+        "peak_rss_mb": round(usage.ru_maxrss / 1024, 1),
+        "rows_per_second": round(rows / wall, 1) if wall else None,
+        "breakdown": breakdown,
+    }
+
+
+def settings_digest(settings: Dict[str, Any]) -> str:
+    return hashlib.sha256(json.dumps(settings, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+
+def benchmark_size(rows: int, args: argparse.Namespace, settings: Dict[str, Any]) -> Dict[str, Any]:
+    input_file = os.path.join(args.work_dir, f"events_{rows}_{settings_digest(settings)}.csv")
+    generated = None
+    if not os.path.exists(input_file):
+        start = time.perf_counter()
+        EventLogGenerator(**settings).write_csv(input_file, rows)
+        generated = round(time.perf_counter() - start, 3)
+    input_bytes = os.path.getsize(input_file)
+
+    run_dir = os.path.join(args.work_dir, f"run_{rows}")
+    shutil.rmtree(run_dir, ignore_errors=True)
+    os.makedirs(run_dir)
+
+    stages = [run_stage(
+        "pipeline_deduplication",
+        [sys.executable, os.path.join(REPO_DIR, "pipeline_deduplication.py"), "--input", os.path.abspath(input_file)]
+        + shlex.split(args.dedup_args),
+        run_dir,
+        rows
+    )]
+    if not args.skip_timeline:
+        stages.append(run_stage(
+            "pipeline_time_sequence",
+            [sys.executable, os.path.join(REPO_DIR, "pipeline_time_sequence.py")] + shlex.split(args.timeline_args),
+            run_dir,
+            rows
+        ))
+
+    if not args.keep_outputs:
+        shutil.rmtree(run_dir, ignore_errors=True)
+    if not args.keep_inputs:
+        os.remove(input_file)
+
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "git": _git_revision(),
+        "machine": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "rows": rows,
+        "input_bytes": input_bytes,
+        "generate_seconds": generated,
+        "generator": settings,
+        "dedup_args": args.dedup_args,
+        "timeline_args": args.timeline_args,
+        "stages": stages,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Run both pipelines on synthetic logs and append timings to a JSON Lines file."
+    )
+    parser.add_argument(
+        "--sizes",
+        default=DEFAULT_SIZES,
+        help="Comma-separated row counts, e.g. 100k,1m (default: %(default)s)."
+    )
+    parser.add_argument("--results", default=DEFAULT_RESULTS, help="JSON Lines file to append to (default: %(default)s).")
+    parser.add_argument("--work-dir", default=DEFAULT_WORK_DIR, help="Scratch folder for inputs and outputs (default: %(default)s).")
+    parser.add_argument("--dedup-args", default="", help="Extra arguments for pipeline_deduplication.py, e.g. \"--format parquet\".")
+    parser.add_argument("--timeline-args", default="", help="Extra arguments for pipeline_time_sequence.py.")
+    parser.add_argument("--skip-timeline", action="store_true", help="Only run pipeline_deduplication.py (e.g. with --dedup-args --with-timeline).")
+    parser.add_argument("--keep-inputs", action="store_true", help="Keep generated inputs for later runs with the same generator settings.")
+    parser.add_argument("--keep-outputs", action="store_true", help="Keep the pipeline output folders.")
+    add_generator_arguments(parser)
+    args = parser.parse_args()
+
+    os.makedirs(args.work_dir, exist_ok=True)
+    os.makedirs(os.path.dirname(os.path.abspath(args.results)), exist_ok=True)
+
+    for size in args.sizes.split(","):
+        rows = parse_size(size)
+        args.rows = rows
+        result = benchmark_size(rows, args, generator_settings(args))
+
+        with open(args.results, "a") as fh:
+            fh.write(json.dumps(result) + "\n")
+        for stage in result["stages"]:
+            print(
+                f"{rows:>12,} rows  {stage['stage']:<24} {stage['wall_seconds']:>9.2f}s  "
+                f"{stage['peak_rss_mb']:>8.1f} MB  {stage['rows_per_second']:>12,.0f} rows/s"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Generator, Iterable, Iterator, List, Optional
+
+DEFAULT_CACHE_PATH = os.path.join(".ai_cache", "responses.sqlite3")
+DEFAULT_CACHE_MB = 64
+DEFAULT_CACHE_TTL_HOURS = 24 * 7
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    content TEXT NOT NULL,
+    chunks TEXT,
+    provider TEXT,
+    size INTEGER NOT NULL,
+    created REAL NOT NULL,
+    accessed REAL NOT NULL
+)
+"""
+
+
+def cache_key(template: str, payload: str, model: str) -> str:
+    digest = hashlib.sha256()
+    for part in (template, payload, model):
+        data = part.encode("utf-8")
+        digest.update(len(data).to_bytes(8, "little"))
+        digest.update(data)
+    return digest.hexdigest()
+
+
+class AiCache:
+    def __init__(
+        self,
+        path: str = DEFAULT_CACHE_PATH,
+        max_bytes: int = DEFAULT_CACHE_MB * 2**20,
+        ttl_seconds: float = DEFAULT_CACHE_TTL_HOURS * 3600,
+        clock: Callable[[], float] = time.time
+    ):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.clock = clock
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(_SCHEMA)
+            conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def __len__(self) -> int:
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    @property
+    def size(self) -> int:
+        with self._connect() as conn:
+            return conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        now = self.clock()
+        with self._lock, self._connect() as conn:
+            row = conn.execute(
+                "SELECT content, chunks, provider, created FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            content, chunks, provider, created = row
+            if now - created > self.ttl_seconds:
+                conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                return None
+            conn.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+        return {
+            "content": content,
+            "chunks": json.loads(chunks) if chunks is not None else [content],
+            "provider": provider,
+        }
+
+    def put(self, key: str, content: str, provider: Optional[str] = None, chunks: Optional[List[str]] = None) -> None:
+        now = self.clock()
+        encoded = json.dumps(chunks) if chunks is not None else None
+        size = len(key) + len(content.encode("utf-8")) + len((encoded or "").encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (key, content, chunks, provider, size, created, accessed) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, content, encoded, provider, size, now, now)
+            )
+            self._evict(conn, now)
+
+    def _evict(self, conn: sqlite3.Connection, now: float) -> None:
+        conn.execute("DELETE FROM responses WHERE created < ?", (now - self.ttl_seconds,))
+        conn.execute(
+            "DELETE FROM responses WHERE key IN ("
+            "SELECT key FROM (SELECT key, SUM(size) OVER (ORDER BY accessed DESC, key) AS total FROM responses) "
+            "WHERE total > ?)",
+            (self.max_bytes,)
+        )
+
+    def clear(self) -> None:
+        with self._lock, self._connect() as conn:
+            conn.execute("DELETE FROM responses")
+
+    def response(self, key: str, fetch: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+        hit = self.get(key)
+        if hit is not None:
+            return {"success": True, "content": hit["content"], "provider": f"cache:{hit['provider']}", "cached": True}
+        result = fetch()
+        if result.get("success"):
+            self.put(key, result["content"], result.get("provider"))
+        return result
+
+    def stream(
+        self,
+        key: str,
+        fetch: Callable[[], Iterable[Dict[str, Any]]]
+    ) -> Generator[Dict[str, Any], None, None]:
+        hit = self.get(key)
+        if hit is not None:
+            for chunk in hit["chunks"]:
+                yield {"success": True, "chunk": chunk, "provider": f"cache:{hit['provider']}", "cached": True}
+            return
+
+        chunks = []
+        provider = None
+        failed = False
+        for chunk in fetch():
+            if chunk.get("success"):
+                chunks.append(chunk["chunk"])
+                provider = chunk.get("provider")
+            else:
+                failed = True
+            yield chunk
+        if chunks and not failed:
+            self.put(key, "".join(chunks), provider, chunks)
+
+
+_default_cache: Optional[AiCache] = None
+_default_lock = threading.Lock()
+
+
+def default_cache() -> Optional[AiCache]:
+    global _default_cache
+    path = os.environ.get("AI_CACHE_PATH", DEFAULT_CACHE_PATH)
+    if not path:
+        return None
+    with _default_lock:
+        if _default_cache is None or _default_cache.path != path:
+            _default_cache = AiCache(
+                path,
+                max_bytes=int(float(os.environ.get("AI_CACHE_MB", DEFAULT_CACHE_MB)) * 2**20),
+                ttl_seconds=float(os.environ.get("AI_CACHE_TTL_HOURS", DEFAULT_CACHE_TTL_HOURS)) * 3600
+            )
+        return _default_cache
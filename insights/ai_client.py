@@ -1,84 +1,127 @@
 import streamlit as st
+import hashlib
 import os
+import threading
 from google import genai
 from openai import OpenAI
-from typing import Dict, Any, Generator
-
-
-def get_ai_response(prompt: str) -> Dict[str, Any]:
-    gemini_keys = [
-        st.secrets.get("GEMINI_API_KEY") or os.environ.get("GEMINI_API_KEY"),
-        st.secrets.get("GEMINI_API_KEY_2") or os.environ.get("GEMINI_API_KEY_2"),
-    ]
-    gemini_keys = [k for k in gemini_keys if k]
-    openai_key = st.secrets.get("OPENAI_API_KEY") or os.environ.get("OPENAI_API_KEY")
-
-    for i, gemini_key in enumerate(gemini_keys):
-        try:
-            client = genai.Client(api_key=gemini_key)
-            response = client.models.generate_content(
-                model="gemini-2.0-flash",
-                contents=prompt
-            )
-            return {"success": True, "content": response.text, "provider": f"gemini_{i + 1}"}
-        except Exception as e:
-            if i == len(gemini_keys) - 1 and not openai_key:
-                return {"success": False, "error": f"All Gemini keys failed: {str(e)}"}
-
-    if openai_key:
-        try:
-            client = OpenAI(api_key=openai_key)
-            response = client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[{"role": "user", "content": prompt}],
-                max_tokens=2000
-            )
-            return {"success": True, "content": response.choices[0].message.content, "provider": "openai"}
-        except Exception as e:
-            return {"success": False, "error": f"OpenAI failed: {str(e)}"}
-
-    return {"success": False, "error": "No API keys configured in st.secrets"}
-
-
-def get_ai_response_stream(prompt: str) -> Generator[Dict[str, Any], None, None]:
-    gemini_keys = [
-        st.secrets.get("GEMINI_API_KEY") or os.environ.get("GEMINI_API_KEY"),
-        st.secrets.get("GEMINI_API_KEY_2") or os.environ.get("GEMINI_API_KEY_2"),
-    ]
-    gemini_keys = [k for k in gemini_keys if k]
-    openai_key = st.secrets.get("OPENAI_API_KEY") or os.environ.get("OPENAI_API_KEY")
-
-    for i, gemini_key in enumerate(gemini_keys):
-        try:
-            client = genai.Client(api_key=gemini_key)
-            response = client.models.generate_content_stream(
-                model="gemini-2.0-flash",
-                contents=prompt
-            )
-            for chunk in response:
-                if chunk.text:
-                    yield {"success": True, "chunk": chunk.text, "provider": f"gemini_{i + 1}"}
-            return
-        except Exception as e:
-            if i == len(gemini_keys) - 1 and not openai_key:
-                yield {"success": False, "error": f"All Gemini keys failed: {str(e)}"}
-                return
-
-    if openai_key:
-        try:
-            client = OpenAI(api_key=openai_key)
-            response = client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[{"role": "user", "content": prompt}],
-                max_tokens=2000,
-                stream=True
+from typing import Dict, Any, Generator, Iterator, List, Optional, Tuple
+
+from insights import ai_cache
+from insights.provider_pool import CircuitBreaker, Provider, ProviderPool
+
+GEMINI_MODEL = "gemini-2.0-flash"
+OPENAI_MODEL = "gpt-4o-mini"
+
+
+def response_cache_key(template: str, payload: str) -> str:
+    return ai_cache.cache_key(template, payload, f"{GEMINI_MODEL},{OPENAI_MODEL}")
+
+
+def get_ai_response(prompt: str, cache_key: Optional[str] = None) -> Dict[str, Any]:
+    cache = ai_cache.default_cache() if cache_key is not None else None
+    if cache is None:
+        return _get_ai_response(prompt)
+    return cache.response(cache_key, lambda: _get_ai_response(prompt))
+
+
+def get_ai_response_stream(prompt: str, cache_key: Optional[str] = None) -> Generator[Dict[str, Any], None, None]:
+    cache = ai_cache.default_cache() if cache_key is not None else None
+    if cache is None:
+        return _get_ai_response_stream(prompt)
+    return cache.stream(cache_key, lambda: _get_ai_response_stream(prompt))
+
+
+class GeminiProvider(Provider):
+    def __init__(self, name: str, api_key: str):
+        self.name = name
+        self.client = genai.Client(api_key=api_key)
+
+    def complete(self, prompt: str) -> str:
+        return self.client.models.generate_content(model=GEMINI_MODEL, contents=prompt).text
+
+    def stream(self, prompt: str) -> Iterator[str]:
+        for chunk in self.client.models.generate_content_stream(model=GEMINI_MODEL, contents=prompt):
+            if chunk.text:
+                yield chunk.text
+
+
+class OpenAIProvider(Provider):
+    def __init__(self, name: str, api_key: str):
+        self.name = name
+        self.client = OpenAI(api_key=api_key)
+
+    def complete(self, prompt: str) -> str:
+        response = self.client.chat.completions.create(
+            model=OPENAI_MODEL,
+            messages=[{"role": "user", "content": prompt}],
+            max_tokens=2000
+        )
+        return response.choices[0].message.content
+
+    def stream(self, prompt: str) -> Iterator[str]:
+        response = self.client.chat.completions.create(
+            model=OPENAI_MODEL,
+            messages=[{"role": "user", "content": prompt}],
+            max_tokens=2000,
+            stream=True
+        )
+        for chunk in response:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+
+_pool: Optional[ProviderPool] = None
+_pool_config: Optional[Tuple] = None
+_pool_lock = threading.Lock()
+_breakers: Dict[str, CircuitBreaker] = {}
+
+
+def _setting(name: str) -> Optional[str]:
+    return st.secrets.get(name) or os.environ.get(name)
+
+
+def _breaker_for(api_key: str) -> CircuitBreaker:
+    fingerprint = hashlib.sha256(api_key.encode("utf-8")).hexdigest()
+    if fingerprint not in _breakers:
+        _breakers[fingerprint] = CircuitBreaker()
+    return _breakers[fingerprint]
+
+
+def get_provider_pool() -> ProviderPool:
+    global _pool, _pool_config
+    gemini_keys = [k for k in (_setting("GEMINI_API_KEY"), _setting("GEMINI_API_KEY_2")) if k]
+    openai_key = _setting("OPENAI_API_KEY")
+    hedge_delay = _setting("AI_HEDGE_DELAY_SECONDS")
+    config = (tuple(gemini_keys), openai_key, hedge_delay)
+
+    with _pool_lock:
+        if _pool is None or _pool_config != config:
+            providers: List[Provider] = [
+                GeminiProvider(f"gemini_{i + 1}", key) for i, key in enumerate(gemini_keys)
+            ]
+            keys = list(gemini_keys)
+            if openai_key:
+                providers.append(OpenAIProvider("openai", openai_key))
+                keys.append(openai_key)
+            _pool = ProviderPool(
+                providers,
+                float(hedge_delay) if hedge_delay else None,
+                breakers={p.name: _breaker_for(key) for p, key in zip(providers, keys)}
             )
-            for chunk in response:
-                if chunk.choices and chunk.choices[0].delta.content:
-                    yield {"success": True, "chunk": chunk.choices[0].delta.content, "provider": "openai"}
-            return
-        except Exception as e:
-            yield {"success": False, "error": f"OpenAI streaming failed: {str(e)}"}
-            return
-
-    yield {"success": False, "error": "No API keys configured in st.secrets"}
+            _pool_config = config
+        return _pool
+
+
+def _get_ai_response(prompt: str) -> Dict[str, Any]:
+    pool = get_provider_pool()
+    if not pool.providers:
+        return {"success": False, "error": "No API keys configured in st.secrets"}
+    return pool.response(prompt)
+
+
+def _get_ai_response_stream(prompt: str) -> Generator[Dict[str, Any], None, None]:
+    pool = get_provider_pool()
+    if not pool.providers:
+        yield {"success": False, "error": "No API keys configured in st.secrets"}
+        return
+    yield from pool.stream(prompt)
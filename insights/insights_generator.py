@@ -1,6 +1,6 @@
 from typing import Dict, Any, Generator
-from insights.ai_client import get_ai_response, get_ai_response_stream
-import json
+from insights.payload_builder import payload_to_prompt
+from insights.ai_client import get_ai_response, get_ai_response_stream, response_cache_key
 
 SYSTEM_PROMPT = """You are a senior product analyst and revenue strategist for a commuter/transportation application.
 
@@ -90,14 +90,25 @@ CRITICAL: If revenue data is insufficient, state clearly: "Revenue analysis limi
 FORMAT: Use markdown with tables where appropriate. Keep response under 1000 words."""
 
 
-def generate_insights_safe(payload: Dict[str, Any], api_key: str = None) -> Dict[str, Any]:
-    prompt = f"{SYSTEM_PROMPT}\n\nUSER EVENT DATA:\n{json.dumps(payload, indent=2)}"
-    return get_ai_response(prompt)
-
-
-def generate_insights_stream(payload: Dict[str, Any]) -> Generator[str, None, None]:
-    prompt = f"{SYSTEM_PROMPT}\n\nUSER EVENT DATA:\n{json.dumps(payload, indent=2)}"
-    for chunk in get_ai_response_stream(prompt):
+def generate_insights_safe(
+    payload: Dict[str, Any],
+    api_key: str = None,
+    payload_format: str = None,
+    use_cache: bool = True
+) -> Dict[str, Any]:
+    data = payload_to_prompt(payload, payload_format)
+    prompt = f"{SYSTEM_PROMPT}\n\nUSER EVENT DATA:\n{data}"
+    return get_ai_response(prompt, response_cache_key(SYSTEM_PROMPT, data) if use_cache else None)
+
+
+def generate_insights_stream(
+    payload: Dict[str, Any],
+    payload_format: str = None,
+    use_cache: bool = True
+) -> Generator[str, None, None]:
+    data = payload_to_prompt(payload, payload_format)
+    prompt = f"{SYSTEM_PROMPT}\n\nUSER EVENT DATA:\n{data}"
+    for chunk in get_ai_response_stream(prompt, response_cache_key(SYSTEM_PROMPT, data) if use_cache else None):
         if chunk.get("success"):
             yield chunk["chunk"]
         elif chunk.get("error"):
@@ -1,63 +1,163 @@
 import pandas as pd
-from typing import List, Dict, Any
+import numpy as np
+from typing import List, Dict, Any, Optional
 from datetime import datetime
 
+from pipelines.timestamps import format_event_dates, format_event_times, local_ns, parse_event_time_series
+from pipelines.user_summary import SESSION_GAP_MINUTES, session_starts
 
-def build_user_journey(user_df: pd.DataFrame) -> Dict[str, Any]:
-    if user_df.empty:
-        return {
-            "user_id": None,
-            "total_events": 0,
-            "unique_event_types": 0,
-            "events": [],
-            "metadata": {}
-        }
-
-    user_df = user_df.sort_values(["event_date", "event_time_only"]).reset_index(drop=True)
-    user_id = user_df["user_uuid"].iloc[0]
-
-    events = []
-    for idx, row in user_df.iterrows():
-        events.append({
-            "sequence": idx + 1,
-            "event_name": row["event_name"],
-            "category": row["category"],
-            "date": row["event_date"],
-            "day": row["event_day"],
-            "time": str(row["event_time_only"]).strip("'")
+_NS_PER_DAY = 86_400 * 1_000_000_000
+
+
+_JOURNEY_KEYS = ("user_id", "total_events", "unique_event_types", "events", "metadata")
+
+
+class Journey:
+    __slots__ = ("user_id", "event_time", "event_name", "category", "date", "day", "time", "metadata", "_events")
+
+    def __init__(
+        self,
+        user_id: Any,
+        event_time: np.ndarray,
+        event_name: np.ndarray,
+        category: np.ndarray,
+        date: np.ndarray,
+        day: np.ndarray,
+        time: np.ndarray,
+        metadata: Dict[str, Any]
+    ):
+        self.user_id = user_id
+        self.event_time = event_time
+        self.event_name = event_name
+        self.category = category
+        self.date = date
+        self.day = day
+        self.time = time
+        self.metadata = metadata
+        self._events: Optional[List[Dict[str, Any]]] = None
+
+    def __len__(self) -> int:
+        return len(self.event_name)
+
+    @property
+    def total_events(self) -> int:
+        return len(self.event_name)
+
+    @property
+    def unique_event_types(self) -> int:
+        return self.metadata.get("unique_event_types", 0)
+
+    def records(self, start: int = 0, stop: Optional[int] = None) -> List[Dict[str, Any]]:
+        stop = len(self) if stop is None else min(stop, len(self))
+        return [
+            {
+                "sequence": i + 1,
+                "event_name": self.event_name[i],
+                "category": self.category[i],
+                "date": self.date[i],
+                "day": self.day[i],
+                "time": self.time[i]
+            }
+            for i in range(start, stop)
+        ]
+
+    @property
+    def events(self) -> List[Dict[str, Any]]:
+        if self._events is None:
+            self._events = self.records()
+        return self._events
+
+    def session_lengths(self, gap_minutes: float = SESSION_GAP_MINUTES) -> np.ndarray:
+        if not len(self):
+            return np.empty(0, dtype=np.int64)
+        group_starts = np.zeros(len(self), dtype=bool)
+        group_starts[0] = True
+        valid = self.event_time != np.iinfo(np.int64).min
+        return np.diff(np.r_[np.flatnonzero(session_starts(self.event_time, group_starts, gap_minutes, valid)), len(self)])
+
+    def sessions(
+        self,
+        gap_minutes: float = SESSION_GAP_MINUTES,
+        lengths: Optional[np.ndarray] = None
+    ) -> List[List[Dict[str, Any]]]:
+        if lengths is None or int(np.sum(lengths)) != len(self):
+            lengths = self.session_lengths(gap_minutes)
+        bounds = np.r_[0, np.cumsum(lengths)]
+        events = self.events
+        return [events[start:stop] for start, stop in zip(bounds[:-1], bounds[1:])]
+
+    def to_frame(self) -> pd.DataFrame:
+        return pd.DataFrame({
+            "sequence": np.arange(1, len(self) + 1),
+            "event_name": self.event_name,
+            "category": self.category,
+            "date": self.date,
+            "day": self.day,
+            "time": self.time
         })
 
-    first_event = user_df.iloc[0]
-    last_event = user_df.iloc[-1]
+    def __getitem__(self, key: str) -> Any:
+        if key not in _JOURNEY_KEYS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return getattr(self, key) if key in _JOURNEY_KEYS else default
+
+    def keys(self):
+        return iter(_JOURNEY_KEYS)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {key: getattr(self, key) for key in _JOURNEY_KEYS}
 
-    first_date = pd.to_datetime(first_event["event_date"])
-    last_date = pd.to_datetime(last_event["event_date"])
-    span_days = (last_date - first_date).days + 1
 
+def _empty_journey() -> Journey:
+    empty = np.empty(0, dtype=object)
+    return Journey(None, np.empty(0, dtype=np.int64), empty, empty, empty, empty, empty, {})
+
+
+def build_journey(user_df: pd.DataFrame) -> Journey:
+    if user_df.empty:
+        return _empty_journey()
+
+    event_time = user_df["event_time"]
+    if not pd.api.types.is_datetime64_any_dtype(event_time):
+        event_time = parse_event_time_series(event_time)
+    local = local_ns(event_time)
+    order = np.argsort(np.where(event_time.isna().to_numpy(), np.iinfo(np.int64).max, local), kind="stable")
+    event_time = event_time.iloc[order]
+    local = local[order]
+
+    date, day = format_event_dates(event_time)
+    time = format_event_times(event_time)
+    event_name = user_df["event_name"].astype(str).to_numpy(dtype=object)[order]
+    category = user_df["category"].astype(str).to_numpy(dtype=object)[order]
+
+    first_day, last_day = local[[0, -1]] // _NS_PER_DAY
     metadata = {
-        "total_events": len(user_df),
-        "unique_event_types": user_df["event_name"].nunique(),
+        "total_events": len(order),
+        "unique_event_types": len(pd.unique(event_name)),
         "date_range": {
-            "first_event": f"{first_event['event_date']} {str(first_event['event_time_only']).strip(chr(39))}",
-            "last_event": f"{last_event['event_date']} {str(last_event['event_time_only']).strip(chr(39))}",
-            "span_days": span_days
+            "first_event": f"{date[0]} {time[0]}",
+            "last_event": f"{date[-1]} {time[-1]}",
+            "span_days": int(last_day - first_day) + 1
         },
-        "event_categories": user_df["category"].value_counts().to_dict(),
-        "event_breakdown": user_df["event_name"].value_counts().to_dict()
+        "event_categories": pd.Series(category).value_counts().to_dict(),
+        "event_breakdown": pd.Series(event_name).value_counts().to_dict()
     }
 
-    return {
-        "user_id": user_id,
-        "total_events": metadata["total_events"],
-        "unique_event_types": metadata["unique_event_types"],
-        "events": events,
-        "metadata": metadata
-    }
+    return Journey(str(user_df["user_uuid"].iloc[order[0]]), local, event_name, category, date, day, time, metadata)
+
+
+def build_user_journey(user_df: pd.DataFrame) -> Dict[str, Any]:
+    return build_journey(user_df).to_dict()
 
 
 def format_journey_for_display(journey: Dict[str, Any]) -> str:
     if journey["total_events"] == 0:
         return "No events found for this user."
+    if isinstance(journey, Journey):
+        return " -> ".join(journey.event_name)
     event_names = [e["event_name"] for e in journey["events"]]
     return " -> ".join(event_names)
 
@@ -65,6 +165,8 @@ def format_journey_for_display(journey: Dict[str, Any]) -> str:
 def get_journey_dataframe(journey: Dict[str, Any]) -> pd.DataFrame:
     if journey["total_events"] == 0:
         return pd.DataFrame()
+    if isinstance(journey, Journey):
+        return journey.to_frame()
     return pd.DataFrame(journey["events"])
 
 
@@ -102,7 +204,7 @@ def split_into_sessions(events: List[Dict], gap_minutes: int = 30) -> List[List[
                 current_session = [curr_event]
             else:
                 current_session.append(curr_event)
-        except:
+        except (ValueError, TypeError):
             current_session.append(curr_event)
     
     if current_session:
@@ -115,15 +217,18 @@ def build_mermaid_flowchart(journey: Dict[str, Any], max_nodes: int = 50, catego
     if journey["total_events"] == 0:
         return "flowchart LR\n    A[No Events Found]"
     
-    events = journey["events"]
-    
-    if category_filter == "application":
-        events = [e for e in events if e.get("category", "").lower() == "application"]
-    
-    if not events:
-        return "flowchart LR\n    A[No Events Found]"
-    
-    sessions = split_into_sessions(events, gap_minutes=30)
+    if isinstance(journey, Journey) and category_filter != "application":
+        sessions = journey.sessions()
+    else:
+        events = journey["events"]
+        
+        if category_filter == "application":
+            events = [e for e in events if e.get("category", "").lower() == "application"]
+        
+        if not events:
+            return "flowchart LR\n    A[No Events Found]"
+        
+        sessions = split_into_sessions(events, gap_minutes=30)
     
     lines = ["flowchart TD"]
     node_counter = 1
@@ -1,5 +1,6 @@
 from typing import Dict, Any
-from insights.ai_client import get_ai_response
+from insights.payload_builder import payload_to_prompt
+from insights.ai_client import get_ai_response, response_cache_key
 import json
 import re
 
@@ -45,9 +46,15 @@ VALIDATION:
 OUTPUT: Return ONLY the JSON object. Any deviation will cause parsing failure."""
 
 
-def interpret_journey_safe(payload: Dict[str, Any], api_key: str = None) -> Dict[str, Any]:
-    prompt = f"{SYSTEM_PROMPT}\n\nUSER EVENT DATA:\n{json.dumps(payload, indent=2)}"
-    result = get_ai_response(prompt)
+def interpret_journey_safe(
+    payload: Dict[str, Any],
+    api_key: str = None,
+    payload_format: str = None,
+    use_cache: bool = True
+) -> Dict[str, Any]:
+    data = payload_to_prompt(payload, payload_format)
+    prompt = f"{SYSTEM_PROMPT}\n\nUSER EVENT DATA:\n{data}"
+    result = get_ai_response(prompt, response_cache_key(SYSTEM_PROMPT, data) if use_cache else None)
     
     if not result["success"]:
         return result
@@ -68,6 +75,8 @@ def interpret_journey_safe(payload: Dict[str, Any], api_key: str = None) -> Dict
         return {
             "success": True,
             "content": content,
+            "provider": result.get("provider"),
+            "cached": result.get("cached", False),
             "parsed": parsed,
             "is_structured": True
         }
@@ -75,6 +84,8 @@ def interpret_journey_safe(payload: Dict[str, Any], api_key: str = None) -> Dict
         return {
             "success": True,
             "content": content,
+            "provider": result.get("provider"),
+            "cached": result.get("cached", False),
             "parsed": None,
             "is_structured": False,
             "parse_error": str(e)
@@ -1,11 +1,25 @@
 import pandas as pd
-from typing import Dict, Any
+import numpy as np
+from typing import Dict, Any, List, Optional
 import json
 
+from pipelines.timestamps import format_event_dates, format_event_times, local_ns
+from pipelines.user_summary import SESSION_GAP_MINUTES
 
-def build_ai_payload(user_df: pd.DataFrame, repetition_df: pd.DataFrame, user_id: str) -> Dict[str, Any]:
+PAYLOAD_FORMATS = ["verbose", "compact"]
+DEFAULT_PAYLOAD_FORMAT = "verbose"
+
+COMPACT_PAYLOAD_GUIDE = """EVENT ENCODING: events refer to "event_names" and "categories" by index. "days" holds each date's sessions (split on gaps over 30 minutes), with first and last event times. Each event is [name, seconds after session start], plus a count when the event repeats back to back, plus a category when there are several. "repeated_events" rows are [name, frequency, repetitions_removed]."""
+
+
+def build_ai_payload(
+    user_df: pd.DataFrame,
+    repetition_df: pd.DataFrame,
+    user_id: str,
+    payload_format: str = DEFAULT_PAYLOAD_FORMAT
+) -> Dict[str, Any]:
     if user_df.empty:
-        return {
+        payload = {
             "user_id": user_id,
             "events_ordered": [],
             "repetition_summary": {
@@ -15,27 +29,44 @@ def build_ai_payload(user_df: pd.DataFrame, repetition_df: pd.DataFrame, user_id
                 "repeated_events": []
             }
         }
+        return compact_payload(payload) if payload_format == "compact" else payload
 
-    user_df = user_df.sort_values(["event_date", "event_time_only"]).reset_index(drop=True)
+    event_time = user_df["event_time"]
+    order = np.argsort(
+        np.where(event_time.isna().to_numpy(), np.iinfo(np.int64).max, local_ns(event_time)),
+        kind="stable"
+    )
+    event_time = event_time.iloc[order]
+    dates, days = format_event_dates(event_time)
+    times = format_event_times(event_time)
+    names = user_df["event_name"].astype(str).to_numpy(dtype=object)[order]
+    categories = user_df["category"].astype(str).to_numpy(dtype=object)[order]
 
-    events_ordered = []
-    for _, row in user_df.iterrows():
-        events_ordered.append({
-            "event_date": str(row["event_date"]),
-            "event_time": str(row["event_time_only"]).strip("'"),
-            "event_name": str(row["event_name"]),
-            "category": str(row["category"]),
-            "event_day": str(row["event_day"])
-        })
+    events_ordered = [
+        {
+            "event_date": str(date),
+            "event_time": str(time),
+            "event_name": name,
+            "category": category,
+            "event_day": str(day)
+        }
+        for date, time, name, category, day in zip(dates, times, names, categories, days)
+    ]
 
     repeated_events = []
     if not repetition_df.empty:
-        for _, row in repetition_df.iterrows():
-            repeated_events.append({
-                "event_name": str(row["event_name"]),
-                "frequency": int(row["frequency"]),
-                "repetitions_removed": int(row["repetitions_removed"])
-            })
+        repeated_events = [
+            {
+                "event_name": name,
+                "frequency": int(frequency),
+                "repetitions_removed": int(removed)
+            }
+            for name, frequency, removed in zip(
+                repetition_df["event_name"].astype(str),
+                repetition_df["frequency"],
+                repetition_df["repetitions_removed"]
+            )
+        ]
 
     most_repeated = None
     if repeated_events:
@@ -48,12 +79,99 @@ def build_ai_payload(user_df: pd.DataFrame, repetition_df: pd.DataFrame, user_id
         "repeated_events": repeated_events
     }
 
-    return {
+    payload = {
         "user_id": user_id,
         "events_ordered": events_ordered,
         "repetition_summary": repetition_summary
     }
+    return compact_payload(payload) if payload_format == "compact" else payload
+
+
+def _clock_seconds(time: str) -> Optional[int]:
+    if len(time) < 8 or not (time[:2] + time[3:5] + time[6:8]).isdigit():
+        return None
+    return int(time[:2]) * 3600 + int(time[3:5]) * 60 + int(time[6:8])
+
+
+def _lookup(values: List[str]) -> Dict[str, int]:
+    return {value: i for i, value in enumerate(dict.fromkeys(values))}
+
+
+def compact_payload(payload: Dict[str, Any], gap_minutes: float = SESSION_GAP_MINUTES) -> Dict[str, Any]:
+    if payload.get("format") == "compact":
+        return payload
+
+    events = payload["events_ordered"]
+    summary = payload["repetition_summary"]
+    name_ids = _lookup([e["event_name"] for e in events] + [r["event_name"] for r in summary["repeated_events"]])
+    category_ids = _lookup([e["category"] for e in events])
+    with_category = len(category_ids) > 1
+
+    days: List[Dict[str, Any]] = []
+    session: Optional[Dict[str, Any]] = None
+    session_start = previous = None
+    run: Optional[list] = None
+    for event in events:
+        date = event["event_date"]
+        clock = event["event_time"]
+        seconds = _clock_seconds(clock)
+        if not days or days[-1]["date"] != date:
+            days.append({"date": date, "day": event["event_day"], "sessions": []})
+            session = None
+        elif session is not None and seconds is not None and previous is not None \
+                and (seconds - previous) / 60 > gap_minutes:
+            session = None
+        if seconds is not None:
+            previous = seconds
+        if session is None:
+            session = {"start": clock[:8], "end": clock[:8], "events": []}
+            days[-1]["sessions"].append(session)
+            session_start = seconds
+            run = None
+        elif seconds is not None:
+            session["end"] = clock[:8]
+
+        name = name_ids[event["event_name"]]
+        category = category_ids[event["category"]]
+        if run is not None and run[0] == name and (not with_category or run[3] == category):
+            run[2] += 1
+            continue
+        offset = seconds - session_start if seconds is not None and session_start is not None else None
+        run = [name, offset, 1, category] if with_category else [name, offset, 1]
+        session["events"].append(run)
+
+    if not with_category:
+        for day in days:
+            for session in day["sessions"]:
+                session["events"] = [run if run[2] > 1 else run[:2] for run in session["events"]]
+
+    return {
+        "user_id": payload["user_id"],
+        "format": "compact",
+        "event_names": list(name_ids),
+        "categories": list(category_ids),
+        "days": days,
+        "repetition_summary": {
+            "total_events": summary["total_events"],
+            "unique_event_types": summary["unique_event_types"],
+            "most_repeated_event": summary["most_repeated_event"],
+            "repeated_events": [
+                [name_ids[r["event_name"]], r["frequency"], r["repetitions_removed"]]
+                for r in summary["repeated_events"]
+            ]
+        }
+    }
 
 
 def payload_to_json(payload: Dict[str, Any]) -> str:
-    return json.dumps(payload, indent=2)
\ No newline at end of file
+    if payload.get("format") == "compact":
+        return json.dumps(payload, separators=(",", ":"))
+    return json.dumps(payload, indent=2)
+
+
+def payload_to_prompt(payload: Dict[str, Any], payload_format: Optional[str] = None) -> str:
+    if payload_format == "compact":
+        payload = compact_payload(payload)
+    if payload.get("format") == "compact":
+        return f"{COMPACT_PAYLOAD_GUIDE}\n\n{payload_to_json(payload)}"
+    return payload_to_json(payload)
@@ -0,0 +1,252 @@
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Generator, Iterator, List, Optional
+
+KEY_ERROR_STATUSES = {401, 403, 429}
+
+
+class Provider:
+    name = "provider"
+
+    def complete(self, prompt: str) -> str:
+        raise NotImplementedError
+
+    def stream(self, prompt: str) -> Iterator[str]:
+        yield self.complete(prompt)
+
+
+def is_key_error(error: Exception) -> bool:
+    status = getattr(error, "status_code", None) or getattr(error, "code", None)
+    return status in KEY_ERROR_STATUSES
+
+
+class CircuitBreaker:
+    def __init__(
+        self,
+        failure_threshold: int = 3,
+        base_delay: float = 30.0,
+        max_delay: float = 900.0,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.failure_threshold = failure_threshold
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.clock = clock
+        self.state = "closed"
+        self.failures = 0
+        self.trips = 0
+        self.open_until = 0.0
+        self._probe_started: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def acquire(self) -> Optional[str]:
+        with self._lock:
+            now = self.clock()
+            if self.state == "closed":
+                return "closed"
+            if self.state == "open":
+                if now < self.open_until:
+                    return None
+                self.state = "half_open"
+            if self._probe_started is not None and now - self._probe_started < self.base_delay:
+                return None
+            self._probe_started = now
+            return "probe"
+
+    def release(self) -> None:
+        with self._lock:
+            self._probe_started = None
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.state = "closed"
+            self.failures = 0
+            self.trips = 0
+            self._probe_started = None
+
+    def record_failure(self, fatal: bool = False) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.state == "half_open" or fatal or self.failures >= self.failure_threshold:
+                delay = min(self.max_delay, self.base_delay * 2 ** self.trips)
+                self.trips += 1
+                self.state = "open"
+                self.open_until = self.clock() + delay
+                self._probe_started = None
+
+    def retry_in(self) -> float:
+        with self._lock:
+            return max(0.0, self.open_until - self.clock()) if self.state == "open" else 0.0
+
+
+class _Attempt:
+    def __init__(self, provider: Provider, breaker: CircuitBreaker, probe: bool):
+        self.provider = provider
+        self.breaker = breaker
+        self.probe = probe
+        self.cancelled = threading.Event()
+
+    @property
+    def label(self) -> str:
+        return f"{self.provider.name} (half-open probe)" if self.probe else self.provider.name
+
+
+def _describe(attempt: _Attempt, skipped: List[str]) -> str:
+    if not skipped:
+        return attempt.label
+    return f"{attempt.label} [skipped {'; '.join(skipped)}]"
+
+
+class ProviderPool:
+    def __init__(
+        self,
+        providers: List[Provider],
+        hedge_delay: Optional[float] = None,
+        breakers: Optional[Dict[str, CircuitBreaker]] = None
+    ):
+        self.providers = list(providers)
+        self.hedge_delay = hedge_delay
+        breakers = breakers or {}
+        self.breakers = {p.name: breakers.get(p.name) or CircuitBreaker() for p in self.providers}
+
+    def _skip_cancelled(self, attempt: _Attempt, events: queue.Queue) -> bool:
+        if not attempt.cancelled.is_set():
+            return False
+        attempt.breaker.release()
+        events.put(("cancelled", attempt, None))
+        return True
+
+    def _complete(self, attempt: _Attempt, prompt: str, events: queue.Queue) -> None:
+        if self._skip_cancelled(attempt, events):
+            return
+        try:
+            content = attempt.provider.complete(prompt)
+        except Exception as e:
+            attempt.breaker.record_failure(is_key_error(e))
+            events.put(("error", attempt, e))
+            return
+        attempt.breaker.record_success()
+        events.put(("done", attempt, content))
+
+    def _stream(self, attempt: _Attempt, prompt: str, events: queue.Queue) -> None:
+        if self._skip_cancelled(attempt, events):
+            return
+        chunks = None
+        try:
+            chunks = attempt.provider.stream(prompt)
+            for chunk in chunks:
+                if attempt.cancelled.is_set():
+                    attempt.breaker.release()
+                    events.put(("cancelled", attempt, None))
+                    return
+                if chunk:
+                    events.put(("chunk", attempt, chunk))
+            attempt.breaker.record_success()
+            events.put(("done", attempt, None))
+        except Exception as e:
+            attempt.breaker.record_failure(is_key_error(e))
+            events.put(("error", attempt, e))
+        finally:
+            close = getattr(chunks, "close", None)
+            if close is not None:
+                close()
+
+    def _race(self, prompt: str, run, skipped: List[str]) -> Generator[tuple, None, None]:
+        # Each request gets its own threads, one per provider, so every launch
+        # starts at once and a blocking loser that runs on after the race only
+        # holds a thread of its own request.
+        executor = ThreadPoolExecutor(max_workers=len(self.providers), thread_name_prefix="ai-provider")
+        events: queue.Queue = queue.Queue()
+        attempts: List[_Attempt] = []
+        errors: List[str] = []
+        winner: Optional[_Attempt] = None
+        next_index = 0
+
+        def launch() -> bool:
+            nonlocal next_index
+            while next_index < len(self.providers):
+                provider = self.providers[next_index]
+                next_index += 1
+                breaker = self.breakers[provider.name]
+                decision = breaker.acquire()
+                if decision is None:
+                    skipped.append(f"{provider.name} circuit open, retry in {breaker.retry_in():.0f}s")
+                    continue
+                attempt = _Attempt(provider, breaker, decision == "probe")
+                attempts.append(attempt)
+                executor.submit(run, attempt, prompt, events)
+                return True
+            return False
+
+        try:
+            running = int(launch())
+            if not running:
+                yield "failed", None, "All providers unavailable: " + "; ".join(skipped)
+                return
+            while True:
+                hedge = winner is None and next_index < len(self.providers)
+                try:
+                    kind, attempt, value = events.get(timeout=self.hedge_delay if hedge else None)
+                except queue.Empty:
+                    running += launch()
+                    continue
+
+                if winner is not None and attempt is not winner:
+                    continue
+                if kind == "cancelled":
+                    running -= 1
+                    continue
+                if kind == "error":
+                    running -= 1
+                    errors.append(f"{attempt.label}: {value}")
+                    if winner is not None:
+                        yield "error", attempt, f"{attempt.provider.name} failed mid-stream: {value}"
+                        return
+                    running += launch()
+                    if running == 0:
+                        yield "failed", None, "All providers failed: " + "; ".join(errors + skipped)
+                        return
+                    continue
+
+                if winner is None:
+                    winner = attempt
+                    for other in attempts:
+                        if other is not winner:
+                            other.cancelled.set()
+                yield kind, attempt, value
+                if kind == "done":
+                    return
+        finally:
+            for attempt in attempts:
+                attempt.cancelled.set()
+            executor.shutdown(wait=False)
+
+    def response(self, prompt: str) -> Dict[str, Any]:
+        if not self.providers:
+            return {"success": False, "error": "No AI providers configured"}
+        skipped: List[str] = []
+        race = self._race(prompt, self._complete, skipped)
+        try:
+            kind, attempt, value = next(race)
+        finally:
+            race.close()
+        if kind == "done":
+            return {"success": True, "content": value, "provider": _describe(attempt, skipped)}
+        return {"success": False, "error": value}
+
+    def stream(self, prompt: str) -> Generator[Dict[str, Any], None, None]:
+        if not self.providers:
+            yield {"success": False, "error": "No AI providers configured"}
+            return
+        skipped: List[str] = []
+        race = self._race(prompt, self._stream, skipped)
+        try:
+            for kind, attempt, value in race:
+                if kind == "chunk":
+                    yield {"success": True, "chunk": value, "provider": _describe(attempt, skipped)}
+                elif kind in ("error", "failed"):
+                    yield {"success": False, "error": value}
+        finally:
+            race.close()
@@ -1,7 +1,35 @@
 import pandas as pd
+import argparse
 import os
 from pathlib import Path
 
+from pipelines.dedup import (
+    BURST_TABLE,
+    DERIVED_COLUMNS,
+    SORT_KEYS,
+    sort_events,
+    mark_canonical,
+    select_canonical,
+    summarize_repetitions,
+    summarize_bursts,
+    build_unique_users,
+    build_unique_users_report,
+    write_per_user_files,
+    write_per_user_rows,
+)
+from pipelines.backends import BACKENDS, DEFAULT_BACKEND, create_backend, run_backend_dedup
+from pipelines.checkpoint import Checkpoint, has_checkpoint, input_digests
+from pipelines.external_sort import DEFAULT_MEMORY_BUDGET, run_external_dedup
+from pipelines.incremental import apply_increment, has_state, initialize_state
+from pipelines.inputs import default_read_workers, read_raw_events, resolve_inputs
+from pipelines.instrumentation import RunManifest, add_instrumentation_arguments, recorded_run, stage, timed
+from pipelines.sharding import run_sharded_dedup
+from pipelines.storage import DEFAULT_OUTPUT_FORMAT, OUTPUT_FORMATS, read_table, write_table
+from pipelines.timeline import write_fused_timeline
+from pipelines.timestamps import parse_event_time_series
+from pipelines.user_store import DEFAULT_PER_USER_LAYOUT, PER_USER_LAYOUTS, write_event_outputs, writes_per_user_files
+from pipelines.user_summary import SESSIONS_TABLE, USER_SUMMARY_TABLE, summarize_sessions, summarize_users
+
 INPUT_FILE = "Commuter Users Event data.csv"
 THRESHOLD_MS = 50
 
@@ -9,105 +37,349 @@ SCRIPT_NAME = Path(__file__).stem
 BASE_DIR = SCRIPT_NAME
 PER_USER_DIR = os.path.join(BASE_DIR, "per_user_cleaned_events")
 
-if os.path.exists(BASE_DIR):
-    raise RuntimeError(f"Output folder '{BASE_DIR}' already exists.")
+TIMELINE_DIR = "pipeline_time_sequence"
+TIMELINE_PER_USER_DIR = os.path.join(TIMELINE_DIR, "per_user_timelines")
 
-os.makedirs(PER_USER_DIR)
 
-df = pd.read_csv(INPUT_FILE)
+def load_marked_events(args: argparse.Namespace, threshold_ms: float) -> pd.DataFrame:
+    df = timed("read_inputs", read_raw_events, args.input_files, args.read_workers)
+    df = timed("sort", sort_events, df)
+    return timed("mark_canonical", mark_canonical, df, threshold_ms)
 
-df["event_time"] = pd.to_datetime(
-    df["event_time"],
-    format="%Y-%m-%d %H:%M:%S.%f %z",
-    errors="raise"
-)
 
-df["event_date"] = df["event_time"].dt.strftime("%Y-%m-%d")
-df["event_day"] = df["event_time"].dt.day_name()
-df["event_time_only"] = (
-    df["event_time"]
-    .dt.strftime("%H:%M:%S.%f")
-    .apply(lambda x: f"'{x}")
-)
+def write_user_count(total_users: int, output_format: str, base_dir: str = BASE_DIR) -> None:
+    write_table(
+        build_unique_users_report(total_users),
+        base_dir,
+        "unique_users_count",
+        output_format
+    )
 
-df = df.sort_values(
-    by=["user_uuid", "event_name", "event_date", "event_time_only"],
-    kind="mergesort"
-).reset_index(drop=True)
 
-df["time_diff_ms"] = (
-    df.groupby(["user_uuid", "event_name"])["event_time"]
-      .diff()
-      .dt.total_seconds()
-      .mul(1000)
-)
+def checkpoint_key(args: argparse.Namespace, manifest: RunManifest) -> dict:
+    return {
+        "input": input_digests(manifest.data.get("input")),
+        "threshold_ms": THRESHOLD_MS,
+        "format": args.format,
+        "per_user_layout": args.per_user_layout,
+        "with_timeline": args.with_timeline,
+        "incremental": args.incremental,
+        "streaming": args.streaming,
+        "workers": args.workers,
+        "backend": args.backend,
+    }
 
-df["is_canonical"] = (
-    df["time_diff_ms"].isna() | (df["time_diff_ms"] > THRESHOLD_MS)
-)
 
-cleaned_events = df[df["is_canonical"]].drop(
-    columns=["time_diff_ms", "is_canonical"]
-)
+def load_cleaned_events() -> pd.DataFrame:
+    df = timed("read_table", read_table, BASE_DIR, "cleaned_events", exclude=DERIVED_COLUMNS)
+    df["event_time"] = timed("parse_event_time", parse_event_time_series, df["event_time"])
+    return df
 
-repetition_summary = (
-    df.groupby(["user_uuid", "event_name", "event_date"], as_index=False)
-      .agg(
-          start_time=("event_time", "min"),
-          end_time=("event_time", "max"),
-          frequency=("event_time", "size")
-      )
-)
 
-repetition_summary["repetitions_removed"] = (
-    repetition_summary["frequency"] - 1
-)
+def run_in_memory(args: argparse.Namespace, checkpoint: Checkpoint) -> None:
+    marked_stages = ["tables", "cleaned_events"] + (["state"] if args.incremental else [])
+    if all(checkpoint.done(name) for name in marked_stages):
+        df = None
+        cleaned_events = load_cleaned_events()
+    else:
+        df = load_marked_events(args, THRESHOLD_MS)
+        cleaned_events = timed("select_canonical", select_canonical, df)
 
-repetition_summary = repetition_summary[
-    repetition_summary["repetitions_removed"] > 0
-]
+    if not checkpoint.done("tables"):
+        repetition_summary = timed("summarize_repetitions", summarize_repetitions, df)
+        burst_summary = timed("summarize_bursts", summarize_bursts, df)
+        unique_users = timed("build_unique_users", build_unique_users, cleaned_events)
+        user_summary = timed("summarize_users", summarize_users, cleaned_events)
+        sessions = timed("summarize_sessions", summarize_sessions, cleaned_events)
 
-repetition_summary["start_time"] = (
-    repetition_summary["start_time"].dt.strftime("%H:%M:%S.%f")
-)
-repetition_summary["end_time"] = (
-    repetition_summary["end_time"].dt.strftime("%H:%M:%S.%f")
-)
+        write_rows = len(repetition_summary) + len(burst_summary) + len(unique_users) + len(user_summary) + len(sessions)
+        with checkpoint.stage("tables") as staging, stage("write_tables", write_rows):
+            write_table(repetition_summary, staging, "repetition_summary", args.format)
+            write_table(burst_summary, staging, BURST_TABLE, args.format)
+            write_table(unique_users, staging, "unique_users_list", args.format)
+            write_table(user_summary, staging, USER_SUMMARY_TABLE, args.format)
+            write_table(sessions, staging, SESSIONS_TABLE, args.format)
+            write_user_count(len(unique_users), args.format, staging)
 
-repetition_summary["event_day"] = (
-    pd.to_datetime(repetition_summary["event_date"]).dt.day_name()
-)
+    if args.incremental and not checkpoint.done("state"):
+        with checkpoint.stage("state") as staging:
+            timed(
+                "initialize_state",
+                initialize_state,
+                staging,
+                df,
+                args.format,
+                args.per_user_layout,
+                track_bursts=True
+            )
+    del df
 
-unique_users = cleaned_events[["user_uuid"]].drop_duplicates()
+    rows = None
+    if not checkpoint.done("cleaned_events"):
+        with checkpoint.stage("cleaned_events") as staging:
+            rows = timed(
+                "write_cleaned_events",
+                write_event_outputs,
+                cleaned_events,
+                staging,
+                "cleaned_events",
+                None,
+                args.per_user_layout,
+                args.format
+            )
+    if writes_per_user_files(args.per_user_layout, args.format) and not checkpoint.done("per_user_files"):
+        with checkpoint.stage("per_user_files", PER_USER_DIR) as staging, stage("per_user_files", cleaned_events):
+            if rows is None:
+                write_per_user_files(cleaned_events, staging)
+            else:
+                write_per_user_rows(cleaned_events["user_uuid"], rows, staging)
 
-unique_users_report = pd.DataFrame({
-    "metric": ["total_unique_users"],
-    "value": [len(unique_users)]
-})
+    if args.with_timeline and not checkpoint.done("timeline"):
+        with checkpoint.stage("timeline", TIMELINE_DIR) as staging:
+            per_user_dir = os.path.join(staging, os.path.relpath(TIMELINE_PER_USER_DIR, TIMELINE_DIR))
+            if writes_per_user_files(args.per_user_layout, args.format):
+                os.makedirs(per_user_dir)
+            timed(
+                "timeline",
+                write_fused_timeline,
+                cleaned_events,
+                staging,
+                per_user_dir,
+                args.format,
+                args.per_user_layout,
+                rows=rows
+            )
 
-cleaned_events.to_csv(
-    os.path.join(BASE_DIR, "cleaned_events.csv"),
-    index=False
-)
 
-repetition_summary.to_csv(
-    os.path.join(BASE_DIR, "repetition_summary.csv"),
-    index=False
-)
+def run_incremental(args: argparse.Namespace) -> None:
+    timed(
+        "apply_increment",
+        apply_increment,
+        load_marked_events(args, THRESHOLD_MS),
+        BASE_DIR,
+        PER_USER_DIR,
+        "cleaned_events",
+        SORT_KEYS,
+        THRESHOLD_MS,
+        args.format,
+        per_user_layout=args.per_user_layout,
+        write_increment=True,
+        track_bursts=True,
+        track_users=True
+    )
 
-unique_users.to_csv(
-    os.path.join(BASE_DIR, "unique_users_list.csv"),
-    index=False
-)
 
-unique_users_report.to_csv(
-    os.path.join(BASE_DIR, "unique_users_count.csv"),
-    index=False
-)
+def run_streaming(args: argparse.Namespace, checkpoint: Checkpoint) -> None:
+    with checkpoint.stage("outputs") as staging:
+        per_user_dir = os.path.join(staging, os.path.relpath(PER_USER_DIR, BASE_DIR))
+        if writes_per_user_files(args.per_user_layout, args.format):
+            os.makedirs(per_user_dir)
+        total_users = timed(
+            "external_dedup",
+            run_external_dedup,
+            args.input_files,
+            staging,
+            per_user_dir,
+            THRESHOLD_MS,
+            memory_budget=args.memory_budget,
+            spill_dir=args.spill_dir,
+            output_format=args.format,
+            per_user_layout=args.per_user_layout,
+            checkpoint=checkpoint
+        )
+        write_user_count(total_users, args.format, staging)
 
-for uid, udf in cleaned_events.groupby("user_uuid", sort=False):
-    safe_uid = str(uid).replace("/", "_").replace("\\", "_")
-    udf.to_csv(
-        os.path.join(PER_USER_DIR, f"user_{safe_uid}.csv"),
-        index=False
+
+def run_sharded(args: argparse.Namespace, checkpoint: Checkpoint) -> None:
+    with checkpoint.stage("outputs") as staging:
+        # Each user's file is written by exactly one shard, so the files go
+        # straight to their final folder and a redone shard overwrites them.
+        total_users = timed(
+            "sharded_dedup",
+            run_sharded_dedup,
+            args.input_files,
+            staging,
+            PER_USER_DIR,
+            THRESHOLD_MS,
+            args.workers,
+            output_format=args.format,
+            per_user_layout=args.per_user_layout,
+            read_workers=args.read_workers,
+            checkpoint=checkpoint
+        )
+        write_user_count(total_users, args.format, staging)
+
+
+def run_backend(args: argparse.Namespace, checkpoint: Checkpoint) -> None:
+    backend = create_backend(
+        args.backend,
+        args.memory_budget,
+        args.workers,
+        args.spill_dir,
+        database=checkpoint.path("events.duckdb")
     )
+    with checkpoint.stage("outputs") as staging:
+        per_user_dir = os.path.join(staging, os.path.relpath(PER_USER_DIR, BASE_DIR))
+        if writes_per_user_files(args.per_user_layout, args.format):
+            os.makedirs(per_user_dir)
+        total_users = timed(
+            "backend_dedup",
+            run_backend_dedup,
+            backend,
+            args.input_files,
+            staging,
+            per_user_dir,
+            THRESHOLD_MS,
+            output_format=args.format,
+            per_user_layout=args.per_user_layout,
+            checkpoint=checkpoint
+        )
+        write_user_count(total_users, args.format, staging)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Remove millisecond-level duplicate events from the raw event log."
+    )
+    parser.add_argument(
+        "--input",
+        default=INPUT_FILE,
+        help="Raw event log CSV, a folder of shards or a glob such as 'exports/*.csv.gz'. "
+             "Shards may be gzip (.gz) or zstd (.zst) compressed and are read in name order."
+    )
+    parser.add_argument(
+        "--read-workers",
+        type=int,
+        default=None,
+        help="Processes that decompress and parse input shards in parallel (default: one per shard, up to the CPU count)."
+    )
+    parser.add_argument(
+        "--streaming",
+        action="store_true",
+        help="Process the input out of core: sort chunks into runs on disk and k-way merge them."
+    )
+    parser.add_argument(
+        "--memory-budget",
+        default=DEFAULT_MEMORY_BUDGET,
+        help="Approximate peak memory for --streaming and --backend duckdb, e.g. 512MB or 4GB (default: %(default)s)."
+    )
+    parser.add_argument(
+        "--spill-dir",
+        default=None,
+        help="Directory for --streaming sorted runs and --backend duckdb spill files (default: system temp dir)."
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Worker processes; users are partitioned into this many shards. "
+             "With --backend duckdb, the number of engine threads (default: %(default)s)."
+    )
+    parser.add_argument(
+        "--backend",
+        choices=BACKENDS,
+        default=DEFAULT_BACKEND,
+        help="Engine for the dedup window, repetition summary and unique users. duckdb runs them as "
+             "SQL window queries that spill to disk past --memory-budget (default: %(default)s)."
+    )
+    parser.add_argument(
+        "--format",
+        choices=OUTPUT_FORMATS,
+        default=DEFAULT_OUTPUT_FORMAT,
+        help="Output format. Per-user files are only written for csv and both (default: %(default)s)."
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Append a new drop to an existing output folder, deduplicating against saved per-user watermarks."
+    )
+    parser.add_argument(
+        "--per-user-layout",
+        choices=PER_USER_LAYOUTS,
+        default=DEFAULT_PER_USER_LAYOUT,
+        help="files: one CSV per user; store: one user-sorted data file plus an offset index (default: %(default)s)."
+    )
+    parser.add_argument(
+        "--with-timeline",
+        action="store_true",
+        help=f"Also write the {TIMELINE_DIR}/ outputs from the same read, parse and sort."
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Continue an unfinished run in the existing output folder from its last completed stage."
+    )
+    add_instrumentation_arguments(parser)
+    args = parser.parse_args()
+
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+    if args.read_workers is not None and args.read_workers < 1:
+        parser.error("--read-workers must be at least 1")
+    if args.streaming and args.workers > 1:
+        parser.error("--streaming and --workers cannot be combined")
+    if args.incremental and (args.streaming or args.workers > 1):
+        parser.error("--incremental cannot be combined with --streaming or --workers")
+    if args.with_timeline and (args.streaming or args.workers > 1 or args.incremental):
+        parser.error("--with-timeline cannot be combined with --streaming, --workers or --incremental")
+    if args.backend != DEFAULT_BACKEND and (args.streaming or args.incremental or args.with_timeline):
+        parser.error(f"--backend {args.backend} cannot be combined with --streaming, --incremental or --with-timeline")
+
+    args.input_files = resolve_inputs(args.input)
+    if args.read_workers is None:
+        args.read_workers = default_read_workers(args.input_files)
+
+    update = os.path.exists(BASE_DIR)
+    resume = update and args.resume
+    if update and not resume:
+        if has_checkpoint(BASE_DIR):
+            raise RuntimeError(
+                f"Output folder '{BASE_DIR}' holds an unfinished run. Rerun with --resume or remove it."
+            )
+        if not args.incremental:
+            raise RuntimeError(f"Output folder '{BASE_DIR}' already exists.")
+        if not has_state(BASE_DIR):
+            raise RuntimeError(
+                f"Output folder '{BASE_DIR}' has no incremental state. "
+                "Remove it and rerun with --incremental to start tracking watermarks."
+            )
+    elif not update:
+        if args.with_timeline and os.path.exists(TIMELINE_DIR):
+            raise RuntimeError(f"Output folder '{TIMELINE_DIR}' already exists.")
+        Checkpoint.create(BASE_DIR)
+
+    manifest = RunManifest(
+        SCRIPT_NAME,
+        BASE_DIR,
+        {"threshold_ms": THRESHOLD_MS},
+        vars(args),
+        profile=args.profile,
+        profile_stages=args.profile_stage
+    )
+    with recorded_run(manifest):
+        manifest.set_input(args.input_files)
+        if update and not resume:
+            run_incremental(args)
+            return
+
+        checkpoint = Checkpoint.load(BASE_DIR, checkpoint_key(args, manifest))
+        if resume:
+            manifest.data["resumed_stages"] = list(checkpoint.completed)
+        if writes_per_user_files(args.per_user_layout, args.format):
+            os.makedirs(PER_USER_DIR, exist_ok=True)
+        if args.with_timeline:
+            os.makedirs(TIMELINE_PER_USER_DIR if writes_per_user_files(args.per_user_layout, args.format) else TIMELINE_DIR, exist_ok=True)
+
+        if args.backend != DEFAULT_BACKEND:
+            run_backend(args, checkpoint)
+        elif args.streaming:
+            run_streaming(args, checkpoint)
+        elif args.workers > 1:
+            run_sharded(args, checkpoint)
+        else:
+            run_in_memory(args, checkpoint)
+        checkpoint.finish()
+
+
+if __name__ == "__main__":
+    main()
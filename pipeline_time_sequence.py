@@ -1,114 +1,215 @@
 import pandas as pd
+import argparse
 import os
 from pathlib import Path
 
+from pipelines.checkpoint import Checkpoint, has_checkpoint, input_digests
+from pipelines.dedup import (
+    DERIVED_COLUMNS,
+    sort_events,
+    mark_canonical,
+    select_canonical,
+    summarize_repetitions,
+)
+from pipelines.incremental import (
+    apply_increment,
+    has_state,
+    initialize_state,
+    INCREMENT_TABLE,
+    load_increment,
+    read_run_info,
+    state_dir,
+)
+from pipelines.instrumentation import RunManifest, add_instrumentation_arguments, recorded_run, timed
+from pipelines.timestamps import parse_event_time_series
+from pipelines.storage import DEFAULT_OUTPUT_FORMAT, OUTPUT_FORMATS, find_table, read_table, table_files
+from pipelines.timeline import TIMELINE_SORT_KEYS, TIMELINE_SUFFIX, TIMELINE_TABLE, write_timeline_outputs
+from pipelines.user_store import DEFAULT_PER_USER_LAYOUT, PER_USER_LAYOUTS, writes_per_user_files
+
 THRESHOLD_MS = 50
 
 SCRIPT_NAME = Path(__file__).stem
 BASE_DIR = SCRIPT_NAME
 PER_USER_DIR = os.path.join(BASE_DIR, "per_user_timelines")
 
-if os.path.exists(BASE_DIR):
-    raise RuntimeError(f"Output folder '{BASE_DIR}' already exists.")
+INPUT_DIR = "pipeline_deduplication"
+INPUT_TABLE = "cleaned_events"
 
-os.makedirs(PER_USER_DIR)
 
-INPUT_FILE = "pipeline_deduplication/cleaned_events.csv"
-
-if not os.path.exists(INPUT_FILE):
-    raise FileNotFoundError(
-        f"Required input file not found: {INPUT_FILE}. "
-        "Run pipeline_deduplication.py first."
+def load_cleaned_events() -> pd.DataFrame:
+    return timed(
+        "parse_event_time",
+        parse_event_time,
+        timed("read_table", read_table, INPUT_DIR, INPUT_TABLE, exclude=DERIVED_COLUMNS)
     )
 
-df = pd.read_csv(INPUT_FILE)
-
-df["event_time"] = pd.to_datetime(
-    df["event_time"],
-    format="ISO8601",
-    errors="raise"
-)
-
-df = df.sort_values(
-    by=["user_uuid", "event_time"],
-    kind="mergesort"
-).reset_index(drop=True)
-
-df["time_diff_ms"] = (
-    df.groupby(["user_uuid", "event_name"])["event_time"]
-      .diff()
-      .dt.total_seconds()
-      .mul(1000)
-)
-
-df["is_canonical"] = (
-    df["time_diff_ms"].isna() | (df["time_diff_ms"] > THRESHOLD_MS)
-)
-
-cleaned_timeline = df[df["is_canonical"]].drop(
-    columns=["time_diff_ms", "is_canonical"]
-)
-
-repetition_summary = (
-    df.groupby(["user_uuid", "event_name", "event_date"], as_index=False)
-      .agg(
-          start_time=("event_time", "min"),
-          end_time=("event_time", "max"),
-          frequency=("event_time", "size")
-      )
-)
-
-repetition_summary["repetitions_removed"] = (
-    repetition_summary["frequency"] - 1
-)
-
-repetition_summary = repetition_summary[
-    repetition_summary["repetitions_removed"] > 0
-]
 
-repetition_summary["start_time"] = (
-    repetition_summary["start_time"].dt.strftime("%H:%M:%S.%f")
-)
-
-repetition_summary["end_time"] = (
-    repetition_summary["end_time"].dt.strftime("%H:%M:%S.%f")
-)
-
-repetition_summary["event_day"] = (
-    pd.to_datetime(repetition_summary["event_date"])
-      .dt.day_name()
-)
-
-unique_users = cleaned_timeline[["user_uuid"]].drop_duplicates()
+def parse_event_time(df: pd.DataFrame) -> pd.DataFrame:
+    if not pd.api.types.is_datetime64_any_dtype(df["event_time"]):
+        df["event_time"] = parse_event_time_series(df["event_time"])
+    return df
+
+
+def checkpoint_key(args: argparse.Namespace, manifest: RunManifest) -> dict:
+    return {
+        "input": input_digests(manifest.data.get("input")),
+        "threshold_ms": THRESHOLD_MS,
+        "format": args.format,
+        "per_user_layout": args.per_user_layout,
+        "incremental": args.incremental,
+    }
+
+
+def run(threshold_ms: float, output_format: str, per_user_layout: str, incremental: bool, checkpoint: Checkpoint) -> None:
+    if checkpoint.done("outputs") and (checkpoint.done("state") or not incremental):
+        return
+
+    df = load_cleaned_events()
+    df = timed("sort", sort_events, df, by=TIMELINE_SORT_KEYS)
+    df = timed("mark_canonical", mark_canonical, df, threshold_ms)
+
+    if not checkpoint.done("outputs"):
+        with checkpoint.stage("outputs") as staging:
+            per_user_dir = os.path.join(staging, os.path.relpath(PER_USER_DIR, BASE_DIR))
+            if writes_per_user_files(per_user_layout, output_format):
+                os.makedirs(per_user_dir)
+            timed(
+                "write_outputs",
+                write_timeline_outputs,
+                timed("select_canonical", select_canonical, df),
+                timed("summarize_repetitions", summarize_repetitions, df),
+                staging,
+                per_user_dir,
+                output_format,
+                per_user_layout
+            )
+    if incremental and not checkpoint.done("state"):
+        source_run_id = read_run_info(INPUT_DIR)["run_id"] if has_state(INPUT_DIR) else None
+        with checkpoint.stage("state") as staging:
+            timed(
+                "initialize_state",
+                initialize_state,
+                staging,
+                df,
+                output_format,
+                per_user_layout,
+                source_run_id=source_run_id
+            )
+
+
+def run_incremental(threshold_ms: float, output_format: str, per_user_layout: str) -> None:
+    info = read_run_info(BASE_DIR)
+    if not has_state(INPUT_DIR):
+        raise RuntimeError(
+            f"'{INPUT_DIR}' has no incremental state. Run pipeline_deduplication.py --incremental first."
+        )
+
+    source_run_id = read_run_info(INPUT_DIR)["run_id"]
+    if source_run_id == info["source_run_id"]:
+        return
+    if info["source_run_id"] is None or source_run_id != info["source_run_id"] + 1:
+        raise RuntimeError(
+            f"'{BASE_DIR}' is not at the previous run of '{INPUT_DIR}' "
+            f"(have {info['source_run_id']}, source is at {source_run_id}). "
+            "Remove the output folder and rebuild it with --incremental."
+        )
+
+    df = timed("parse_event_time", parse_event_time, timed("read_table", load_increment, INPUT_DIR))
+    df = timed("sort", sort_events, df, by=TIMELINE_SORT_KEYS)
+    df = timed("mark_canonical", mark_canonical, df, threshold_ms)
+
+    timed(
+        "apply_increment",
+        apply_increment,
+        df,
+        BASE_DIR,
+        PER_USER_DIR,
+        TIMELINE_TABLE,
+        TIMELINE_SORT_KEYS,
+        threshold_ms,
+        output_format,
+        per_user_layout=per_user_layout,
+        suffix=TIMELINE_SUFFIX,
+        source_run_id=source_run_id
+    )
 
-unique_users_report = pd.DataFrame({
-    "metric": ["total_unique_users"],
-    "value": [len(unique_users)]
-})
 
-cleaned_timeline.to_csv(
-    os.path.join(BASE_DIR, "cleaned_events_chronological.csv"),
-    index=False
-)
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Order cleaned events strictly by timestamp for journey analysis."
+    )
+    parser.add_argument(
+        "--format",
+        choices=OUTPUT_FORMATS,
+        default=DEFAULT_OUTPUT_FORMAT,
+        help="Output format. Per-user files are only written for csv and both (default: %(default)s)."
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Apply the latest incremental deduplication run to an existing output folder."
+    )
+    parser.add_argument(
+        "--per-user-layout",
+        choices=PER_USER_LAYOUTS,
+        default=DEFAULT_PER_USER_LAYOUT,
+        help="files: one CSV per user; store: one user-sorted data file plus an offset index (default: %(default)s)."
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Continue an interrupted run from its last completed stage instead of starting over."
+    )
+    add_instrumentation_arguments(parser)
+    args = parser.parse_args()
+
+    update = os.path.exists(BASE_DIR)
+    resume = update and args.resume
+    if update and not resume:
+        if has_checkpoint(BASE_DIR):
+            raise RuntimeError(
+                f"Output folder '{BASE_DIR}' holds an unfinished run. Rerun with --resume or remove it."
+            )
+        if not args.incremental:
+            raise RuntimeError(f"Output folder '{BASE_DIR}' already exists.")
+        if not has_state(BASE_DIR):
+            raise RuntimeError(
+                f"Output folder '{BASE_DIR}' has no incremental state. "
+                "Remove it and rerun with --incremental to start tracking watermarks."
+            )
+        input_path = find_table(state_dir(INPUT_DIR), INCREMENT_TABLE)
+    else:
+        input_path = find_table(INPUT_DIR, INPUT_TABLE)
+        if input_path is None:
+            raise FileNotFoundError(
+                f"Required input file not found: {os.path.join(INPUT_DIR, INPUT_TABLE + '.csv')}. "
+                "Run pipeline_deduplication.py first."
+            )
+
+        if not resume:
+            Checkpoint.create(BASE_DIR)
+
+    manifest = RunManifest(
+        SCRIPT_NAME,
+        BASE_DIR,
+        {"threshold_ms": THRESHOLD_MS},
+        vars(args),
+        profile=args.profile,
+        profile_stages=args.profile_stage
+    )
+    with recorded_run(manifest):
+        manifest.set_input(table_files(input_path))
+        if update and not resume:
+            run_incremental(THRESHOLD_MS, args.format, args.per_user_layout)
+            return
 
-repetition_summary.to_csv(
-    os.path.join(BASE_DIR, "repetition_summary.csv"),
-    index=False
-)
+        checkpoint = Checkpoint.load(BASE_DIR, checkpoint_key(args, manifest))
+        if resume:
+            manifest.data["resumed_stages"] = list(checkpoint.completed)
 
-unique_users.to_csv(
-    os.path.join(BASE_DIR, "unique_users_list.csv"),
-    index=False
-)
+        run(THRESHOLD_MS, args.format, args.per_user_layout, args.incremental, checkpoint)
+        checkpoint.finish()
 
-unique_users_report.to_csv(
-    os.path.join(BASE_DIR, "unique_users_count.csv"),
-    index=False
-)
 
-for uid, udf in cleaned_timeline.groupby("user_uuid", sort=False):
-    safe_uid = str(uid).replace("/", "_").replace("\\", "_")
-    udf.to_csv(
-        os.path.join(PER_USER_DIR, f"user_{safe_uid}_timeline.csv"),
-        index=False
-    )
+if __name__ == "__main__":
+    main()
@@ -0,0 +1 @@
+# Pipelines package
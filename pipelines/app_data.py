@@ -0,0 +1,233 @@
+import pandas as pd
+import numpy as np
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+from pipelines.dedup import safe_user_filename
+from pipelines.encoding import encode_column, encode_events
+from pipelines.storage import find_table, read_table, table_files, table_path
+from pipelines.timestamps import parse_event_time_series
+from pipelines.user_summary import application_rows
+from pipelines.user_store import DATA_FILE, INDEX_FILE, UserStore, store_dir_for
+
+FileSignature = Tuple[Tuple[str, int, int, int], ...]
+
+DEFAULT_USER_CACHE_MB = 256
+
+_cache: Dict[Hashable, Tuple[FileSignature, Any]] = {}
+_lock = threading.RLock()
+
+
+def file_signature(paths: List[str]) -> FileSignature:
+    signature = []
+    for path in paths:
+        st = os.stat(path)
+        signature.append((path, st.st_ino, st.st_mtime_ns, st.st_size))
+    return tuple(signature)
+
+
+def cached(key: Hashable, paths: List[str], load: Callable[[], Any]) -> Any:
+    signature = file_signature(paths)
+    with _lock:
+        entry = _cache.get(key)
+        if entry is not None and entry[0] == signature:
+            return entry[1]
+        value = load()
+        _cache[key] = (signature, value)
+        return value
+
+
+def clear_cache() -> None:
+    with _lock:
+        _cache.clear()
+
+
+def _table_path(base_dir: str, name: str) -> str:
+    path = find_table(base_dir, name)
+    if path is None:
+        raise FileNotFoundError(f"Required input file not found: {table_path(base_dir, name, 'csv')}")
+    return path
+
+
+def _parse_event_time(df: pd.DataFrame) -> pd.DataFrame:
+    if "event_time" in df.columns and not pd.api.types.is_datetime64_any_dtype(df["event_time"]):
+        df["event_time"] = parse_event_time_series(df["event_time"])
+    return df
+
+
+def load_table(
+    base_dir: str,
+    name: str,
+    columns: Optional[List[str]] = None,
+    exclude: Optional[List[str]] = None
+) -> pd.DataFrame:
+    path = _table_path(base_dir, name)
+    key = ("table", os.path.abspath(path), tuple(columns or ()), tuple(exclude or ()))
+    return cached(
+        key,
+        table_files(path),
+        lambda: read_table(base_dir, name, columns=columns, exclude=exclude, memory_map=True)
+    )
+
+
+def load_events(
+    base_dir: str,
+    name: str,
+    columns: Optional[List[str]] = None,
+    exclude: Optional[List[str]] = None
+) -> pd.DataFrame:
+    path = _table_path(base_dir, name)
+    key = ("events", os.path.abspath(path), tuple(columns or ()), tuple(exclude or ()))
+    return cached(
+        key,
+        table_files(path),
+        lambda: _parse_event_time(read_table(base_dir, name, columns=columns, exclude=exclude, memory_map=True))
+    )
+
+
+class UserIndex:
+    def __init__(self, df: pd.DataFrame, column: str = "user_uuid", table_rows: Optional[int] = None):
+        self.table_rows = len(df) if table_rows is None else table_rows
+        users = encode_column(df[column])
+        codes = users.cat.codes.to_numpy()
+        if not (np.diff(codes) >= 0).all():
+            order = np.argsort(codes, kind="stable")
+            codes = codes[order]
+            df = df.iloc[order]
+        self.frame = df.reset_index(drop=True)
+        self.users = users.cat.categories
+        self.bounds = np.searchsorted(codes, np.arange(len(self.users) + 1))
+
+    def __len__(self) -> int:
+        return len(self.frame)
+
+    def rows(self, user: str) -> pd.DataFrame:
+        try:
+            code = self.users.get_loc(user)
+        except KeyError:
+            return self.frame.iloc[:0]
+        return self.frame.iloc[self.bounds[code]:self.bounds[code + 1]]
+
+
+def load_user_index(
+    base_dir: str,
+    name: str,
+    columns: Optional[List[str]] = None,
+    exclude: Optional[List[str]] = None,
+    application_only: bool = False,
+    parse_times: bool = True
+) -> UserIndex:
+    def build() -> UserIndex:
+        df = read_table(base_dir, name, columns=columns, exclude=exclude, memory_map=True)
+        if parse_times:
+            df = _parse_event_time(df)
+        return UserIndex(application_rows(df) if application_only else df, table_rows=len(df))
+
+    path = _table_path(base_dir, name)
+    key = ("user_index", os.path.abspath(path), tuple(columns or ()), tuple(exclude or ()), application_only, parse_times)
+    return cached(key, table_files(path), build)
+
+
+class LruCache:
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self._entries: "OrderedDict[Hashable, Tuple[FileSignature, pd.DataFrame, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable, paths: List[str], load: Callable[[], pd.DataFrame]) -> pd.DataFrame:
+        signature = file_signature(paths)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == signature:
+                self._entries.move_to_end(key)
+                return entry[1]
+
+        df = load()
+        size = int(df.memory_usage(deep=True).sum())
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.bytes -= old[2]
+            self._entries[key] = (signature, df, size)
+            self.bytes += size
+            while self.bytes > self.max_bytes and len(self._entries) > 1:
+                _, (_, _, evicted) = self._entries.popitem(last=False)
+                self.bytes -= evicted
+        return df
+
+
+def _has_files(path: str) -> bool:
+    if not os.path.isdir(path):
+        return False
+    with os.scandir(path) as entries:
+        return any(entry.is_file() for entry in entries)
+
+
+class UserPartition:
+    def __init__(
+        self,
+        base_dir: str,
+        per_user_dir: str,
+        suffix: str = "",
+        columns: Optional[List[str]] = None,
+        max_bytes: int = DEFAULT_USER_CACHE_MB * 2**20,
+        table: Optional[str] = None
+    ):
+        self.base_dir = base_dir
+        self.store_dir = store_dir_for(base_dir)
+        self.per_user_dir = per_user_dir
+        self.suffix = suffix
+        self.columns = columns
+        self.table = table
+        self.table_path = find_table(base_dir, table) if table else None
+        if os.path.exists(os.path.join(self.store_dir, INDEX_FILE)):
+            self.layout = "store"
+        elif _has_files(per_user_dir):
+            self.layout = "files"
+        elif self.table_path is not None:
+            self.layout = "table"
+        else:
+            raise FileNotFoundError(
+                f"No per-user partition found: expected files in {per_user_dir}, {self.store_dir}"
+                + (f" or a {table} table in {base_dir}" if table else "")
+            )
+        self.cache = LruCache(max_bytes)
+
+    def _paths(self, user: str) -> List[str]:
+        if self.layout == "store":
+            return [os.path.join(self.store_dir, INDEX_FILE), os.path.join(self.store_dir, DATA_FILE)]
+        if self.layout == "table":
+            return [self.table_path]
+        return [os.path.join(self.per_user_dir, safe_user_filename(user, self.suffix))]
+
+    def _read(self, user: str) -> pd.DataFrame:
+        if self.layout == "store":
+            df = UserStore(self.store_dir).read_user(user)
+        elif self.layout == "table":
+            df = read_table(self.base_dir, self.table, columns=self.columns, filters=[("user_uuid", "==", user)])
+        else:
+            df = pd.read_csv(self._paths(user)[0])
+        if self.columns is not None:
+            df = df[self.columns]
+        return _parse_event_time(encode_events(df))
+
+    def rows(self, user: str) -> pd.DataFrame:
+        return self.cache.get(user, self._paths(user), lambda: self._read(user))
+
+
+def load_user_partition(
+    base_dir: str,
+    per_user_dir: str,
+    suffix: str = "",
+    columns: Optional[List[str]] = None,
+    max_bytes: int = DEFAULT_USER_CACHE_MB * 2**20,
+    table: Optional[str] = None
+) -> UserPartition:
+    key = ("user_partition", os.path.abspath(base_dir), os.path.abspath(per_user_dir), suffix, tuple(columns or ()), max_bytes, table)
+    return cached(key, [base_dir], lambda: UserPartition(base_dir, per_user_dir, suffix, columns, max_bytes, table))
@@ -0,0 +1,312 @@
+import pandas as pd
+import numpy as np
+import shutil
+import tempfile
+from datetime import timedelta, timezone
+from typing import Iterator, List, Optional
+
+from pipelines.checkpoint import Checkpoint
+from pipelines.dedup import (
+    BURST_TABLE,
+    RAW_TIME_FORMAT,
+    finalize_repetition_summary,
+    finalize_burst_summary,
+)
+from pipelines.encoding import encode_events
+from pipelines.external_sort import DEFAULT_MEMORY_BUDGET, parse_memory_budget
+from pipelines.instrumentation import stage
+from pipelines.storage import DEFAULT_OUTPUT_FORMAT, TableWriter
+from pipelines.timestamps import format_event_dates, parse_event_times, warn_fallback_rows
+from pipelines.user_store import DEFAULT_PER_USER_LAYOUT, write_event_batches
+from pipelines.user_summary import UserSummaryWriter
+
+BACKENDS = ["pandas", "duckdb"]
+DEFAULT_BACKEND = "pandas"
+BATCH_ROWS = 256_000
+
+# Layouts the fixed-width parser in pipelines.timestamps accepts; anything
+# else is handed to its slow path so both backends parse identically.
+_FAST_TIME_PATTERN = r"^\d{4}-\d\d-\d\d \d\d:\d\d:\d\d(\.\d{6})? ?[+-]\d\d:\d\d$"
+_TIME_FORMATS = [
+    ("%Y-%m-%d %H:%M:%S.%f %z", "2026-01-02 14:16:14.476000 +05:30"),
+    ("%Y-%m-%d %H:%M:%S.%f%z", "2026-01-02 14:16:14.476000+05:30"),
+    ("%Y-%m-%d %H:%M:%S %z", "2026-01-02 14:16:14 +05:30"),
+    ("%Y-%m-%d %H:%M:%S%z", "2026-01-02 14:16:14+05:30"),
+]
+_NAT_SQL = "(-9223372036854775807 - 1)"
+_NS_PER_DAY = 86_400 * 10**9
+
+
+class DedupBackend:
+    name = ""
+
+    def load(self, input_files: List[str]) -> int:
+        raise NotImplementedError
+
+    def mark(self, threshold_ms: float) -> None:
+        raise NotImplementedError
+
+    def restore(self) -> None:
+        raise NotImplementedError
+
+    def cleaned_events(self) -> Iterator[pd.DataFrame]:
+        raise NotImplementedError
+
+    def repetition_summary(self) -> Iterator[pd.DataFrame]:
+        raise NotImplementedError
+
+    def burst_summary(self) -> Iterator[pd.DataFrame]:
+        raise NotImplementedError
+
+    def unique_users(self) -> Iterator[pd.DataFrame]:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+    def __enter__(self) -> "DedupBackend":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def _sql_string(value: str) -> str:
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def _sql_name(name: str) -> str:
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+class DuckDBBackend(DedupBackend):
+    name = "duckdb"
+
+    def __init__(
+        self,
+        memory_budget: str = DEFAULT_MEMORY_BUDGET,
+        threads: int = 1,
+        spill_dir: Optional[str] = None,
+        database: str = ":memory:"
+    ):
+        import duckdb
+
+        self.tmp_dir = tempfile.mkdtemp(prefix="dedup_duckdb_", dir=spill_dir)
+        self.con = duckdb.connect(database)
+        self.con.execute(f"SET memory_limit = '{parse_memory_budget(memory_budget) // 2**20}MiB'")
+        self.con.execute(f"SET threads = {int(threads)}")
+        self.con.execute(f"SET temp_directory = {_sql_string(self.tmp_dir)}")
+        self.columns: List[str] = []
+        self.tz = timezone.utc
+
+    def close(self) -> None:
+        self.con.close()
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def load(self, input_files: List[str]) -> int:
+        files = ", ".join(_sql_string(path) for path in input_files)
+        parse = " ".join(
+            f"WHEN {len(example)} THEN try_strptime(event_time, {_sql_string(fmt)})"
+            for fmt, example in _TIME_FORMATS
+        )
+        self.con.execute(f"""
+            CREATE OR REPLACE TABLE events AS
+            SELECT
+                *,
+                CASE WHEN regexp_matches(event_time, {_sql_string(_FAST_TIME_PATTERN)})
+                     THEN epoch_ns(CASE length(event_time) {parse} END) END AS _utc_ns,
+                CASE WHEN left(right(event_time, 6), 1) = '-' THEN -1 ELSE 1 END
+                    * (TRY_CAST(substr(right(event_time, 6), 2, 2) AS INTEGER) * 60
+                       + TRY_CAST(right(event_time, 2) AS INTEGER)) AS _offset_min
+            FROM read_csv([{files}], header = true, all_varchar = true,
+                          delim = ',', quote = '"', escape = '"')
+        """)
+        self._parse_fallback_rows()
+        self._describe("events")
+        return self.con.execute("SELECT count(*) FROM events").fetchone()[0]
+
+    def restore(self) -> None:
+        self._describe("marked")
+
+    def _describe(self, table: str) -> None:
+        self.columns = [
+            row[0] for row in self.con.execute(f"DESCRIBE {table}").fetchall()
+            if row[0] not in ("_utc_ns", "_offset_min", "_seq", "_canonical")
+        ]
+        offsets = self.con.execute(
+            f"SELECT DISTINCT _offset_min FROM {table} WHERE _utc_ns IS NOT NULL"
+        ).fetchall()
+        self.tz = timezone(timedelta(minutes=offsets[0][0])) if len(offsets) == 1 else timezone.utc
+
+    def _parse_fallback_rows(self) -> None:
+        slow = self.con.execute(
+            "SELECT rowid AS row_id, event_time FROM events WHERE _utc_ns IS NULL AND event_time IS NOT NULL"
+        ).df()
+        if slow.empty:
+            return
+
+        parsed = parse_event_times(slow["event_time"], RAW_TIME_FORMAT)
+        warn_fallback_rows(len(slow), self.con.execute("SELECT count(*) FROM events").fetchone()[0])
+        fallback = pd.DataFrame({
+            "row_id": slow["row_id"],
+            "utc_ns": parsed.utc_ns,
+            "offset_min": parsed.offset_minutes.astype(np.int64),
+        })
+        self.con.register("fallback", fallback)
+        self.con.execute("""
+            UPDATE events SET _utc_ns = fallback.utc_ns, _offset_min = fallback.offset_min
+            FROM fallback WHERE events.rowid = fallback.row_id
+        """)
+        self.con.unregister("fallback")
+
+    def mark(self, threshold_ms: float) -> None:
+        self.con.execute(f"""
+            CREATE OR REPLACE TABLE marked AS
+            SELECT
+                * EXCLUDE (_diff_ns),
+                user_uuid IS NULL OR event_name IS NULL OR _diff_ns IS NULL
+                    OR _diff_ns / 1e9 * 1000 > {float(threshold_ms)!r} AS _canonical
+            FROM (
+                SELECT
+                    *,
+                    rowid AS _seq,
+                    _utc_ns - lag(_utc_ns) OVER (
+                        PARTITION BY user_uuid, event_name ORDER BY _utc_ns NULLS LAST, rowid
+                    ) AS _diff_ns
+                FROM events
+            )
+        """)
+        self.con.execute("DROP TABLE events")
+
+    def _event_time(self, utc_ns: pd.Series) -> pd.Series:
+        ns = utc_ns.to_numpy(dtype=np.int64)
+        values = pd.DatetimeIndex(ns.view("M8[ns]")).tz_localize("UTC").tz_convert(self.tz)
+        return pd.Series(values, index=utc_ns.index, name=utc_ns.name)
+
+    def _batches(self, sql: str) -> Iterator[pd.DataFrame]:
+        reader = self.con.execute(sql).fetch_record_batch(BATCH_ROWS)
+        empty = True
+        for batch in reader:
+            empty = False
+            yield batch.to_pandas()
+        if empty:
+            yield reader.schema.empty_table().to_pandas()
+
+    def cleaned_events(self) -> Iterator[pd.DataFrame]:
+        columns = ", ".join(
+            f"coalesce(_utc_ns, {_NAT_SQL}) AS event_time" if col == "event_time" else _sql_name(col)
+            for col in self.columns
+        )
+        for df in self._batches(f"""
+            SELECT {columns} FROM marked WHERE _canonical
+            ORDER BY user_uuid, event_name, _utc_ns NULLS LAST, _seq
+        """):
+            df["event_time"] = self._event_time(df["event_time"])
+            yield encode_events(df)
+
+    def repetition_summary(self) -> Iterator[pd.DataFrame]:
+        offset_ns = int(self.tz.utcoffset(None).total_seconds()) * 10**9
+        for df in self._batches(f"""
+            SELECT user_uuid, event_name, _day AS event_date,
+                   min(_utc_ns) AS start_time, max(_utc_ns) AS end_time, count(*) AS frequency
+            FROM (
+                SELECT user_uuid, event_name, _utc_ns,
+                       (_local_ns - ((_local_ns % {_NS_PER_DAY}) + {_NS_PER_DAY}) % {_NS_PER_DAY}) // {_NS_PER_DAY} AS _day
+                FROM (SELECT *, _utc_ns + {offset_ns} AS _local_ns FROM marked)
+                WHERE _utc_ns IS NOT NULL AND user_uuid IS NOT NULL AND event_name IS NOT NULL
+            )
+            GROUP BY user_uuid, event_name, _day
+            HAVING count(*) > 1
+            ORDER BY user_uuid, event_name, _day
+        """):
+            df["event_date"] = format_event_dates(pd.Series(pd.to_datetime(df["event_date"], unit="D")))[0]
+            df["start_time"] = self._event_time(df["start_time"])
+            df["end_time"] = self._event_time(df["end_time"])
+            yield finalize_repetition_summary(encode_events(df))
+
+    def burst_summary(self) -> Iterator[pd.DataFrame]:
+        for df in self._batches("""
+            SELECT user_uuid, event_name,
+                   min(_utc_ns) AS burst_start, max(_utc_ns) AS burst_end, count(*) AS burst_size
+            FROM (
+                SELECT user_uuid, event_name, _utc_ns,
+                       sum(_canonical::INTEGER) OVER (
+                           PARTITION BY user_uuid, event_name ORDER BY _utc_ns NULLS LAST, _seq
+                           ROWS UNBOUNDED PRECEDING
+                       ) AS _burst
+                FROM marked
+            )
+            GROUP BY user_uuid, event_name, _burst
+            HAVING count(*) > 1
+            ORDER BY user_uuid, event_name, burst_start
+        """):
+            df["burst_start"] = self._event_time(df["burst_start"])
+            df["burst_end"] = self._event_time(df["burst_end"])
+            df["continued"] = False
+            yield finalize_burst_summary(encode_events(df))
+
+    def unique_users(self) -> Iterator[pd.DataFrame]:
+        for df in self._batches("SELECT DISTINCT user_uuid FROM marked WHERE _canonical ORDER BY user_uuid"):
+            yield encode_events(df)
+
+
+def create_backend(
+    name: str,
+    memory_budget: str = DEFAULT_MEMORY_BUDGET,
+    threads: int = 1,
+    spill_dir: Optional[str] = None,
+    database: str = ":memory:"
+) -> DedupBackend:
+    if name == DEFAULT_BACKEND:
+        raise ValueError(f"The {name} backend is the in-memory path of pipeline_deduplication.py")
+    if name == "duckdb":
+        return DuckDBBackend(memory_budget, threads, spill_dir, database)
+    raise ValueError(f"Unknown backend: {name}")
+
+
+def _write_batches(batches: Iterator[pd.DataFrame], base_dir: str, name: str, output_format: str) -> int:
+    rows = 0
+    with TableWriter(base_dir, name, output_format) as writer:
+        for df in batches:
+            writer.write(df)
+            rows += len(df)
+    return rows
+
+
+def run_backend_dedup(
+    backend: DedupBackend,
+    input_files: List[str],
+    base_dir: str,
+    per_user_dir: str,
+    threshold_ms: float,
+    output_format: str = DEFAULT_OUTPUT_FORMAT,
+    per_user_layout: str = DEFAULT_PER_USER_LAYOUT,
+    checkpoint: Optional[Checkpoint] = None
+) -> int:
+    with backend:
+        if checkpoint is not None and checkpoint.done("marked"):
+            backend.restore()
+        else:
+            with stage("load") as st:
+                st.rows_out = backend.load(input_files)
+            with stage("mark_canonical", st.rows_out):
+                backend.mark(threshold_ms)
+            if checkpoint is not None:
+                checkpoint.record("marked")
+
+        with stage("write_cleaned_events") as st, UserSummaryWriter(base_dir, output_format) as user_summary_out:
+            st.rows_out = write_event_batches(
+                user_summary_out.tee(backend.cleaned_events()),
+                base_dir,
+                "cleaned_events",
+                per_user_dir,
+                per_user_layout,
+                output_format
+            )
+        with stage("write_tables") as st:
+            st.rows_out = _write_batches(backend.repetition_summary(), base_dir, "repetition_summary", output_format)
+            st.rows_out += _write_batches(backend.burst_summary(), base_dir, BURST_TABLE, output_format)
+            total_users = _write_batches(backend.unique_users(), base_dir, "unique_users_list", output_format)
+            st.rows_out += total_users
+
+    return total_users
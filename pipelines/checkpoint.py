@@ -0,0 +1,115 @@
+import json
+import os
+import shutil
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+CHECKPOINT_DIR = "_checkpoint"
+STATE_FILE = "checkpoint.json"
+STAGING_DIR = "staging"
+
+
+def checkpoint_dir(base_dir: str) -> str:
+    return os.path.join(base_dir, CHECKPOINT_DIR)
+
+
+def has_checkpoint(base_dir: str) -> bool:
+    return os.path.isdir(checkpoint_dir(base_dir))
+
+
+def input_digests(input_info: Optional[Dict[str, Any]]) -> List[str]:
+    if not input_info:
+        return []
+    files = input_info.get("files", [input_info])
+    return [f["sha256"] for f in files]
+
+
+def _write_json(path: str, data: Dict[str, Any]) -> None:
+    with open(path + ".tmp", "w") as fh:
+        json.dump(data, fh, indent=2)
+    os.replace(path + ".tmp", path)
+
+
+def _move_into(src_dir: str, dest_dir: str) -> None:
+    for path, dirs, names in os.walk(src_dir):
+        target = os.path.join(dest_dir, os.path.relpath(path, src_dir))
+        os.makedirs(target, exist_ok=True)
+        for name in names:
+            os.replace(os.path.join(path, name), os.path.join(target, name))
+
+
+class Checkpoint:
+    def __init__(
+        self,
+        base_dir: str,
+        key: Optional[Dict[str, Any]],
+        completed: Optional[List[str]] = None,
+        results: Optional[Dict[str, Any]] = None
+    ):
+        self.base_dir = base_dir
+        self.dir = checkpoint_dir(base_dir)
+        self.key = key
+        self.completed: List[str] = list(completed or [])
+        self.results: Dict[str, Any] = dict(results or {})
+
+    @classmethod
+    def create(cls, base_dir: str) -> None:
+        # Written before the inputs are hashed, so a run that dies that early
+        # still leaves a checkpoint that --resume accepts.
+        os.makedirs(checkpoint_dir(base_dir))
+        cls(base_dir, None)._save()
+
+    @classmethod
+    def load(cls, base_dir: str, key: Dict[str, Any]) -> "Checkpoint":
+        if not has_checkpoint(base_dir):
+            raise RuntimeError(
+                f"Output folder '{base_dir}' has no checkpoint to resume from. Remove it and rerun."
+            )
+        state = {"key": None, "completed": [], "results": {}}
+        path = os.path.join(checkpoint_dir(base_dir), STATE_FILE)
+        if os.path.exists(path):
+            with open(path) as fh:
+                state = json.load(fh)
+        if state["key"] is not None and state["key"] != key:
+            changed = sorted(k for k in set(key) | set(state["key"]) if key.get(k) != state["key"].get(k))
+            raise RuntimeError(
+                f"The checkpoint in '{base_dir}' was written for a different {', '.join(changed)}. "
+                "Remove the output folder and rerun."
+            )
+        checkpoint = cls(base_dir, key, state["completed"], state.get("results"))
+        checkpoint._save()
+        return checkpoint
+
+    def _save(self) -> None:
+        _write_json(
+            os.path.join(self.dir, STATE_FILE),
+            {"key": self.key, "completed": self.completed, "results": self.results}
+        )
+
+    def done(self, name: str) -> bool:
+        return name in self.completed
+
+    def result(self, name: str) -> Any:
+        return self.results.get(name)
+
+    def record(self, name: str, result: Any = None) -> None:
+        self.results[name] = result
+        if name not in self.completed:
+            self.completed.append(name)
+        self._save()
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.dir, name)
+
+    @contextmanager
+    def stage(self, name: str, target_dir: Optional[str] = None) -> Iterator[str]:
+        staging = os.path.join(self.dir, STAGING_DIR, name)
+        shutil.rmtree(staging, ignore_errors=True)
+        os.makedirs(staging)
+        yield staging
+        _move_into(staging, target_dir or self.base_dir)
+        shutil.rmtree(staging)
+        self.record(name)
+
+    def finish(self) -> None:
+        shutil.rmtree(self.dir, ignore_errors=True)
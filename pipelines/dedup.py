@@ -0,0 +1,262 @@
+import pandas as pd
+import numpy as np
+import os
+from typing import List, NamedTuple, Optional
+
+from pipelines.timestamps import (
+    format_event_dates,
+    format_event_times,
+    format_event_timestamps,
+    parse_event_time_series,
+)
+
+RAW_TIME_FORMAT = "%Y-%m-%d %H:%M:%S.%f %z"
+SORT_KEYS = ["user_uuid", "event_name", "event_time"]
+DEDUP_KEYS = ["user_uuid", "event_name"]
+SUMMARY_KEYS = ["user_uuid", "event_name", "event_date"]
+BURST_KEYS = ["user_uuid", "event_name", "burst_start"]
+BURST_TABLE = "burst_summary"
+DERIVED_COLUMNS = ["event_date", "event_day", "event_time_only"]
+
+
+class CsvRows(NamedTuple):
+    header: bytes
+    lines: np.ndarray
+
+
+def parse_raw_event_time(df: pd.DataFrame) -> pd.DataFrame:
+    df["event_time"] = parse_event_time_series(df["event_time"], RAW_TIME_FORMAT)
+    return df
+
+
+def add_derived_columns(df: pd.DataFrame) -> pd.DataFrame:
+    event_date, event_day = format_event_dates(df["event_time"])
+    return df.assign(
+        event_date=event_date,
+        event_day=event_day,
+        event_time_only=format_event_times(df["event_time"], prefix="'")
+    )
+
+
+def with_derived_columns(df: pd.DataFrame) -> pd.DataFrame:
+    if (
+        "event_time" not in df.columns
+        or "event_date" in df.columns
+        or not pd.api.types.is_datetime64_any_dtype(df["event_time"])
+    ):
+        return df
+    return add_derived_columns(df)
+
+
+def format_for_csv(df: pd.DataFrame) -> pd.DataFrame:
+    df = with_derived_columns(df)
+    if "event_time" in df.columns and isinstance(df["event_time"].dtype, pd.DatetimeTZDtype):
+        df = df.assign(event_time=format_event_timestamps(df["event_time"]))
+    return df
+
+
+def event_day_key(df: pd.DataFrame) -> pd.Series:
+    return df["event_time"].dt.normalize().rename("event_date")
+
+
+def _sort_keys(df: pd.DataFrame, by: List[str]) -> Optional[List[np.ndarray]]:
+    keys = []
+    composite, width = None, 1
+    for col in by:
+        values = df[col]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            n = len(values.cat.categories) + 1
+            codes = values.cat.codes.to_numpy().astype(np.int64)
+            codes[codes == -1] = n - 1
+            if composite is not None and width * n < 2**62:
+                composite = composite * n + codes
+                width *= n
+                continue
+            if composite is not None:
+                keys.append(composite)
+            composite, width = codes, n
+            continue
+
+        if not pd.api.types.is_datetime64_any_dtype(values):
+            return None
+        if composite is not None:
+            keys.append(composite)
+            composite, width = None, 1
+        ns = values.dt.as_unit("ns").array.asi8
+        keys.append(np.where(ns == np.iinfo(np.int64).min, np.iinfo(np.int64).max, ns))
+
+    if composite is not None:
+        keys.append(composite)
+    return keys
+
+
+def sort_events(df: pd.DataFrame, by: List[str] = SORT_KEYS) -> pd.DataFrame:
+    keys = _sort_keys(df, by)
+    if keys is None:
+        return df.sort_values(
+            by=by,
+            kind="mergesort"
+        ).reset_index(drop=True)
+
+    order = np.arange(len(df))
+    for key in reversed(keys):
+        order = order[np.argsort(key[order], kind="stable")]
+    return df.take(order).reset_index(drop=True)
+
+
+def mark_canonical(df: pd.DataFrame, threshold_ms: float) -> pd.DataFrame:
+    df["time_diff_ms"] = (
+        df.groupby(DEDUP_KEYS, observed=True)["event_time"]
+          .diff()
+          .dt.total_seconds()
+          .mul(1000)
+    )
+
+    df["is_canonical"] = (
+        df["time_diff_ms"].isna() | (df["time_diff_ms"] > threshold_ms)
+    )
+    return df
+
+
+def select_canonical(df: pd.DataFrame) -> pd.DataFrame:
+    return df[df["is_canonical"]].drop(
+        columns=["time_diff_ms", "is_canonical"]
+    )
+
+
+def aggregate_repetitions(df: pd.DataFrame) -> pd.DataFrame:
+    day_agg = (
+        df.groupby([df["user_uuid"], df["event_name"], event_day_key(df)], observed=True)["event_time"]
+          .agg(
+              start_time="min",
+              end_time="max",
+              frequency="size"
+          )
+          .reset_index()
+    )
+    day_agg["event_date"] = format_event_dates(day_agg["event_date"])[0]
+    return day_agg
+
+
+def finalize_repetition_summary(repetition_summary: pd.DataFrame) -> pd.DataFrame:
+    repetition_summary["repetitions_removed"] = (
+        repetition_summary["frequency"] - 1
+    )
+
+    repetition_summary = repetition_summary[
+        repetition_summary["repetitions_removed"] > 0
+    ].copy()
+
+    repetition_summary["start_time"] = format_event_times(repetition_summary["start_time"])
+    repetition_summary["end_time"] = format_event_times(repetition_summary["end_time"])
+
+    repetition_summary["event_day"] = format_event_dates(
+        pd.to_datetime(repetition_summary["event_date"], format="%Y-%m-%d")
+    )[1]
+    return repetition_summary
+
+
+def summarize_repetitions(df: pd.DataFrame) -> pd.DataFrame:
+    return finalize_repetition_summary(aggregate_repetitions(df))
+
+
+def group_starts(df: pd.DataFrame, keys: List[str] = DEDUP_KEYS) -> np.ndarray:
+    starts = np.zeros(len(df), dtype=bool)
+    if len(df):
+        starts[0] = True
+    for col in keys:
+        values = df[col]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            values = values.cat.codes
+        values = values.to_numpy()
+        starts[1:] |= values[1:] != values[:-1]
+    return starts
+
+
+def aggregate_bursts(df: pd.DataFrame) -> pd.DataFrame:
+    canonical = df["is_canonical"].to_numpy(dtype=bool)
+    new_group = group_starts(df)
+
+    burst_id = np.cumsum(canonical | new_group) - 1
+    starts = np.flatnonzero(np.r_[True, burst_id[1:] != burst_id[:-1]]) if len(df) else np.zeros(0, dtype=np.int64)
+    sizes = np.diff(np.r_[starts, len(df)])
+
+    return pd.DataFrame({
+        "user_uuid": df["user_uuid"].iloc[starts].array,
+        "event_name": df["event_name"].iloc[starts].array,
+        "burst_start": df["event_time"].iloc[starts].array,
+        "burst_end": df["event_time"].iloc[starts + sizes - 1].array,
+        "burst_size": sizes,
+        "continued": ~canonical[starts],
+    })
+
+
+def finalize_burst_summary(bursts: pd.DataFrame) -> pd.DataFrame:
+    bursts = bursts[bursts["burst_size"] > 1].drop(columns="continued")
+    return bursts.assign(
+        repetitions_removed=bursts["burst_size"] - 1,
+        span_ms=(bursts["burst_end"] - bursts["burst_start"]).dt.total_seconds().mul(1000),
+        burst_start=format_event_timestamps(bursts["burst_start"]),
+        burst_end=format_event_timestamps(bursts["burst_end"])
+    ).reset_index(drop=True)
+
+
+def summarize_bursts(df: pd.DataFrame) -> pd.DataFrame:
+    return finalize_burst_summary(aggregate_bursts(df))
+
+
+def build_unique_users(cleaned_events: pd.DataFrame) -> pd.DataFrame:
+    return cleaned_events[["user_uuid"]].drop_duplicates()
+
+
+def build_unique_users_report(user_count: int) -> pd.DataFrame:
+    return pd.DataFrame({
+        "metric": ["total_unique_users"],
+        "value": [user_count]
+    })
+
+
+def safe_user_filename(uid, suffix: str = "") -> str:
+    safe_uid = str(uid).replace("/", "_").replace("\\", "_")
+    return f"user_{safe_uid}{suffix}.csv"
+
+
+def render_csv_header(df: pd.DataFrame) -> bytes:
+    return df.iloc[:0].to_csv(index=False).encode("utf-8")
+
+
+def render_csv_rows(df: pd.DataFrame) -> List[bytes]:
+    text = df.to_csv(index=False, header=False).encode("utf-8")
+    lines = [line + b"\n" for line in text.split(b"\n")[:-1]]
+    if len(lines) == len(df):
+        return lines
+    return [
+        df.iloc[i:i + 1].to_csv(index=False, header=False).encode("utf-8")
+        for i in range(len(df))
+    ]
+
+
+def render_csv(df: pd.DataFrame) -> CsvRows:
+    lines = np.empty(len(df), dtype=object)
+    lines[:] = render_csv_rows(df)
+    return CsvRows(render_csv_header(df), lines)
+
+
+def write_csv_rows(path: str, rows: CsvRows) -> None:
+    with open(path, "wb") as fh:
+        fh.write(rows.header)
+        fh.write(b"".join(rows.lines))
+
+
+def write_per_user_rows(user_uuid: pd.Series, rows: CsvRows, per_user_dir: str, suffix: str = "") -> None:
+    groups = user_uuid.groupby(user_uuid, sort=False, observed=True).indices
+    for uid, positions in groups.items():
+        write_csv_rows(
+            os.path.join(per_user_dir, safe_user_filename(uid, suffix)),
+            CsvRows(rows.header, rows.lines[positions])
+        )
+
+
+def write_per_user_files(events: pd.DataFrame, per_user_dir: str, suffix: str = "") -> None:
+    events = format_for_csv(events)
+    write_per_user_rows(events["user_uuid"], render_csv(events), per_user_dir, suffix)
@@ -0,0 +1,42 @@
+import pandas as pd
+import numpy as np
+from typing import Iterator, List
+
+CATEGORICAL_COLUMNS = ["user_uuid", "event_name", "category"]
+
+
+def encode_column(values: pd.Series) -> pd.Series:
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        categories = values.cat.categories
+        if categories.is_monotonic_increasing:
+            return values
+        return values.cat.reorder_categories(categories.sort_values())
+
+    codes, uniques = pd.factorize(values, sort=True)
+    return pd.Series(
+        pd.Categorical.from_codes(codes, categories=uniques),
+        index=values.index,
+        name=values.name
+    )
+
+
+def encode_events(df: pd.DataFrame, columns: List[str] = CATEGORICAL_COLUMNS) -> pd.DataFrame:
+    for col in columns:
+        if col in df.columns:
+            df[col] = encode_column(df[col])
+    return df
+
+
+def read_events_csv(path: str, columns: List[str] = CATEGORICAL_COLUMNS) -> pd.DataFrame:
+    return encode_events(pd.read_csv(path, dtype={col: "category" for col in columns}), columns)
+
+
+def iter_events_csv(path: str, chunk_rows: int, columns: List[str] = CATEGORICAL_COLUMNS) -> Iterator[pd.DataFrame]:
+    for chunk in pd.read_csv(path, dtype={col: "category" for col in columns}, chunksize=chunk_rows):
+        yield encode_events(chunk, columns)
+
+
+def user_codes(user_uuid: pd.Series) -> np.ndarray:
+    if isinstance(user_uuid.dtype, pd.CategoricalDtype):
+        return user_uuid.cat.codes.to_numpy()
+    return pd.factorize(user_uuid)[0]
@@ -0,0 +1,310 @@
+import pandas as pd
+import numpy as np
+import os
+import pickle
+import re
+import shutil
+import tempfile
+from datetime import timedelta, timezone, tzinfo
+from typing import Iterator, List, Optional, Tuple
+
+from pipelines.checkpoint import Checkpoint
+from pipelines.dedup import (
+    BURST_TABLE,
+    DEDUP_KEYS,
+    parse_raw_event_time,
+    event_day_key,
+    format_for_csv,
+    mark_canonical,
+    select_canonical,
+    aggregate_repetitions,
+    finalize_repetition_summary,
+    aggregate_bursts,
+    finalize_burst_summary,
+    safe_user_filename,
+)
+from pipelines.inputs import iter_raw_event_chunks
+from pipelines.instrumentation import stage, timed
+from pipelines.storage import DEFAULT_OUTPUT_FORMAT, TableWriter
+from pipelines.timestamps import common_timezone
+from pipelines.user_store import DEFAULT_PER_USER_LAYOUT, UserStoreWriter, store_dir_for, writes_per_user_files
+from pipelines.user_summary import UserSummaryWriter
+
+DEFAULT_MEMORY_BUDGET = "1GB"
+SAMPLE_ROWS = 10_000
+MIN_CHUNK_ROWS = 10_000
+MIN_BLOCK_ROWS = 1_000
+MAX_FAN_IN = 64
+# Sorting a chunk and merging blocks holds a few copies of the rows at once
+# (the parsed frame, the sort permutation and the concatenated output).
+WORKING_SET_FACTOR = 4
+
+_KEY_SEP = "\x00"
+_NAT = np.iinfo(np.int64).min
+_SIGN_BIT = np.uint64(1 << 63)
+_NAT_KEY = np.uint64(np.iinfo(np.uint64).max)
+_UNITS = {"": 1, "B": 1, "K": 1024, "KB": 1024, "M": 1024 ** 2, "MB": 1024 ** 2,
+          "G": 1024 ** 3, "GB": 1024 ** 3, "T": 1024 ** 4, "TB": 1024 ** 4}
+
+
+def parse_memory_budget(value: str) -> int:
+    match = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([A-Za-z]*)\s*", str(value))
+    if not match or match.group(2).upper() not in _UNITS:
+        raise ValueError(f"Invalid memory budget: {value!r} (expected e.g. 512MB or 2GB)")
+    return int(float(match.group(1)) * _UNITS[match.group(2).upper()])
+
+
+def estimate_row_bytes(input_file: str) -> float:
+    sample = pd.read_csv(input_file, nrows=SAMPLE_ROWS)
+    if sample.empty:
+        return 1.0
+    sample = parse_raw_event_time(sample)
+    return sample.memory_usage(deep=True).sum() / len(sample)
+
+
+def plan_chunk_rows(input_file: str, memory_budget: int) -> Tuple[int, int]:
+    row_bytes = estimate_row_bytes(input_file)
+    chunk_rows = max(MIN_CHUNK_ROWS, int(memory_budget / (row_bytes * WORKING_SET_FACTOR)))
+    block_rows = max(MIN_BLOCK_ROWS, chunk_rows // MAX_FAN_IN)
+    return chunk_rows, block_rows
+
+
+def _sort_key(df: pd.DataFrame) -> pd.Series:
+    ns = df["event_time"].dt.as_unit("ns").array.asi8
+    ordered = np.where(ns == _NAT, _NAT_KEY, ns.view(np.uint64) ^ _SIGN_BIT)
+    key = df[DEDUP_KEYS[0]].astype(str)
+    for col in DEDUP_KEYS[1:]:
+        key = key + _KEY_SEP + df[col].astype(str)
+    return key + _KEY_SEP + pd.Series(ordered, index=df.index).astype(str).str.zfill(20)
+
+
+def _write_run(path: str, blocks) -> None:
+    with open(path, "wb") as fh:
+        for block in blocks:
+            pickle.dump(block, fh, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def _read_run(path: str, tz: Optional[tzinfo] = None) -> Iterator[pd.DataFrame]:
+    with open(path, "rb") as fh:
+        while True:
+            try:
+                block = pickle.load(fh)
+            except EOFError:
+                return
+            if tz is not None and block["event_time"].dt.tz != tz:
+                block["event_time"] = block["event_time"].dt.tz_convert(tz)
+            yield block
+
+
+def _split_blocks(df: pd.DataFrame, block_rows: int) -> Iterator[pd.DataFrame]:
+    for start in range(0, len(df), block_rows):
+        yield df.iloc[start:start + block_rows]
+
+
+def _rows_up_to(block: pd.DataFrame, cut_key: str, cut_seq: int) -> int:
+    keys = block["_key"].to_numpy(dtype=object)
+    lo = np.searchsorted(keys, cut_key, side="left")
+    hi = np.searchsorted(keys, cut_key, side="right")
+    seqs = block["_seq"].to_numpy()[lo:hi]
+    return int(lo + np.searchsorted(seqs, cut_seq, side="right"))
+
+
+def merge_runs(run_paths: List[str], tz: Optional[tzinfo] = None) -> Iterator[pd.DataFrame]:
+    readers = [_read_run(p, tz) for p in run_paths]
+    heads = [next(r, None) for r in readers]
+    active = [i for i, h in enumerate(heads) if h is not None]
+
+    while active:
+        cut_key, cut_seq = min(
+            (heads[i]["_key"].iat[-1], heads[i]["_seq"].iat[-1]) for i in active
+        )
+
+        parts = []
+        for i in active:
+            n = _rows_up_to(heads[i], cut_key, cut_seq)
+            if n:
+                parts.append(heads[i].iloc[:n])
+                heads[i] = heads[i].iloc[n:]
+            if heads[i].empty:
+                heads[i] = next(readers[i], None)
+        active = [i for i in active if heads[i] is not None]
+
+        yield pd.concat(parts).sort_values(["_key", "_seq"], kind="mergesort")
+
+
+def build_sorted_runs(
+    input_files: List[str],
+    tmp_dir: str,
+    chunk_rows: int,
+    block_rows: int
+) -> Tuple[List[str], tzinfo]:
+    runs = []
+    zones = set()
+    seq = 0
+    for chunk in iter_raw_event_chunks(input_files, chunk_rows):
+        chunk = parse_raw_event_time(chunk)
+        if chunk["event_time"].notna().any():
+            zones.add(chunk["event_time"].dt.tz)
+        chunk["_seq"] = np.arange(seq, seq + len(chunk), dtype=np.int64)
+        seq += len(chunk)
+        chunk["_key"] = _sort_key(chunk)
+        chunk = chunk.sort_values(["_key", "_seq"], kind="mergesort")
+
+        path = os.path.join(tmp_dir, f"run_{len(runs):06d}.pkl")
+        _write_run(path, _split_blocks(chunk, block_rows))
+        runs.append(path)
+    # A chunk falls back to UTC only when its own offsets disagree, so the run
+    # keeps a single offset exactly when every chunk agrees on it.
+    return runs, common_timezone(zones)
+
+
+def reduce_runs(
+    runs: List[str],
+    tmp_dir: str,
+    block_rows: int,
+    tz: Optional[tzinfo] = None,
+    fan_in: int = MAX_FAN_IN
+) -> List[str]:
+    level = 0
+    while len(runs) > fan_in:
+        merged = []
+        for start in range(0, len(runs), fan_in):
+            group = runs[start:start + fan_in]
+            path = os.path.join(tmp_dir, f"merge_{level:02d}_{len(merged):06d}.pkl")
+            _write_run(
+                path,
+                (b for block in merge_runs(group, tz) for b in _split_blocks(block, block_rows))
+            )
+            for p in group:
+                os.remove(p)
+            merged.append(path)
+        runs = merged
+        level += 1
+    return runs
+
+
+def _record_runs(checkpoint: Optional[Checkpoint], tmp_dir: str, runs: List[str], tz: tzinfo) -> None:
+    if checkpoint is not None:
+        offset = int(tz.utcoffset(None).total_seconds()) // 60
+        checkpoint.record("sorted_runs", {"dir": tmp_dir, "runs": runs, "utc_offset_minutes": offset})
+
+
+def _append_csv(df: pd.DataFrame, path: str) -> None:
+    df = format_for_csv(df)
+    df.to_csv(path, mode="a", header=not os.path.exists(path), index=False)
+
+
+def run_external_dedup(
+    input_files: List[str],
+    base_dir: str,
+    per_user_dir: str,
+    threshold_ms: float,
+    memory_budget: str = DEFAULT_MEMORY_BUDGET,
+    spill_dir: Optional[str] = None,
+    output_format: str = DEFAULT_OUTPUT_FORMAT,
+    per_user_layout: str = DEFAULT_PER_USER_LAYOUT,
+    checkpoint: Optional[Checkpoint] = None
+) -> int:
+    budget = parse_memory_budget(memory_budget)
+    chunk_rows, block_rows = plan_chunk_rows(input_files[0], budget)
+    per_user_csv = writes_per_user_files(per_user_layout, output_format)
+    store_out = UserStoreWriter(store_dir_for(base_dir)) if per_user_layout == "store" else None
+
+    cleaned_out = TableWriter(base_dir, "cleaned_events", output_format)
+    summary_out = TableWriter(base_dir, "repetition_summary", output_format)
+    bursts_out = TableWriter(base_dir, BURST_TABLE, output_format)
+    users_out = TableWriter(base_dir, "unique_users_list", output_format)
+    user_summary_out = UserSummaryWriter(base_dir, output_format)
+
+    saved = checkpoint.result("sorted_runs") if checkpoint is not None else None
+    if saved is not None and not all(os.path.exists(p) for p in saved["runs"]):
+        shutil.rmtree(saved["dir"], ignore_errors=True)
+        saved = None
+    tmp_dir = saved["dir"] if saved is not None else tempfile.mkdtemp(prefix="dedup_runs_", dir=spill_dir)
+    finished = False
+    try:
+        if saved is None:
+            runs, tz = timed("build_sorted_runs", build_sorted_runs, input_files, tmp_dir, chunk_rows, block_rows)
+            _record_runs(checkpoint, tmp_dir, runs, tz)
+        else:
+            runs, tz = saved["runs"], timezone(timedelta(minutes=saved["utc_offset_minutes"]))
+        if len(runs) > MAX_FAN_IN:
+            runs = timed("reduce_runs", reduce_runs, runs, tmp_dir, block_rows, tz)
+            _record_runs(checkpoint, tmp_dir, runs, tz)
+
+        with stage("merge_dedup_write") as merged:
+            merged.rows_in = merged.rows_out = 0
+            carry = None
+            open_burst = None
+            wrote_bursts = False
+            last_user = None
+            total_users = 0
+
+            for block in merge_runs(runs, tz):
+                block = block.drop(columns=["_key", "_seq"])
+                merged.rows_in += len(block)
+                n_carry = 0
+                if carry is not None:
+                    n_carry = len(carry)
+                    block = pd.concat([carry, block])
+                block = mark_canonical(block.reset_index(drop=True), threshold_ms)
+
+                fresh = block.iloc[n_carry:][DEDUP_KEYS + ["event_time", "is_canonical"]]
+                if open_burst is not None:
+                    fresh = pd.concat([open_burst, fresh])
+                bursts = aggregate_bursts(fresh)
+                if not bursts.empty:
+                    open_burst = fresh.iloc[len(fresh) - bursts["burst_size"].iat[-1]:]
+                    closed = finalize_burst_summary(bursts.iloc[:-1])
+                    if not closed.empty:
+                        bursts_out.write(closed)
+                        wrote_bursts = True
+
+                cleaned = select_canonical(block.iloc[n_carry:])
+                if not cleaned.empty:
+                    merged.rows_out += len(cleaned)
+                    cleaned_out.write(cleaned)
+                    user_summary_out.write(cleaned)
+                    if store_out is not None:
+                        store_out.write(cleaned)
+                    if per_user_csv:
+                        for uid, udf in format_for_csv(cleaned).groupby("user_uuid", sort=False):
+                            _append_csv(udf, os.path.join(per_user_dir, safe_user_filename(uid)))
+
+                    users = cleaned[["user_uuid"]].drop_duplicates()
+                    if last_user is not None and users["user_uuid"].iat[0] == last_user:
+                        users = users.iloc[1:]
+                    if not users.empty:
+                        users_out.write(users)
+                        total_users += len(users)
+                        last_user = users["user_uuid"].iat[-1]
+
+                day = event_day_key(block)
+                in_tail = (block[DEDUP_KEYS] == block[DEDUP_KEYS].iloc[-1]).all(axis=1) & (day == day.iat[-1])
+                carry = block.loc[in_tail].drop(columns=["time_diff_ms", "is_canonical"])
+
+                done = block.loc[~in_tail]
+                if not done.empty:
+                    summary_out.write(finalize_repetition_summary(aggregate_repetitions(done)))
+
+            if carry is not None:
+                summary_out.write(finalize_repetition_summary(aggregate_repetitions(carry)))
+            if open_burst is not None:
+                closed = finalize_burst_summary(aggregate_bursts(open_burst))
+                if not closed.empty or not wrote_bursts:
+                    bursts_out.write(closed)
+        finished = True
+    finally:
+        cleaned_out.close()
+        summary_out.close()
+        bursts_out.close()
+        users_out.close()
+        user_summary_out.close()
+        if store_out is not None:
+            store_out.close()
+        # Recorded runs outlive a failed merge so --resume can start from them.
+        saved = checkpoint.result("sorted_runs") if checkpoint is not None else None
+        if finished or saved is None or saved["dir"] != tmp_dir:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    return total_users
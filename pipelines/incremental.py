@@ -0,0 +1,361 @@
+import pandas as pd
+import numpy as np
+import io
+import json
+import os
+import warnings
+from typing import Any, Dict, List, Optional, Tuple
+
+from pipelines.dedup import (
+    BURST_KEYS,
+    BURST_TABLE,
+    DEDUP_KEYS,
+    SUMMARY_KEYS,
+    select_canonical,
+    aggregate_repetitions,
+    finalize_repetition_summary,
+    aggregate_bursts,
+    finalize_burst_summary,
+    group_starts,
+    build_unique_users,
+    build_unique_users_report,
+    safe_user_filename,
+    format_for_csv,
+    render_csv,
+    with_derived_columns,
+    write_per_user_rows,
+)
+from pipelines.instrumentation import stage, timed
+from pipelines.storage import (
+    append_table,
+    formats_for,
+    read_table,
+    read_user_partitions,
+    update_user_partitions,
+    write_table,
+)
+from pipelines.timestamps import format_event_timestamps, parse_event_time_series
+from pipelines.user_store import DEFAULT_PER_USER_LAYOUT, UserStore, store_dir_for
+from pipelines.user_summary import update_sessions, update_user_summary
+
+STATE_DIR = "_state"
+RUN_FILE = "run.json"
+WATERMARKS_TABLE = "watermarks"
+INCREMENT_TABLE = "last_increment"
+STATE_FORMAT = "parquet"
+PER_USER_BATCH_BYTES = 64 * 2**20
+
+
+def state_dir(base_dir: str) -> str:
+    return os.path.join(base_dir, STATE_DIR)
+
+
+def has_state(base_dir: str) -> bool:
+    return os.path.exists(os.path.join(state_dir(base_dir), RUN_FILE))
+
+
+def read_run_info(base_dir: str) -> Dict[str, Any]:
+    with open(os.path.join(state_dir(base_dir), RUN_FILE)) as fh:
+        return json.load(fh)
+
+
+def write_run_info(base_dir: str, info: Dict[str, Any]) -> None:
+    path = os.path.join(state_dir(base_dir), RUN_FILE)
+    with open(path + ".tmp", "w") as fh:
+        json.dump(info, fh, indent=2)
+    os.replace(path + ".tmp", path)
+
+
+def load_watermarks(base_dir: str, user_uuid: pd.Series) -> pd.DataFrame:
+    return read_user_partitions(state_dir(base_dir), WATERMARKS_TABLE, user_uuid)
+
+
+def load_increment(base_dir: str) -> pd.DataFrame:
+    return read_table(state_dir(base_dir), INCREMENT_TABLE)
+
+
+def _last_day_aggregates(day_agg: pd.DataFrame) -> pd.DataFrame:
+    last_day = day_agg.groupby(DEDUP_KEYS, observed=True)["event_date"].transform("max")
+    return (
+        day_agg[day_agg["event_date"] == last_day]
+        .rename(columns={
+            "event_date": "last_date",
+            "start_time": "day_start_time",
+            "end_time": "day_end_time",
+            "frequency": "day_frequency"
+        })
+    )
+
+
+def _last_bursts(bursts: pd.DataFrame) -> pd.DataFrame:
+    last = np.r_[group_starts(bursts)[1:], True][:len(bursts)]
+    return bursts.loc[last, DEDUP_KEYS + ["burst_start", "burst_size"]]
+
+
+def build_watermarks(
+    df: pd.DataFrame,
+    day_agg: pd.DataFrame,
+    bursts: Optional[pd.DataFrame] = None
+) -> pd.DataFrame:
+    last_seen = (
+        df.groupby(DEDUP_KEYS, as_index=False, observed=True)
+          .agg(last_event_time=("event_time", "last"))
+    )
+    watermarks = last_seen.merge(_last_day_aggregates(day_agg), on=DEDUP_KEYS, how="left")
+    if bursts is not None:
+        watermarks = watermarks.merge(_last_bursts(bursts), on=DEDUP_KEYS, how="left")
+    return watermarks
+
+
+def update_watermarks(
+    watermarks: pd.DataFrame,
+    df: pd.DataFrame,
+    day_agg: pd.DataFrame,
+    bursts: Optional[pd.DataFrame] = None
+) -> pd.DataFrame:
+    fresh = build_watermarks(df, day_agg, bursts)
+    keys = pd.MultiIndex.from_frame(watermarks[DEDUP_KEYS])
+    touched = keys.isin(pd.MultiIndex.from_frame(fresh[DEDUP_KEYS]))
+    return pd.concat([watermarks[~touched], fresh], ignore_index=True)
+
+
+def apply_watermarks(df: pd.DataFrame, watermarks: pd.DataFrame, threshold_ms: float) -> pd.DataFrame:
+    first = df.loc[df["time_diff_ms"].isna(), DEDUP_KEYS + ["event_time"]]
+    prev = first.merge(
+        watermarks[DEDUP_KEYS + ["last_event_time"]],
+        on=DEDUP_KEYS,
+        how="left"
+    )["last_event_time"]
+
+    diff_ms = (
+        (first["event_time"].reset_index(drop=True) - prev)
+        .dt.total_seconds()
+        .mul(1000)
+    )
+    diff_ms.index = first.index
+
+    late = diff_ms < 0
+    if late.any():
+        warnings.warn(
+            f"{int(late.sum())} (user_uuid, event_name) groups have rows older than their "
+            "watermark; they are deduplicated against the new data only."
+        )
+        diff_ms[late] = float("nan")
+
+    df.loc[first.index, "time_diff_ms"] = diff_ms
+    df["is_canonical"] = (
+        df["time_diff_ms"].isna() | (df["time_diff_ms"] > threshold_ms)
+    )
+    return df
+
+
+def combine_day_aggregates(day_agg: pd.DataFrame, watermarks: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    prev = day_agg[SUMMARY_KEYS].merge(
+        watermarks[DEDUP_KEYS + ["last_date", "day_start_time", "day_end_time", "day_frequency"]]
+        .rename(columns={"last_date": "event_date"}),
+        on=SUMMARY_KEYS,
+        how="left"
+    ).set_index(day_agg.index)
+    continued = prev["day_frequency"].notna()
+
+    day_agg = day_agg.copy()
+    tz = day_agg["start_time"].dt.tz
+    prev_start = prev["day_start_time"].dt.tz_convert(tz)
+    prev_end = prev["day_end_time"].dt.tz_convert(tz)
+
+    day_agg["start_time"] = day_agg["start_time"].where(
+        ~continued | (day_agg["start_time"] <= prev_start), prev_start
+    )
+    day_agg["end_time"] = day_agg["end_time"].where(
+        ~continued | (day_agg["end_time"] >= prev_end), prev_end
+    )
+    day_agg["frequency"] += prev["day_frequency"].fillna(0).astype(int)
+
+    replaced = prev.loc[continued & (prev["day_frequency"] > 1), SUMMARY_KEYS]
+    return day_agg, replaced
+
+
+def combine_bursts(bursts: pd.DataFrame, watermarks: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    if "burst_start" not in watermarks.columns:
+        return bursts, pd.DataFrame(columns=BURST_KEYS)
+
+    prev = bursts[DEDUP_KEYS].merge(
+        watermarks[DEDUP_KEYS + ["burst_start", "burst_size"]],
+        on=DEDUP_KEYS,
+        how="left"
+    ).set_index(bursts.index)
+    continued = bursts["continued"] & prev["burst_size"].notna()
+
+    bursts = bursts.copy()
+    prev_start = prev["burst_start"].dt.tz_convert(bursts["burst_start"].dt.tz)
+    bursts["burst_start"] = bursts["burst_start"].where(~continued, prev_start)
+    bursts["burst_size"] += prev["burst_size"].where(continued, 0).astype(int)
+
+    replaced = continued & (prev["burst_size"] > 1)
+    return bursts, pd.DataFrame({
+        "user_uuid": bursts.loc[replaced, "user_uuid"].astype(str),
+        "event_name": bursts.loc[replaced, "event_name"].astype(str),
+        "burst_start": format_event_timestamps(prev_start[replaced]),
+    })
+
+
+def _replace_summary_rows(
+    base_dir: str,
+    rows: pd.DataFrame,
+    replaced: pd.DataFrame,
+    output_format: str,
+    table: str = "repetition_summary",
+    keys: List[str] = SUMMARY_KEYS
+) -> None:
+    if rows.empty and replaced.empty:
+        return
+
+    def update(summary: pd.DataFrame) -> pd.DataFrame:
+        index = pd.MultiIndex.from_frame(summary[keys].astype(str))
+        drop = index.isin(pd.MultiIndex.from_frame(replaced[keys].astype(str)))
+        combined = pd.concat([
+            summary[~drop].astype({"user_uuid": str}),
+            rows.astype({"user_uuid": str}),
+        ], ignore_index=True)
+        return combined.sort_values("user_uuid", kind="mergesort")
+
+    users = pd.concat([rows["user_uuid"].astype(str), replaced["user_uuid"].astype(str)], ignore_index=True)
+    update_user_partitions(base_dir, table, output_format, users, update)
+
+
+def _read_user_files(paths: List[str]) -> pd.DataFrame:
+    chunks = []
+    for i, path in enumerate(paths):
+        with open(path, "rb") as fh:
+            header = fh.readline()
+            chunks.append(header + fh.read() if i == 0 else fh.read())
+    existing = pd.read_csv(io.BytesIO(b"".join(chunks)))
+    existing["event_time"] = parse_event_time_series(existing["event_time"])
+    return existing
+
+
+def rewrite_per_user_files(
+    events: pd.DataFrame,
+    per_user_dir: str,
+    sort_by: List[str],
+    suffix: str = "",
+    batch_bytes: int = PER_USER_BATCH_BYTES
+) -> None:
+    events = with_derived_columns(events)
+    groups = events.groupby("user_uuid", sort=False, observed=True).indices
+    batch, paths, size = [], [], 0
+    for i, uid in enumerate(groups):
+        path = os.path.join(per_user_dir, safe_user_filename(uid, suffix))
+        batch.append(groups[uid])
+        if os.path.exists(path):
+            paths.append(path)
+            size += os.path.getsize(path)
+        if size < batch_bytes and i < len(groups) - 1:
+            continue
+        udf = events.iloc[np.concatenate(batch)]
+        if paths:
+            udf = pd.concat([_read_user_files(paths), udf], ignore_index=True)
+        udf = udf.sort_values(by=sort_by, kind="mergesort")
+        write_per_user_rows(udf["user_uuid"], render_csv(format_for_csv(udf)), per_user_dir, suffix)
+        batch, paths, size = [], [], 0
+
+
+def initialize_state(
+    base_dir: str,
+    df: pd.DataFrame,
+    output_format: str,
+    per_user_layout: str = DEFAULT_PER_USER_LAYOUT,
+    source_run_id: Optional[int] = None,
+    track_bursts: bool = False
+) -> None:
+    os.makedirs(state_dir(base_dir), exist_ok=True)
+    watermarks = build_watermarks(
+        df,
+        aggregate_repetitions(df),
+        aggregate_bursts(df) if track_bursts else None
+    )
+    write_table(watermarks, state_dir(base_dir), WATERMARKS_TABLE, STATE_FORMAT)
+    write_run_info(base_dir, {
+        "run_id": 1,
+        "source_run_id": source_run_id,
+        "output_format": output_format,
+        "per_user_layout": per_user_layout
+    })
+
+
+def apply_increment(
+    df: pd.DataFrame,
+    base_dir: str,
+    per_user_dir: str,
+    table: str,
+    sort_by: List[str],
+    threshold_ms: float,
+    output_format: str,
+    per_user_layout: str = DEFAULT_PER_USER_LAYOUT,
+    suffix: str = "",
+    write_increment: bool = False,
+    source_run_id: Optional[int] = None,
+    track_bursts: bool = False,
+    track_users: bool = False
+) -> pd.DataFrame:
+    info = read_run_info(base_dir)
+    built = {
+        "format": info["output_format"],
+        "per-user-layout": info.get("per_user_layout", DEFAULT_PER_USER_LAYOUT)
+    }
+    given = {"format": output_format, "per-user-layout": per_user_layout}
+    for option in built:
+        if built[option] != given[option]:
+            raise ValueError(
+                f"Output folder '{base_dir}' was built with --{option} {built[option]}; "
+                f"incremental runs must use the same value (got {given[option]})."
+            )
+    watermarks = load_watermarks(base_dir, df["user_uuid"])
+
+    df = timed("apply_watermarks", apply_watermarks, df, watermarks, threshold_ms)
+    cleaned = select_canonical(df)
+
+    day_agg, replaced = combine_day_aggregates(timed("aggregate_repetitions", aggregate_repetitions, df), watermarks)
+    _replace_summary_rows(base_dir, finalize_repetition_summary(day_agg.copy()), replaced, output_format)
+
+    bursts = None
+    if track_bursts:
+        bursts, replaced = combine_bursts(timed("aggregate_bursts", aggregate_bursts, df), watermarks)
+        _replace_summary_rows(base_dir, finalize_burst_summary(bursts), replaced, output_format, BURST_TABLE, BURST_KEYS)
+
+    append_table(cleaned, base_dir, table, output_format)
+    if track_users:
+        timed("update_user_summary", update_user_summary, base_dir, cleaned, output_format)
+        timed("update_sessions", update_sessions, base_dir, cleaned, output_format)
+
+    known_users = set(watermarks["user_uuid"].astype(str))
+    unique_users = build_unique_users(cleaned)
+    new_users = unique_users[~unique_users["user_uuid"].astype(str).isin(known_users)]
+    append_table(new_users, base_dir, "unique_users_list", output_format)
+
+    total_users = int(read_table(base_dir, "unique_users_count")["value"].iat[0]) + len(new_users)
+    for fmt in formats_for(output_format):
+        write_table(build_unique_users_report(total_users), base_dir, "unique_users_count", fmt)
+
+    with stage("per_user_files", cleaned):
+        if per_user_layout == "store":
+            UserStore(store_dir_for(base_dir)).update_users(cleaned, sort_by)
+        elif "csv" in formats_for(output_format):
+            rewrite_per_user_files(cleaned, per_user_dir, sort_by, suffix)
+
+    if write_increment:
+        write_table(cleaned, state_dir(base_dir), INCREMENT_TABLE, STATE_FORMAT)
+    update_user_partitions(
+        state_dir(base_dir),
+        WATERMARKS_TABLE,
+        STATE_FORMAT,
+        df["user_uuid"],
+        lambda current: update_watermarks(current, df, day_agg, bursts)
+    )
+    write_run_info(base_dir, {
+        "run_id": info["run_id"] + 1,
+        "source_run_id": source_run_id,
+        "output_format": output_format,
+        "per_user_layout": per_user_layout
+    })
+    return cleaned
@@ -0,0 +1,89 @@
+import pandas as pd
+import glob
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from typing import Iterator, List, Optional, Tuple
+
+from pipelines.dedup import RAW_TIME_FORMAT
+from pipelines.encoding import CATEGORICAL_COLUMNS, encode_events, iter_events_csv
+from pipelines.instrumentation import stage
+from pipelines.timestamps import (
+    ParsedEventTimes,
+    combine_parsed,
+    parse_event_times,
+    to_datetime_series,
+    warn_fallback_rows,
+)
+
+INPUT_SUFFIXES = (".csv", ".csv.gz", ".csv.zst")
+
+
+def resolve_inputs(spec: str) -> List[str]:
+    if os.path.isdir(spec):
+        paths = [
+            os.path.join(spec, name) for name in os.listdir(spec)
+            if name.endswith(INPUT_SUFFIXES) and not name.startswith(".")
+        ]
+    elif glob.has_magic(spec):
+        paths = [p for p in glob.glob(spec) if os.path.isfile(p)]
+    else:
+        paths = [spec] if os.path.exists(spec) else []
+
+    if not paths:
+        raise FileNotFoundError(f"No input files found for: {spec}")
+    return sorted(paths)
+
+
+def default_read_workers(paths: List[str]) -> int:
+    return max(1, min(len(paths), os.cpu_count() or 1))
+
+
+def _read_shard(path: str, parse_times: bool) -> Tuple[pd.DataFrame, Optional[ParsedEventTimes]]:
+    df = pd.read_csv(path, dtype={col: "category" for col in CATEGORICAL_COLUMNS})
+    if not parse_times:
+        return df, None
+    return df.drop(columns="event_time"), parse_event_times(df["event_time"], RAW_TIME_FORMAT)
+
+
+def _concat_shards(frames: List[pd.DataFrame]) -> pd.DataFrame:
+    columns = frames[0].columns
+    for frame in frames[1:]:
+        if not frame.columns.equals(columns):
+            raise ValueError(f"Input shards have different columns: {list(columns)} and {list(frame.columns)}")
+    if len(frames) == 1:
+        return frames[0]
+
+    combined = {}
+    for col in columns:
+        parts = [frame[col] for frame in frames]
+        if all(isinstance(part.dtype, pd.CategoricalDtype) for part in parts):
+            combined[col] = pd.Series(pd.api.types.union_categoricals(parts, sort_categories=True), name=col)
+        else:
+            combined[col] = pd.concat(parts, ignore_index=True)
+    return pd.DataFrame(combined, columns=columns)
+
+
+def read_raw_events(paths: List[str], workers: int = 1, parse_times: bool = True) -> pd.DataFrame:
+    columns = pd.read_csv(paths[0], nrows=0).columns
+    with stage("read_shards") as st:
+        if workers > 1 and len(paths) > 1:
+            with ProcessPoolExecutor(max_workers=min(workers, len(paths))) as pool:
+                shards = list(pool.map(_read_shard, paths, repeat(parse_times)))
+        else:
+            shards = [_read_shard(path, parse_times) for path in paths]
+        st.rows_out = sum(len(df) for df, _ in shards)
+
+    with stage("combine_shards", st.rows_out):
+        df = encode_events(_concat_shards([df for df, _ in shards]))
+        if parse_times:
+            parsed = combine_parsed([p for _, p in shards])
+            warn_fallback_rows(parsed.fallback_rows, len(df))
+            df["event_time"] = to_datetime_series(parsed, index=df.index)
+            df = df[columns]
+    return df
+
+
+def iter_raw_event_chunks(paths: List[str], chunk_rows: int) -> Iterator[pd.DataFrame]:
+    for path in paths:
+        yield from iter_events_csv(path, chunk_rows)
@@ -0,0 +1,294 @@
+import argparse
+import cProfile
+import hashlib
+import json
+import os
+import platform
+import resource
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterator, List, Optional, Union
+
+MANIFEST_FILE = "run_manifest.json"
+PROFILE_DIR = "_profile"
+PROFILERS = ["cprofile", "tracemalloc"]
+TRACEMALLOC_TOP = 30
+_MB = 1024 * 1024
+_HASH_BLOCK = 8 * _MB
+
+_active: Optional["RunManifest"] = None
+
+
+def _proc_status_bytes(field: str) -> Optional[int]:
+    try:
+        with open("/proc/self/status") as fh:
+            for line in fh:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def current_rss() -> Optional[int]:
+    return _proc_status_bytes("VmRSS")
+
+
+def peak_rss() -> int:
+    peak = _proc_status_bytes("VmHWM")
+    if peak is None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == "darwin" else 1024)
+    return peak
+
+
+def reset_peak_rss() -> bool:
+    try:
+        with open("/proc/self/clear_refs", "w") as fh:
+            fh.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def _cpu_seconds() -> float:
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return time.process_time() + children.ru_utime + children.ru_stime
+
+
+def _mb(value: Optional[int]) -> Optional[float]:
+    return None if value is None else round(value / _MB, 1)
+
+
+def _shape_rows(value: Any) -> Optional[int]:
+    shape = getattr(value, "shape", None)
+    return int(shape[0]) if shape else None
+
+
+def file_fingerprint(path: str) -> Dict[str, Any]:
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        while True:
+            block = fh.read(_HASH_BLOCK)
+            if not block:
+                break
+            digest.update(block)
+    stat = os.stat(path)
+    return {
+        "path": os.path.abspath(path),
+        "bytes": stat.st_size,
+        "mtime": datetime.fromtimestamp(stat.st_mtime, timezone.utc).isoformat(timespec="seconds"),
+        "sha256": digest.hexdigest(),
+    }
+
+
+class Stage:
+    def __init__(self, name: str, parent: Optional[str], rows_in: Optional[int]):
+        self.name = name
+        self.parent = parent
+        self.rows_in = rows_in
+        self.rows_out: Optional[int] = None
+        self.peak_seen = 0
+        self.extra: Dict[str, Any] = {}
+
+    def record(self, wall: float, cpu: float, rss_start: Optional[int], peak: int) -> Dict[str, Any]:
+        return {
+            "stage": self.name,
+            "parent": self.parent,
+            "wall_seconds": round(wall, 4),
+            "cpu_seconds": round(cpu, 4),
+            "rss_start_mb": _mb(rss_start),
+            "peak_rss_mb": _mb(peak),
+            "peak_delta_mb": None if rss_start is None else _mb(max(peak - rss_start, 0)),
+            "rows_in": self.rows_in,
+            "rows_out": self.rows_out,
+            **self.extra,
+        }
+
+
+class RunManifest:
+    def __init__(
+        self,
+        pipeline: str,
+        out_dir: str,
+        thresholds: Dict[str, Any],
+        options: Dict[str, Any],
+        profile: Optional[str] = None,
+        profile_stages: Optional[List[str]] = None
+    ):
+        self.out_dir = out_dir
+        self.profile = profile
+        self.profile_stages = set(profile_stages) if profile_stages else None
+        self.exact_peaks = reset_peak_rss()
+        self.stages: List[Dict[str, Any]] = []
+        self._stack: List[Stage] = []
+        self._profiling = False
+        self._peak_seen = 0
+        self._start = time.perf_counter()
+        self._cpu_start = _cpu_seconds()
+        self.data: Dict[str, Any] = {
+            "pipeline": pipeline,
+            "started": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "argv": sys.argv[1:],
+            "options": options,
+            "thresholds": thresholds,
+            "input": None,
+            "peak_memory": "VmHWM per stage" if self.exact_peaks else "process high-water mark",
+            "profile": profile,
+        }
+
+    def set_input(self, path: Union[str, List[str], None]) -> None:
+        if not path:
+            return
+        with self.stage("hash_input") as st:
+            if isinstance(path, str) or len(path) == 1:
+                self.data["input"] = file_fingerprint(path if isinstance(path, str) else path[0])
+            else:
+                files = [file_fingerprint(p) for p in path]
+                self.data["input"] = {"files": files, "bytes": sum(f["bytes"] for f in files)}
+            st.extra["bytes"] = self.data["input"]["bytes"]
+
+    def _should_profile(self, stage: Stage) -> bool:
+        if self.profile is None or self._profiling:
+            return False
+        if self.profile_stages is None:
+            return stage.parent is None
+        return stage.name in self.profile_stages
+
+    def _profile_path(self, stage: Stage, ext: str) -> str:
+        folder = os.path.join(self.out_dir, PROFILE_DIR)
+        os.makedirs(folder, exist_ok=True)
+        name = stage.name if stage.parent is None else f"{stage.parent}.{stage.name}"
+        return os.path.join(folder, f"{name}.{ext}")
+
+    @contextmanager
+    def stage(self, name: str, rows_in: Any = None) -> Iterator[Stage]:
+        parent = self._stack[-1] if self._stack else None
+        rows_in = rows_in if isinstance(rows_in, int) else _shape_rows(rows_in)
+        stage = Stage(name, parent.name if parent else None, rows_in)
+
+        if parent is not None:
+            parent.peak_seen = max(parent.peak_seen, peak_rss())
+        else:
+            self._peak_seen = max(self._peak_seen, peak_rss())
+        rss_start = current_rss()
+        if self.exact_peaks:
+            reset_peak_rss()
+
+        profiled = self._should_profile(stage)
+        profiler = None
+        if profiled:
+            self._profiling = True
+            if self.profile == "cprofile":
+                profiler = cProfile.Profile()
+                profiler.enable()
+            else:
+                tracemalloc.start()
+
+        self._stack.append(stage)
+        slot = len(self.stages)
+        self.stages.append({})
+        start = time.perf_counter()
+        cpu_start = _cpu_seconds()
+        try:
+            yield stage
+        finally:
+            wall = time.perf_counter() - start
+            cpu = _cpu_seconds() - cpu_start
+            self._stack.pop()
+            if profiled:
+                self._finish_profile(stage, profiler)
+                self._profiling = False
+
+            stage.peak_seen = max(stage.peak_seen, peak_rss())
+            if parent is not None:
+                parent.peak_seen = max(parent.peak_seen, stage.peak_seen)
+            else:
+                self._peak_seen = max(self._peak_seen, stage.peak_seen)
+            self.stages[slot] = stage.record(wall, cpu, rss_start, stage.peak_seen)
+
+    def _finish_profile(self, stage: Stage, profiler: Optional[cProfile.Profile]) -> None:
+        if profiler is not None:
+            profiler.disable()
+            path = self._profile_path(stage, "prof")
+            profiler.dump_stats(path)
+        else:
+            snapshot = tracemalloc.take_snapshot()
+            _, traced_peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            path = self._profile_path(stage, "tracemalloc.txt")
+            with open(path, "w") as fh:
+                fh.write(f"traced peak: {_mb(traced_peak)} MB\n")
+                for stat in snapshot.statistics("lineno")[:TRACEMALLOC_TOP]:
+                    fh.write(f"{stat}\n")
+            stage.extra["traced_peak_mb"] = _mb(traced_peak)
+        stage.extra["profile_file"] = path
+
+    def write(self, status: str, error: Optional[BaseException] = None) -> str:
+        self.data.update({
+            "finished": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "status": status,
+            "error": None if error is None else repr(error),
+            "wall_seconds": round(time.perf_counter() - self._start, 4),
+            "cpu_seconds": round(_cpu_seconds() - self._cpu_start, 4),
+            "peak_rss_mb": _mb(max(self._peak_seen, peak_rss())),
+            "stages": self.stages,
+        })
+        os.makedirs(self.out_dir, exist_ok=True)
+        path = os.path.join(self.out_dir, MANIFEST_FILE)
+        with open(path + ".tmp", "w") as fh:
+            json.dump(self.data, fh, indent=2, default=str)
+        os.replace(path + ".tmp", path)
+        return path
+
+
+@contextmanager
+def stage(name: str, rows_in: Any = None) -> Iterator[Stage]:
+    if _active is None:
+        yield Stage(name, None, None)
+        return
+    with _active.stage(name, rows_in) as st:
+        yield st
+
+
+def timed(name: str, fn: Callable, *args, **kwargs) -> Any:
+    with stage(name, _shape_rows(args[0]) if args else None) as st:
+        result = fn(*args, **kwargs)
+        st.rows_out = _shape_rows(result)
+    return result
+
+
+@contextmanager
+def recorded_run(manifest: RunManifest) -> Iterator[RunManifest]:
+    global _active
+    _active = manifest
+    try:
+        yield manifest
+    except BaseException as exc:
+        manifest.write("failed", exc)
+        raise
+    else:
+        manifest.write("completed")
+    finally:
+        _active = None
+
+
+def add_instrumentation_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--profile",
+        choices=PROFILERS,
+        default=None,
+        help=f"Profile pipeline stages and write the results to <output folder>/{PROFILE_DIR}/."
+    )
+    parser.add_argument(
+        "--profile-stage",
+        action="append",
+        default=None,
+        metavar="NAME",
+        help=f"Stage to profile; repeat for several (default: every top-level stage in {MANIFEST_FILE})."
+    )
@@ -0,0 +1,153 @@
+import pandas as pd
+import numpy as np
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import List, Optional
+
+from pipelines.checkpoint import Checkpoint
+from pipelines.dedup import (
+    BURST_TABLE,
+    sort_events,
+    mark_canonical,
+    select_canonical,
+    summarize_repetitions,
+    summarize_bursts,
+    build_unique_users,
+)
+from pipelines.inputs import read_raw_events
+from pipelines.instrumentation import stage, timed
+from pipelines.storage import DEFAULT_OUTPUT_FORMAT, concat_tables, write_table
+from pipelines.user_store import (
+    DEFAULT_PER_USER_LAYOUT,
+    concat_user_stores,
+    store_dir_for,
+    write_event_outputs,
+)
+from pipelines.user_summary import SESSIONS_TABLE, USER_SUMMARY_TABLE, summarize_sessions, summarize_users
+
+SHARD_OUTPUTS = ["cleaned_events", "repetition_summary", BURST_TABLE, "unique_users_list", USER_SUMMARY_TABLE, SESSIONS_TABLE]
+
+
+def assign_user_shards(user_uuid: pd.Series, workers: int) -> np.ndarray:
+    codes, uniques = pd.factorize(user_uuid)
+    order = np.argsort(np.asarray(uniques, dtype=object), kind="stable")
+
+    # Shards hold contiguous ranges of sorted users so their outputs concatenate
+    # in order. Each user goes to the shard its row midpoint falls in, and the
+    # cuts are clamped so no shard is left empty while users remain.
+    rows_per_user = np.bincount(codes, minlength=len(uniques))[order]
+    cum_rows = np.cumsum(rows_per_user)
+    targets = cum_rows[-1] * np.arange(1, workers) / workers
+    cuts = np.searchsorted(cum_rows - rows_per_user / 2, targets, side="right")
+    if len(uniques) >= workers:
+        k = np.arange(1, workers)
+        cuts = np.minimum(cuts, len(uniques) - workers + k)
+        cuts = np.maximum.accumulate(np.maximum(cuts - k, 0)) + k
+
+    shard_of_unique = np.empty(len(uniques), dtype=np.int64)
+    shard_of_unique[order] = np.searchsorted(cuts, np.arange(len(uniques)), side="right")
+    return shard_of_unique[codes]
+
+
+def _process_shard(
+    df: pd.DataFrame,
+    shard_dir: str,
+    per_user_dir: str,
+    threshold_ms: float,
+    output_format: str,
+    per_user_layout: str
+) -> int:
+    df = sort_events(df)
+    df = mark_canonical(df, threshold_ms)
+
+    cleaned_events = select_canonical(df)
+    repetition_summary = summarize_repetitions(df)
+    unique_users = build_unique_users(cleaned_events)
+
+    os.makedirs(shard_dir)
+    write_event_outputs(cleaned_events, shard_dir, "cleaned_events", per_user_dir, per_user_layout, output_format)
+    write_table(repetition_summary, shard_dir, "repetition_summary", output_format)
+    write_table(summarize_bursts(df), shard_dir, BURST_TABLE, output_format)
+    write_table(unique_users, shard_dir, "unique_users_list", output_format)
+    write_table(summarize_users(cleaned_events), shard_dir, USER_SUMMARY_TABLE, output_format)
+    write_table(summarize_sessions(cleaned_events), shard_dir, SESSIONS_TABLE, output_format)
+    return len(unique_users)
+
+
+def run_sharded_dedup(
+    input_files: List[str],
+    base_dir: str,
+    per_user_dir: str,
+    threshold_ms: float,
+    workers: int,
+    output_format: str = DEFAULT_OUTPUT_FORMAT,
+    per_user_layout: str = DEFAULT_PER_USER_LAYOUT,
+    read_workers: int = 1,
+    checkpoint: Optional[Checkpoint] = None
+) -> int:
+    names = [f"shard_{k:04d}" for k in range(workers)]
+    if checkpoint is None:
+        tmp_dir = tempfile.mkdtemp(prefix=".shards_", dir=base_dir)
+    else:
+        tmp_dir = checkpoint.path("shards")
+        os.makedirs(tmp_dir, exist_ok=True)
+    shard_dirs = [os.path.join(tmp_dir, name) for name in names]
+    # Finished shards keep their tables under the checkpoint, so a resumed run
+    # only reprocesses the shards that had not completed.
+    pending = [k for k in range(workers) if checkpoint is None or not checkpoint.done(names[k])]
+    shard_users = {k: checkpoint.result(names[k]) for k in range(workers) if k not in pending}
+
+    try:
+        if pending:
+            # Times are parsed before sharding so every shard localizes to the same
+            # run-level timezone; a shard parsing its own rows could pick another one.
+            df = timed("read_inputs", read_raw_events, input_files, read_workers)
+            shard_ids = assign_user_shards(df["user_uuid"], workers) if len(df) else np.zeros(0, dtype=np.int64)
+
+            # Shards without rows get no worker; an empty input still runs
+            # shard 0 so every output table is written.
+            used = np.bincount(shard_ids, minlength=workers) > 0
+            used[0] |= not used.any()
+            for k in pending:
+                if not used[k]:
+                    shutil.rmtree(shard_dirs[k], ignore_errors=True)
+                    shard_users[k] = 0
+                    if checkpoint is not None:
+                        checkpoint.record(names[k], 0)
+            pending = [k for k in pending if used[k]]
+
+            if pending:
+                with stage("process_shards", df), ProcessPoolExecutor(max_workers=len(pending)) as pool:
+                    futures = {}
+                    for k in pending:
+                        shutil.rmtree(shard_dirs[k], ignore_errors=True)
+                        future = pool.submit(
+                            _process_shard,
+                            df[shard_ids == k],
+                            shard_dirs[k],
+                            per_user_dir,
+                            threshold_ms,
+                            output_format,
+                            per_user_layout
+                        )
+                        futures[future] = k
+                    del df
+                    for future in as_completed(futures):
+                        k = futures[future]
+                        shard_users[k] = future.result()
+                        if checkpoint is not None:
+                            checkpoint.record(names[k], shard_users[k])
+
+        shard_dirs = [d for d in shard_dirs if os.path.isdir(d)]
+        with stage("concat_shards"):
+            for name in SHARD_OUTPUTS:
+                concat_tables(shard_dirs, base_dir, name, output_format)
+            if per_user_layout == "store":
+                concat_user_stores([store_dir_for(d) for d in shard_dirs], store_dir_for(base_dir))
+    finally:
+        if checkpoint is None:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    return sum(shard_users.values())
@@ -0,0 +1,362 @@
+import pandas as pd
+import numpy as np
+import os
+import shutil
+import zlib
+from typing import Any, Callable, List, Optional
+
+from pipelines.dedup import format_for_csv
+from pipelines.encoding import CATEGORICAL_COLUMNS, encode_events
+
+OUTPUT_FORMATS = ["csv", "parquet", "both"]
+DEFAULT_OUTPUT_FORMAT = "csv"
+PARQUET_ROW_GROUP_ROWS = 64_000
+DICTIONARY_COLUMNS = ["event_name", "category"]
+# Incremental runs turn a table into a folder of the same name. Appended rows
+# go to new part files, and rows replaced per user are rewritten only in the
+# partitions of the users they belong to.
+USER_PARTITIONS = 256
+
+
+def formats_for(output_format: str) -> List[str]:
+    if output_format == "both":
+        return ["parquet", "csv"]
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown output format: {output_format}")
+    return [output_format]
+
+
+def table_path(base_dir: str, name: str, fmt: str) -> str:
+    return os.path.join(base_dir, f"{name}.{fmt}")
+
+
+def find_table(base_dir: str, name: str) -> Optional[str]:
+    for fmt in ["parquet", "csv"]:
+        path = table_path(base_dir, name, fmt)
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def table_files(path: str) -> List[str]:
+    if not os.path.isdir(path):
+        return [path]
+    suffix = os.path.splitext(path)[1]
+    return sorted(
+        os.path.join(path, name) for name in os.listdir(path)
+        if name.endswith(suffix) and not name.startswith(".")
+    )
+
+
+def user_partitions(user_uuid: pd.Series) -> np.ndarray:
+    codes, uniques = pd.factorize(user_uuid.astype(str))
+    buckets = np.array([zlib.crc32(u.encode("utf-8")) % USER_PARTITIONS for u in uniques], dtype=np.int64)
+    return buckets[codes]
+
+
+def _partition_path(path: str, bucket: int) -> str:
+    return os.path.join(path, f"user-{bucket:03d}{os.path.splitext(path)[1]}")
+
+
+def _to_arrow(df: pd.DataFrame, schema=None):
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    for idx, field in enumerate(table.schema):
+        if field.name in DICTIONARY_COLUMNS:
+            column = table.column(idx)
+            if not pa.types.is_dictionary(field.type):
+                column = pc.dictionary_encode(column)
+            table = table.set_column(idx, field.name, column.cast(pa.dictionary(pa.int32(), pa.string())))
+        elif pa.types.is_dictionary(field.type):
+            table = table.set_column(idx, field.name, table.column(idx).cast(field.type.value_type))
+    if schema is not None:
+        table = table.cast(schema)
+    return table
+
+
+class _CsvTableWriter:
+    def __init__(self, path: str, append: bool = False):
+        self.path = path
+        self._append = append and os.path.exists(path)
+
+    def write(self, df: pd.DataFrame) -> None:
+        df = format_for_csv(df)
+        df.to_csv(self.path, mode="a" if self._append else "w", header=not self._append, index=False)
+        self._append = True
+
+    def close(self) -> None:
+        pass
+
+
+class _ParquetTableWriter:
+    def __init__(self, path: str, row_group_rows: int = PARQUET_ROW_GROUP_ROWS):
+        self.path = path
+        self.row_group_rows = row_group_rows
+        self._writer = None
+
+    def write(self, df: pd.DataFrame) -> None:
+        import pyarrow.parquet as pq
+
+        if self._writer is None:
+            table = _to_arrow(df)
+            self._writer = pq.ParquetWriter(self.path, table.schema)
+        else:
+            table = _to_arrow(df, self._writer.schema)
+        self._writer.write_table(table, row_group_size=self.row_group_rows)
+
+    def write_arrow(self, table) -> None:
+        import pyarrow.parquet as pq
+
+        if self._writer is None:
+            self._writer = pq.ParquetWriter(self.path, table.schema)
+        else:
+            table = table.cast(self._writer.schema)
+        self._writer.write_table(table, row_group_size=self.row_group_rows)
+
+    def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+
+
+class TableWriter:
+    def __init__(
+        self,
+        base_dir: str,
+        name: str,
+        output_format: str = DEFAULT_OUTPUT_FORMAT,
+        append: bool = False
+    ):
+        self.writers = []
+        for fmt in formats_for(output_format):
+            path = table_path(base_dir, name, fmt)
+            if fmt == "parquet":
+                self.writers.append(_ParquetTableWriter(path))
+            else:
+                self.writers.append(_CsvTableWriter(path, append=append))
+
+    def write(self, df: pd.DataFrame) -> None:
+        for writer in self.writers:
+            writer.write(df)
+
+    def close(self) -> None:
+        for writer in self.writers:
+            writer.close()
+
+    def __enter__(self) -> "TableWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def write_table(df: pd.DataFrame, base_dir: str, name: str, output_format: str = DEFAULT_OUTPUT_FORMAT) -> None:
+    with TableWriter(base_dir, name, output_format) as writer:
+        writer.write(df)
+
+
+def _write_files(df: pd.DataFrame, paths: List[str], bounds: np.ndarray) -> None:
+    directory = os.path.dirname(paths[0])
+    if paths[0].endswith(".parquet"):
+        import pyarrow.parquet as pq
+
+        others = [p for p in table_files(directory) if p not in paths]
+        table = _to_arrow(df, pq.read_schema(others[0]) if others else None)
+        write = lambda start, stop, tmp: pq.write_table(
+            table.slice(start, stop - start), tmp, row_group_size=PARQUET_ROW_GROUP_ROWS
+        )
+    else:
+        df = format_for_csv(df)
+        write = lambda start, stop, tmp: df.iloc[start:stop].to_csv(tmp, index=False)
+    for path, start, stop in zip(paths, bounds[:-1], bounds[1:]):
+        tmp_path = os.path.join(directory, "." + os.path.basename(path))
+        write(start, stop, tmp_path)
+        os.replace(tmp_path, path)
+
+
+def _write_file(df: pd.DataFrame, path: str) -> None:
+    _write_files(df, [path], np.array([0, len(df)]))
+
+
+def _to_folder(path: str) -> None:
+    if os.path.isdir(path):
+        return
+    tmp_dir = path + ".tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    os.replace(path, os.path.join(tmp_dir, f"part-{0:06d}{os.path.splitext(path)[1]}"))
+    os.replace(tmp_dir, path)
+
+
+def append_table(df: pd.DataFrame, base_dir: str, name: str, output_format: str = DEFAULT_OUTPUT_FORMAT) -> None:
+    for fmt in formats_for(output_format):
+        path = table_path(base_dir, name, fmt)
+        if not os.path.exists(path) or fmt == "csv":
+            with TableWriter(base_dir, name, fmt, append=True) as writer:
+                writer.write(df)
+            continue
+        if df.empty:
+            continue
+
+        _to_folder(path)
+        parts = len(table_files(path))
+        _write_file(df, os.path.join(path, f"part-{parts:06d}.{fmt}"))
+
+
+def _partition_by_user(path: str) -> None:
+    if not os.path.isfile(path):
+        return
+    df = _read_file(path)
+    order = np.argsort(user_partitions(df["user_uuid"]), kind="stable")
+    df = df.iloc[order]
+    buckets = user_partitions(df["user_uuid"])
+    present = np.unique(buckets) if len(df) else np.zeros(1, dtype=np.int64)
+    bounds = np.searchsorted(buckets, np.r_[present, USER_PARTITIONS])
+    old_path = path + ".old"
+    os.replace(path, old_path)
+    os.makedirs(path)
+    _write_files(df, [_partition_path(path, int(b)) for b in present], bounds)
+    os.remove(old_path)
+
+
+def _read_files(paths: List[str]) -> pd.DataFrame:
+    if paths[0].endswith(".parquet"):
+        return encode_events(pd.read_parquet(paths))
+    return encode_events(pd.concat([_read_file(p) for p in paths], ignore_index=True))
+
+
+def read_user_partitions(base_dir: str, name: str, user_uuid: pd.Series) -> pd.DataFrame:
+    path = find_table(base_dir, name)
+    if path is None:
+        raise FileNotFoundError(f"Required input file not found: {table_path(base_dir, name, 'csv')}")
+    if os.path.isfile(path):
+        return _read_file(path)
+    paths = [_partition_path(path, int(b)) for b in np.unique(user_partitions(user_uuid))]
+    paths = [p for p in paths if os.path.exists(p)]
+    if not paths:
+        return _read_file(table_files(path)[0]).iloc[:0]
+    return _read_files(paths)
+
+
+def update_user_partitions(
+    base_dir: str,
+    name: str,
+    output_format: str,
+    user_uuid: pd.Series,
+    update: Callable[[pd.DataFrame], pd.DataFrame]
+) -> None:
+    formats = formats_for(output_format)
+    if "parquet" in formats:
+        path = table_path(base_dir, name, "parquet")
+        _partition_by_user(path)
+        _write_user_partitions(path, update(read_user_partitions(base_dir, name, user_uuid)), user_uuid)
+    # CSV tables stay single files that any CSV reader can open, so they are
+    # rewritten whole.
+    if "csv" in formats:
+        path = table_path(base_dir, name, "csv")
+        _write_file(update(_read_file(path)), path)
+
+
+def _write_user_partitions(path: str, rows: pd.DataFrame, user_uuid: pd.Series) -> None:
+    buckets = user_partitions(rows["user_uuid"])
+    order = np.argsort(buckets, kind="stable")
+    rows, buckets = rows.iloc[order], buckets[order]
+    affected = np.unique(user_partitions(user_uuid))
+    starts = np.searchsorted(buckets, affected)
+    stops = np.searchsorted(buckets, affected, side="right")
+
+    targets = [_partition_path(path, int(b)) for b in affected]
+    keep = stops > starts
+    if not keep.any() and set(table_files(path)) <= set(targets):
+        keep[0] = True
+    for target in np.array(targets)[~keep]:
+        if os.path.exists(target):
+            os.remove(target)
+    written = np.flatnonzero(keep)
+    if len(written):
+        bounds = np.r_[starts[written], stops[written][-1]]
+        _write_files(rows, [targets[i] for i in written], bounds)
+
+
+def concat_tables(sources: List[str], base_dir: str, name: str, output_format: str = DEFAULT_OUTPUT_FORMAT) -> None:
+    for fmt in formats_for(output_format):
+        paths = [table_path(src, name, fmt) for src in sources]
+        dest = table_path(base_dir, name, fmt)
+        if fmt == "parquet":
+            _concat_parquet(paths, dest)
+        else:
+            _concat_csv(paths, dest)
+
+
+def _concat_csv(paths: List[str], dest: str) -> None:
+    with open(dest, "wb") as out:
+        for i, path in enumerate(paths):
+            with open(path, "rb") as fh:
+                header = fh.readline()
+                if i == 0:
+                    out.write(header)
+                shutil.copyfileobj(fh, out)
+
+
+def _concat_parquet(paths: List[str], dest: str) -> None:
+    import pyarrow.parquet as pq
+
+    writer = _ParquetTableWriter(dest)
+    try:
+        for path in paths:
+            source = pq.ParquetFile(path)
+            for i in range(source.num_row_groups):
+                writer.write_arrow(source.read_row_group(i))
+    finally:
+        writer.close()
+
+
+def table_columns(path: str) -> List[str]:
+    path = table_files(path)[0]
+    if path.endswith(".parquet"):
+        import pyarrow.parquet as pq
+
+        return pq.read_schema(path).names
+    return pd.read_csv(path, nrows=0).columns.tolist()
+
+
+def _read_file(path: str, columns: Optional[List[str]] = None, memory_map: bool = False) -> pd.DataFrame:
+    if path.endswith(".parquet"):
+        return encode_events(pd.read_parquet(path, columns=columns, memory_map=memory_map))
+    df = pd.read_csv(
+        path,
+        usecols=columns,
+        dtype={col: "category" for col in CATEGORICAL_COLUMNS},
+        memory_map=memory_map
+    )
+    return encode_events(df[columns] if columns is not None else df)
+
+
+def read_table(
+    base_dir: str,
+    name: str,
+    columns: Optional[List[str]] = None,
+    filters: Optional[List[Any]] = None,
+    exclude: Optional[List[str]] = None,
+    memory_map: bool = False
+) -> pd.DataFrame:
+    path = find_table(base_dir, name)
+    if path is None:
+        raise FileNotFoundError(f"Required input file not found: {table_path(base_dir, name, 'csv')}")
+    if exclude:
+        columns = [c for c in (columns or table_columns(path)) if c not in exclude]
+
+    if path.endswith(".parquet"):
+        return encode_events(pd.read_parquet(path, columns=columns, filters=filters, memory_map=memory_map))
+
+    frames = [_read_file(p, columns, memory_map) for p in table_files(path)]
+    df = frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
+    for col, op, value in filters or []:
+        if op in ("==", "="):
+            df = df[df[col] == value]
+        elif op == "in":
+            df = df[df[col].isin(value)]
+        else:
+            raise ValueError(f"Unsupported CSV filter operator: {op}")
+    return encode_events(df)
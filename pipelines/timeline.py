@@ -0,0 +1,84 @@
+import pandas as pd
+import numpy as np
+from typing import Optional
+
+from pipelines.dedup import (
+    CsvRows,
+    build_unique_users,
+    build_unique_users_report,
+    summarize_repetitions,
+)
+from pipelines.encoding import user_codes
+from pipelines.instrumentation import timed
+from pipelines.storage import write_table
+from pipelines.user_store import write_event_outputs
+
+TIMELINE_SORT_KEYS = ["user_uuid", "event_time"]
+TIMELINE_TABLE = "cleaned_events_chronological"
+TIMELINE_SUFFIX = "_timeline"
+
+
+def timeline_order(cleaned_events: pd.DataFrame) -> np.ndarray:
+    codes = user_codes(cleaned_events["user_uuid"])
+    user_block = np.cumsum(np.r_[False, codes[1:] != codes[:-1]])
+
+    ns = cleaned_events["event_time"].dt.as_unit("ns").array.asi8
+    ns = np.where(ns == np.iinfo(np.int64).min, np.iinfo(np.int64).max, ns)
+
+    return np.lexsort((ns, user_block))
+
+
+def write_timeline_outputs(
+    cleaned_timeline: pd.DataFrame,
+    repetition_summary: pd.DataFrame,
+    base_dir: str,
+    per_user_dir: str,
+    output_format: str,
+    per_user_layout: str,
+    rows: Optional[CsvRows] = None
+) -> None:
+    unique_users = build_unique_users(cleaned_timeline)
+
+    write_event_outputs(
+        cleaned_timeline,
+        base_dir,
+        TIMELINE_TABLE,
+        per_user_dir,
+        per_user_layout,
+        output_format,
+        suffix=TIMELINE_SUFFIX,
+        rows=rows
+    )
+    write_table(repetition_summary, base_dir, "repetition_summary", output_format)
+    write_table(unique_users, base_dir, "unique_users_list", output_format)
+    write_table(
+        build_unique_users_report(len(unique_users)),
+        base_dir,
+        "unique_users_count",
+        output_format
+    )
+
+
+def write_fused_timeline(
+    cleaned_events: pd.DataFrame,
+    base_dir: str,
+    per_user_dir: str,
+    output_format: str,
+    per_user_layout: str,
+    rows: Optional[CsvRows] = None
+) -> pd.DataFrame:
+    order = timed("timeline_order", timeline_order, cleaned_events)
+    cleaned_timeline = cleaned_events.iloc[order].reset_index(drop=True)
+    if rows is not None:
+        rows = CsvRows(rows.header, rows.lines[order])
+
+    write_timeline_outputs(
+        cleaned_timeline,
+        timed("summarize_repetitions", summarize_repetitions, cleaned_timeline),
+        base_dir,
+        per_user_dir,
+        output_format,
+        per_user_layout,
+        rows=rows
+    )
+    return cleaned_timeline
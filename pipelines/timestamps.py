@@ -0,0 +1,263 @@
+import pandas as pd
+import numpy as np
+import warnings
+from datetime import timedelta, timezone, tzinfo
+from typing import Iterable, List, NamedTuple, Optional
+
+# Accepted fixed-width layouts, all ending in a "+HH:MM" offset:
+#   2026-01-02 14:16:14.476000 +05:30   (raw export)
+#   2026-01-02 14:16:14.476000+05:30    (pandas CSV output)
+#   2026-01-02 14:16:14 +05:30
+#   2026-01-02 14:16:14+05:30
+_VALID_LENGTHS = np.array([25, 26, 32, 33])
+_WIDTH = 33
+_NAT = np.iinfo(np.int64).min
+_NS_PER_DAY = 86_400 * 10**9
+_DAYS_IN_MONTH = np.array([0, 31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31])
+
+
+class ParsedEventTimes(NamedTuple):
+    utc_ns: np.ndarray
+    offset_minutes: np.ndarray
+    fallback_rows: int
+
+
+def _to_fixed_width(values: np.ndarray) -> np.ndarray:
+    try:
+        return np.asarray(values, dtype=f"S{_WIDTH}")
+    except UnicodeEncodeError:
+        ascii_only = np.array([v if v.isascii() else "" for v in values], dtype=object)
+        return np.asarray(ascii_only, dtype=f"S{_WIDTH}")
+
+
+def _number(digits: np.ndarray, start: int, width: int) -> np.ndarray:
+    out = digits[start].astype(np.int64)
+    for i in range(start + 1, start + width):
+        out = out * 10 + digits[i]
+    return out
+
+
+def _days_from_civil(y: np.ndarray, m: np.ndarray, d: np.ndarray) -> np.ndarray:
+    y = y - (m <= 2)
+    era = np.floor_divide(y, 400)
+    yoe = y - era * 400
+    doy = (153 * np.where(m > 2, m - 3, m + 9) + 2) // 5 + d - 1
+    doe = yoe * 365 + yoe // 4 - yoe // 100 + doy
+    return era * 146097 + doe - 719468
+
+
+def _fast_parse(strings: np.ndarray, lengths: np.ndarray):
+    n = len(strings)
+    chars = np.ascontiguousarray(strings.view(np.uint8).reshape(n, _WIDTH).T)
+    digits = chars - np.uint8(ord("0"))
+
+    has_frac = chars[19] == ord(".")
+    offset_at = np.clip(lengths - 6, 0, _WIDTH - 6)
+    gap = offset_at - np.where(has_frac, 26, 19)
+
+    ok = np.isin(lengths, _VALID_LENGTHS) & ((gap == 0) | (gap == 1))
+    ok &= (gap == 0) | (chars[np.clip(offset_at - 1, 0, _WIDTH - 1), np.arange(n)] == ord(" "))
+    for pos, ch in [(4, "-"), (7, "-"), (10, " "), (13, ":"), (16, ":")]:
+        ok &= chars[pos] == ord(ch)
+    ok &= (digits[[0, 1, 2, 3, 5, 6, 8, 9, 11, 12, 14, 15, 17, 18]] <= 9).all(axis=0)
+    ok &= ~has_frac | (digits[20:26] <= 9).all(axis=0)
+
+    offset = np.take_along_axis(chars, offset_at[None, :] + np.arange(6)[:, None], axis=0)
+    off_digits = offset - np.uint8(ord("0"))
+    ok &= (offset[0] == ord("+")) | (offset[0] == ord("-"))
+    ok &= offset[3] == ord(":")
+    ok &= (off_digits[[1, 2, 4, 5]] <= 9).all(axis=0)
+
+    year = _number(digits, 0, 4)
+    month = _number(digits, 5, 2)
+    day = _number(digits, 8, 2)
+    hour = _number(digits, 11, 2)
+    minute = _number(digits, 14, 2)
+    second = _number(digits, 17, 2)
+    micros = np.where(has_frac, _number(digits, 20, 6), 0)
+    off_h = _number(off_digits, 1, 2)
+    off_m = _number(off_digits, 4, 2)
+
+    leap = (year % 4 == 0) & ((year % 100 != 0) | (year % 400 == 0))
+    month_ok = (month >= 1) & (month <= 12)
+    dim = _DAYS_IN_MONTH[np.where(month_ok, month, 0)] + (leap & (month == 2))
+    ok &= month_ok & (day >= 1) & (day <= dim)
+    ok &= (hour <= 23) & (minute <= 59) & (second <= 59) & (off_h <= 23) & (off_m <= 59)
+
+    offset_minutes = np.where(offset[0] == ord("-"), -1, 1) * (off_h * 60 + off_m)
+    seconds = (
+        _days_from_civil(year, month, day) * 86400
+        + hour * 3600 + minute * 60 + second
+        - offset_minutes * 60
+    )
+    utc_ns = seconds * 1_000_000_000 + micros * 1000
+    return utc_ns, offset_minutes, ok
+
+
+def _slow_parse(value, fallback_format: str):
+    ts = pd.to_datetime(value, format=fallback_format, errors="raise")
+    offset = ts.utcoffset()
+    offset_minutes = int(offset.total_seconds() // 60) if offset is not None else 0
+    return ts.as_unit("ns").value, offset_minutes
+
+
+def parse_event_times(values, fallback_format: str = "ISO8601") -> ParsedEventTimes:
+    values = pd.Series(values)
+    n = len(values)
+    utc_ns = np.full(n, _NAT, dtype=np.int64)
+    offset_minutes = np.zeros(n, dtype=np.int32)
+    if n == 0:
+        return ParsedEventTimes(utc_ns, offset_minutes, 0)
+
+    try:
+        lengths = values.str.len()
+    except AttributeError:
+        lengths = pd.Series(np.nan, index=values.index)
+    is_str = lengths.notna().to_numpy()
+    lengths = lengths.fillna(0).to_numpy(dtype=np.int64)
+
+    strings = _to_fixed_width(values.where(is_str, "").to_numpy(dtype=object))
+    fast_ns, fast_offsets, ok = _fast_parse(strings, lengths)
+    ok &= is_str
+
+    utc_ns[ok] = fast_ns[ok]
+    offset_minutes[ok] = fast_offsets[ok]
+
+    slow = np.flatnonzero(~ok & values.notna().to_numpy())
+    for i, value in zip(slow, values.iloc[slow]):
+        utc_ns[i], offset_minutes[i] = _slow_parse(value, fallback_format)
+
+    return ParsedEventTimes(utc_ns, offset_minutes, len(slow))
+
+
+def event_timezone(parsed: ParsedEventTimes) -> tzinfo:
+    offsets = np.unique(parsed.offset_minutes[parsed.utc_ns != _NAT])
+    return timezone(timedelta(minutes=int(offsets[0]))) if len(offsets) == 1 else timezone.utc
+
+
+def common_timezone(zones: Iterable[tzinfo]) -> tzinfo:
+    zones = set(zones)
+    return zones.pop() if len(zones) == 1 else timezone.utc
+
+
+def to_datetime_series(
+    parsed: ParsedEventTimes,
+    index=None,
+    name: str = "event_time",
+    tz: Optional[tzinfo] = None
+) -> pd.Series:
+    tz = tz or event_timezone(parsed)
+
+    values = pd.DatetimeIndex(parsed.utc_ns.view("M8[ns]")).tz_localize("UTC").tz_convert(tz)
+    return pd.Series(values, index=index, name=name)
+
+
+def combine_parsed(parts: List[ParsedEventTimes]) -> ParsedEventTimes:
+    if not parts:
+        return ParsedEventTimes(np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int32), 0)
+    return ParsedEventTimes(
+        np.concatenate([p.utc_ns for p in parts]),
+        np.concatenate([p.offset_minutes for p in parts]),
+        sum(p.fallback_rows for p in parts)
+    )
+
+
+def warn_fallback_rows(fallback_rows: int, total_rows: int) -> None:
+    if fallback_rows:
+        warnings.warn(
+            f"{fallback_rows} of {total_rows} event_time values did not match the "
+            "fixed-width layout and were parsed on the slow path."
+        )
+
+
+def parse_event_time_series(values: pd.Series, fallback_format: str = "ISO8601") -> pd.Series:
+    parsed = parse_event_times(values, fallback_format)
+    warn_fallback_rows(parsed.fallback_rows, len(values))
+    return to_datetime_series(parsed, index=values.index, name=values.name)
+
+
+def local_ns(event_time: pd.Series) -> np.ndarray:
+    if event_time.dt.tz is not None:
+        event_time = event_time.dt.tz_localize(None)
+    return event_time.dt.as_unit("ns").array.asi8
+
+
+def format_event_dates(event_time: pd.Series):
+    ns = local_ns(event_time)
+    days = np.where(ns == _NAT, _NAT, ns // _NS_PER_DAY)
+    codes, uniques = pd.factorize(days)
+    stamps = pd.to_datetime(np.where(uniques == _NAT, np.nan, uniques), unit="D")
+    dates = np.asarray(stamps.strftime("%Y-%m-%d"), dtype=object)[codes]
+    names = np.asarray(stamps.day_name(), dtype=object)[codes]
+    return dates, names
+
+
+def format_event_times(event_time: pd.Series, prefix: str = "") -> np.ndarray:
+    ns = local_ns(event_time)
+    micros = ns % _NS_PER_DAY // 1000
+    head = np.frombuffer(prefix.encode("ascii"), dtype=np.uint8)
+    width = len(head) + 15
+
+    chars = np.zeros((len(ns), width), dtype=np.uint8)
+    chars[:, :len(head)] = head
+    at = len(head)
+    for offset, ch in [(2, ":"), (5, ":"), (8, ".")]:
+        chars[:, at + offset] = ord(ch)
+    for offset, width_, values in [
+        (0, 2, micros // 3_600_000_000),
+        (3, 2, micros // 60_000_000 % 60),
+        (6, 2, micros // 1_000_000 % 60),
+        (9, 6, micros % 1_000_000),
+    ]:
+        for i in range(width_ - 1, -1, -1):
+            chars[:, at + offset + i] = ord("0") + values % 10
+            values = values // 10
+
+    out = chars.view(f"S{width}").ravel().astype(str).astype(object)
+    out[ns == _NAT] = np.nan
+    return out
+
+
+def format_event_timestamps(event_time: pd.Series) -> np.ndarray:
+    local = local_ns(event_time)
+    nat = local == _NAT
+    has_tz = event_time.dt.tz is not None
+    offsets = (local - event_time.dt.as_unit("ns").array.asi8) // 60_000_000_000 if has_tz else np.zeros(len(local), dtype=np.int64)
+
+    days = np.where(nat, 0, local // _NS_PER_DAY)
+    stamps = pd.to_datetime(days, unit="D")
+    micros = local % _NS_PER_DAY // 1000
+    has_frac = micros % 1_000_000 != 0
+
+    width = 32 if has_tz else 26
+    chars = np.zeros((len(local), width), dtype=np.uint8)
+    for pos, ch in [(4, "-"), (7, "-"), (10, " "), (13, ":"), (16, ":"), (19, ".")]:
+        chars[:, pos] = ord(ch)
+    fields = [
+        (0, 4, stamps.year.to_numpy()),
+        (5, 2, stamps.month.to_numpy()),
+        (8, 2, stamps.day.to_numpy()),
+        (11, 2, micros // 3_600_000_000),
+        (14, 2, micros // 60_000_000 % 60),
+        (17, 2, micros // 1_000_000 % 60),
+        (20, 6, micros % 1_000_000),
+    ]
+    if has_tz:
+        chars[:, 26] = np.where(offsets < 0, ord("-"), ord("+"))
+        chars[:, 29] = ord(":")
+        fields += [(27, 2, np.abs(offsets) // 60), (30, 2, np.abs(offsets) % 60)]
+    for start, width_, values in fields:
+        values = np.asarray(values, dtype=np.int64)
+        for i in range(width_ - 1, -1, -1):
+            chars[:, start + i] = ord("0") + values % 10
+            values = values // 10
+
+    whole = ~has_frac
+    chars[whole, 19:width - 7] = chars[whole, 26:width]
+    chars[whole, width - 7:] = 0
+
+    out = chars.view(f"S{width}").ravel().astype(str).astype(object)
+    odd = np.flatnonzero(~nat & (local % 1000 != 0))
+    out[odd] = [str(ts) for ts in event_time.iloc[odd]]
+    out[nat] = np.nan
+    return out
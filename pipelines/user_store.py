@@ -0,0 +1,347 @@
+import pandas as pd
+import numpy as np
+import argparse
+import io
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, List, Optional
+
+from pipelines.dedup import (
+    CsvRows,
+    format_for_csv,
+    render_csv,
+    render_csv_header,
+    render_csv_rows,
+    safe_user_filename,
+    with_derived_columns,
+    write_csv_rows,
+    write_per_user_rows,
+)
+from pipelines.encoding import user_codes
+from pipelines.instrumentation import stage, timed
+from pipelines.storage import TableWriter, formats_for, table_path, write_table
+from pipelines.timestamps import parse_event_time_series
+
+PER_USER_LAYOUTS = ["files", "store"]
+DEFAULT_PER_USER_LAYOUT = "files"
+STORE_DIR_NAME = "per_user_store"
+DATA_FILE = "data.csv"
+INDEX_FILE = "index.npy"
+
+
+def store_dir_for(base_dir: str) -> str:
+    return os.path.join(base_dir, STORE_DIR_NAME)
+
+
+def writes_per_user_files(per_user_layout: str, output_format: str) -> bool:
+    return per_user_layout == "files" and "csv" in formats_for(output_format)
+
+
+def _user_slices(events: pd.DataFrame, row_bytes: np.ndarray):
+    codes = user_codes(events["user_uuid"])
+    starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+    lengths = np.add.reduceat(row_bytes, starts) if len(starts) else np.zeros(0, dtype=np.int64)
+    rows = np.diff(np.r_[starts, len(codes)])
+    return events["user_uuid"].iloc[starts].astype(str).to_numpy(), lengths, rows
+
+
+def _build_index(users, offsets, lengths, rows) -> np.ndarray:
+    width = max([len(u.encode("utf-8")) for u in users] or [1])
+    index = np.zeros(len(users), dtype=[
+        ("user_uuid", f"S{width}"),
+        ("offset", "<i8"),
+        ("length", "<i8"),
+        ("rows", "<i8"),
+    ])
+    index["user_uuid"] = [u.encode("utf-8") for u in users]
+    index["offset"] = offsets
+    index["length"] = lengths
+    index["rows"] = rows
+    return np.sort(index, order="user_uuid")
+
+
+def _save_index(store_dir: str, index: np.ndarray) -> None:
+    path = os.path.join(store_dir, INDEX_FILE)
+    with open(path + ".tmp", "wb") as fh:
+        np.save(fh, index)
+    os.replace(path + ".tmp", path)
+
+
+class UserStoreWriter:
+    def __init__(self, store_dir: str):
+        self.store_dir = store_dir
+        os.makedirs(store_dir, exist_ok=True)
+        self._fh = open(os.path.join(store_dir, DATA_FILE), "wb")
+        self._users: List[str] = []
+        self._offsets: List[int] = []
+        self._lengths: List[int] = []
+        self._rows: List[int] = []
+
+    def write(self, events: pd.DataFrame) -> None:
+        events = format_for_csv(events)
+        if self._fh.tell() == 0:
+            self._fh.write(render_csv_header(events))
+        if events.empty:
+            return
+
+        lines = render_csv_rows(events)
+        row_bytes = np.fromiter((len(line) for line in lines), dtype=np.int64, count=len(lines))
+        users, lengths, rows = _user_slices(events, row_bytes)
+
+        offset = self._fh.tell()
+        self._fh.write(b"".join(lines))
+
+        for uid, length, n in zip(users, lengths.tolist(), rows.tolist()):
+            if self._users and self._users[-1] == uid:
+                self._lengths[-1] += length
+                self._rows[-1] += n
+            else:
+                self._users.append(uid)
+                self._offsets.append(offset)
+                self._lengths.append(length)
+                self._rows.append(n)
+            offset += length
+
+    def close(self) -> None:
+        self._fh.close()
+        _save_index(self.store_dir, _build_index(self._users, self._offsets, self._lengths, self._rows))
+
+    def __enter__(self) -> "UserStoreWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def write_user_store(events: pd.DataFrame, store_dir: str) -> None:
+    with UserStoreWriter(store_dir) as writer:
+        writer.write(events)
+
+
+class UserStore:
+    def __init__(self, store_dir: str):
+        self.store_dir = store_dir
+        self.data_path = os.path.join(store_dir, DATA_FILE)
+        self.index = np.load(os.path.join(store_dir, INDEX_FILE), mmap_mode="r")
+        with open(self.data_path, "rb") as fh:
+            self.header = fh.readline()
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def users(self) -> List[str]:
+        return [u.decode("utf-8") for u in self.index["user_uuid"]]
+
+    def _locate(self, user_uuid: str) -> Optional[int]:
+        key = str(user_uuid).encode("utf-8")
+        if len(key) > self.index.dtype["user_uuid"].itemsize:
+            return None
+        i = int(np.searchsorted(self.index["user_uuid"], key))
+        if i < len(self.index) and self.index["user_uuid"][i] == key:
+            return i
+        return None
+
+    def read_user_bytes(self, user_uuid: str) -> bytes:
+        i = self._locate(user_uuid)
+        if i is None:
+            return b""
+        with open(self.data_path, "rb") as fh:
+            fh.seek(int(self.index["offset"][i]))
+            return fh.read(int(self.index["length"][i]))
+
+    def read_user(self, user_uuid: str) -> pd.DataFrame:
+        return pd.read_csv(io.BytesIO(self.header + self.read_user_bytes(user_uuid)))
+
+    def update_users(self, events: pd.DataFrame, sort_by: List[str]) -> None:
+        index = np.array(self.index)
+        users = [u.decode("utf-8") for u in index["user_uuid"]]
+        offsets = index["offset"].tolist()
+        lengths = index["length"].tolist()
+        rows = index["rows"].tolist()
+        position = {u: i for i, u in enumerate(users)}
+        events = with_derived_columns(events)
+
+        with open(self.data_path, "ab") as fh:
+            for uid, udf in events.groupby("user_uuid", sort=False, observed=True):
+                uid = str(uid)
+                if uid in position:
+                    existing = self.read_user(uid)
+                    existing["event_time"] = parse_event_time_series(existing["event_time"])
+                    udf = pd.concat([existing, udf], ignore_index=True).sort_values(
+                        by=sort_by,
+                        kind="mergesort"
+                    )
+                body = b"".join(render_csv_rows(format_for_csv(udf)))
+                offset = fh.tell()
+                fh.write(body)
+
+                if uid in position:
+                    i = position[uid]
+                    offsets[i], lengths[i], rows[i] = offset, len(body), len(udf)
+                else:
+                    position[uid] = len(users)
+                    users.append(uid)
+                    offsets.append(offset)
+                    lengths.append(len(body))
+                    rows.append(len(udf))
+
+        _save_index(self.store_dir, _build_index(users, offsets, lengths, rows))
+        self.index = np.load(os.path.join(self.store_dir, INDEX_FILE), mmap_mode="r")
+
+
+def write_event_outputs(
+    events: pd.DataFrame,
+    base_dir: str,
+    table: str,
+    per_user_dir: Optional[str],
+    per_user_layout: str,
+    output_format: str,
+    suffix: str = "",
+    rows: Optional[CsvRows] = None
+) -> Optional[CsvRows]:
+    formats = formats_for(output_format)
+    if "parquet" in formats:
+        timed("write_parquet", write_table, events, base_dir, table, "parquet")
+    if per_user_layout == "store":
+        timed("write_user_store", write_user_store, events, store_dir_for(base_dir))
+    if "csv" not in formats:
+        return None
+
+    if rows is None:
+        with stage("render_csv", events) as st:
+            rows = render_csv(format_for_csv(events))
+            st.rows_out = len(rows.lines)
+    with stage("write_csv_table", len(rows.lines)):
+        write_csv_rows(table_path(base_dir, table, "csv"), rows)
+    if per_user_layout == "files" and per_user_dir is not None:
+        with stage("per_user_files", len(rows.lines)):
+            write_per_user_rows(events["user_uuid"], rows, per_user_dir, suffix)
+    return rows
+
+
+def _append_per_user_rows(
+    user_uuid: pd.Series,
+    rows: CsvRows,
+    per_user_dir: str,
+    suffix: str,
+    open_user: Optional[str]
+) -> Optional[str]:
+    codes = user_codes(user_uuid)
+    starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]]) if len(codes) else np.zeros(0, dtype=np.int64)
+    ends = np.r_[starts[1:], len(codes)]
+    for start, end in zip(starts, ends):
+        uid = user_uuid.iat[start]
+        if pd.isna(uid):
+            continue
+        uid = str(uid)
+        path = os.path.join(per_user_dir, safe_user_filename(uid, suffix))
+        with open(path, "ab" if uid == open_user else "wb") as fh:
+            if uid != open_user:
+                fh.write(rows.header)
+            fh.write(b"".join(rows.lines[start:end]))
+        open_user = uid
+    return open_user
+
+
+def write_event_batches(
+    batches: Iterable[pd.DataFrame],
+    base_dir: str,
+    table: str,
+    per_user_dir: str,
+    per_user_layout: str,
+    output_format: str,
+    suffix: str = ""
+) -> int:
+    formats = formats_for(output_format)
+    parquet_out = TableWriter(base_dir, table, "parquet") if "parquet" in formats else None
+    store_out = UserStoreWriter(store_dir_for(base_dir)) if per_user_layout == "store" else None
+    csv_out = open(table_path(base_dir, table, "csv"), "wb") if "csv" in formats else None
+    per_user_files = csv_out is not None and per_user_layout == "files"
+
+    total_rows = 0
+    open_user = None
+    try:
+        for events in batches:
+            total_rows += len(events)
+            if parquet_out is not None:
+                parquet_out.write(events)
+            if store_out is not None:
+                store_out.write(events)
+            if csv_out is None:
+                continue
+
+            rows = render_csv(format_for_csv(events))
+            if csv_out.tell() == 0:
+                csv_out.write(rows.header)
+            csv_out.write(b"".join(rows.lines))
+            if per_user_files:
+                open_user = _append_per_user_rows(events["user_uuid"], rows, per_user_dir, suffix, open_user)
+    finally:
+        if parquet_out is not None:
+            parquet_out.close()
+        if store_out is not None:
+            store_out.close()
+        if csv_out is not None:
+            csv_out.close()
+    return total_rows
+
+
+def concat_user_stores(store_dirs: List[str], dest_dir: str) -> None:
+    os.makedirs(dest_dir, exist_ok=True)
+    parts = []
+    with open(os.path.join(dest_dir, DATA_FILE), "wb") as out:
+        for i, store_dir in enumerate(store_dirs):
+            store = UserStore(store_dir)
+            if i == 0:
+                out.write(store.header)
+            with open(store.data_path, "rb") as fh:
+                fh.seek(len(store.header))
+                base = out.tell() - len(store.header)
+                while True:
+                    buf = fh.read(1 << 20)
+                    if not buf:
+                        break
+                    out.write(buf)
+            index = np.array(store.index)
+            index["offset"] += base
+            parts.append(index)
+
+    users = [u.decode("utf-8") for part in parts for u in part["user_uuid"]]
+    merged = [np.concatenate([p[field] for p in parts]) if parts else [] for field in ("offset", "length", "rows")]
+    _save_index(dest_dir, _build_index(users, *merged))
+
+
+def export_per_user_files(store_dir: str, out_dir: str, suffix: str = "", workers: int = 8) -> int:
+    store = UserStore(store_dir)
+    os.makedirs(out_dir, exist_ok=True)
+
+    def _export(i: int) -> None:
+        entry = store.index[i]
+        uid = entry["user_uuid"].decode("utf-8")
+        with open(store.data_path, "rb") as src:
+            src.seek(int(entry["offset"]))
+            body = src.read(int(entry["length"]))
+        with open(os.path.join(out_dir, safe_user_filename(uid, suffix)), "wb") as dst:
+            dst.write(store.header)
+            dst.write(body)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(_export, range(len(store))))
+    return len(store)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Export the legacy per-user CSV files from a per-user store."
+    )
+    parser.add_argument("store_dir", help="Store folder, e.g. pipeline_deduplication/per_user_store.")
+    parser.add_argument("out_dir", help="Folder to write user_<uuid><suffix>.csv files into.")
+    parser.add_argument("--suffix", default="", help="File name suffix, e.g. _timeline.")
+    parser.add_argument("--workers", type=int, default=8, help="Parallel writer threads (default: %(default)s).")
+    args = parser.parse_args()
+
+    export_per_user_files(args.store_dir, args.out_dir, args.suffix, args.workers)
+
+
+if __name__ == "__main__":
+    main()
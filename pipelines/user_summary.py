@@ -0,0 +1,373 @@
+import pandas as pd
+import numpy as np
+import json
+from typing import Dict, Iterable, Iterator, NamedTuple, Optional, Tuple
+
+from pipelines.encoding import encode_column, encode_events
+from pipelines.storage import DEFAULT_OUTPUT_FORMAT, TableWriter, find_table, update_user_partitions
+from pipelines.timestamps import format_event_timestamps, local_ns, parse_event_time_series
+
+USER_SUMMARY_TABLE = "user_summary"
+SESSIONS_TABLE = "sessions"
+APPLICATION_CATEGORY = "application"
+SESSION_GAP_MINUTES = 30
+USER_SUMMARY_COLUMNS = [
+    "user_uuid",
+    "total_events",
+    "application_events",
+    "unique_event_types",
+    "first_event",
+    "last_event",
+    "span_days",
+    "session_count",
+    "event_counts",
+]
+SESSIONS_COLUMNS = ["user_uuid", "session_id", "session_start", "session_end", "event_count"]
+
+_NS_PER_SECOND = 1_000_000_000
+_NS_PER_DAY = 86_400 * _NS_PER_SECOND
+
+
+def application_mask(df: pd.DataFrame) -> np.ndarray:
+    category = df["category"]
+    if isinstance(category.dtype, pd.CategoricalDtype):
+        matches = np.asarray(category.cat.categories.str.lower() == APPLICATION_CATEGORY)
+        codes = category.cat.codes.to_numpy()
+        return (codes >= 0) & matches[np.maximum(codes, 0)]
+    return (category.str.lower() == APPLICATION_CATEGORY).to_numpy(dtype=bool)
+
+
+def application_rows(df: pd.DataFrame) -> pd.DataFrame:
+    if "category" not in df.columns:
+        return df
+    return df[application_mask(df)]
+
+
+def session_starts(
+    local: np.ndarray,
+    group_starts: np.ndarray,
+    gap_minutes: float = SESSION_GAP_MINUTES,
+    valid: Optional[np.ndarray] = None
+) -> np.ndarray:
+    seconds = local // _NS_PER_SECOND
+    days = local // _NS_PER_DAY
+    split = (days[1:] != days[:-1]) | ((seconds[1:] - seconds[:-1]) / 60 > gap_minutes)
+    if valid is not None:
+        split &= valid[1:] & valid[:-1]
+    starts = group_starts.copy()
+    starts[1:] |= split
+    return starts
+
+
+def session_numbers(starts: np.ndarray, group_starts: np.ndarray) -> np.ndarray:
+    sessions = np.cumsum(starts)
+    group_first = np.maximum.accumulate(np.where(group_starts, np.arange(len(starts)), 0))
+    return sessions - sessions[group_first] + 1
+
+
+def _bounds(starts: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    first = np.flatnonzero(starts)
+    last = np.r_[first[1:], len(starts)][:len(first)] - 1
+    return first, last
+
+
+class _ApplicationTimeline(NamedTuple):
+    users: pd.Index
+    codes: np.ndarray
+    order: np.ndarray
+    event_time: pd.Series
+    local: np.ndarray
+    valid: np.ndarray
+    user_starts: np.ndarray
+
+
+def _application_timeline(events: pd.DataFrame, codes: np.ndarray, users: pd.Index) -> _ApplicationTimeline:
+    app = application_mask(events) & (codes >= 0)
+    event_time = events["event_time"][app]
+    local = local_ns(event_time)
+    valid = event_time.notna().to_numpy()
+    app_codes = codes[app]
+    order = np.lexsort((np.where(valid, local, np.iinfo(np.int64).max), app_codes))
+    app_codes = app_codes[order]
+    user_starts = np.r_[True, app_codes[1:] != app_codes[:-1]] if len(app_codes) else np.zeros(0, dtype=bool)
+    return _ApplicationTimeline(
+        users,
+        app_codes,
+        np.flatnonzero(app)[order],
+        event_time.iloc[order],
+        local[order],
+        valid[order],
+        user_starts
+    )
+
+
+def aggregate_users(events: pd.DataFrame) -> pd.DataFrame:
+    users = encode_column(events["user_uuid"])
+    codes = users.cat.codes.to_numpy()
+    n_users = len(users.cat.categories)
+    total_events = np.bincount(codes[codes >= 0], minlength=n_users)
+
+    timeline = _application_timeline(events, codes, users.cat.categories)
+    app_codes = timeline.codes
+    event_time = timeline.event_time
+    first, last = _bounds(timeline.user_starts)
+    app_users = app_codes[first]
+
+    first_event = pd.Series(pd.NaT, index=range(n_users), dtype=event_time.dtype)
+    last_event = first_event.copy()
+    first_event.iloc[app_users] = event_time.iloc[first].array
+    last_event.iloc[app_users] = event_time.iloc[last].array
+
+    names = events["event_name"].astype(str).to_numpy(dtype=object)[timeline.order]
+    pairs = pd.DataFrame({"user": app_codes, "name": names})
+    counts = pairs.groupby(["user", "name"], sort=True).size()
+    histograms = [dict() for _ in range(n_users)]
+    for (user, name), count in counts.items():
+        histograms[user][name] = int(count)
+
+    keep = total_events > 0
+    return pd.DataFrame({
+        "user_uuid": users.cat.categories[keep],
+        "total_events": total_events[keep],
+        "application_events": np.bincount(app_codes, minlength=n_users)[keep],
+        "first_event": first_event[keep].array,
+        "last_event": last_event[keep].array,
+        "session_count": np.bincount(
+            app_codes[session_starts(timeline.local, timeline.user_starts, valid=timeline.valid)],
+            minlength=n_users
+        )[keep],
+        "event_counts": np.asarray(histograms, dtype=object)[keep],
+    })
+
+
+def finalize_user_summary(users: pd.DataFrame) -> pd.DataFrame:
+    first_day = local_ns(users["first_event"]) // _NS_PER_DAY
+    last_day = local_ns(users["last_event"]) // _NS_PER_DAY
+    has_events = users["application_events"].to_numpy() > 0
+    return encode_events(pd.DataFrame({
+        "user_uuid": users["user_uuid"].astype(str).to_numpy(),
+        "total_events": users["total_events"].to_numpy(),
+        "application_events": users["application_events"].to_numpy(),
+        "unique_event_types": [len(counts) for counts in users["event_counts"]],
+        "first_event": pd.array(format_event_timestamps(users["first_event"]), dtype="str"),
+        "last_event": pd.array(format_event_timestamps(users["last_event"]), dtype="str"),
+        "span_days": np.where(has_events, last_day - first_day + 1, 0),
+        "session_count": users["session_count"].to_numpy(),
+        "event_counts": [
+            json.dumps(dict(sorted(counts.items(), key=lambda item: (-item[1], item[0]))))
+            for counts in users["event_counts"]
+        ],
+    }))
+
+
+def summarize_users(events: pd.DataFrame) -> pd.DataFrame:
+    return finalize_user_summary(aggregate_users(events))
+
+
+def aggregate_sessions(events: pd.DataFrame, gap_minutes: float = SESSION_GAP_MINUTES) -> pd.DataFrame:
+    users = encode_column(events["user_uuid"])
+    timeline = _application_timeline(events, users.cat.codes.to_numpy(), users.cat.categories)
+    starts = session_starts(timeline.local, timeline.user_starts, gap_minutes, timeline.valid)
+    first, last = _bounds(starts)
+    return pd.DataFrame({
+        "user_uuid": np.asarray(timeline.users, dtype=object)[timeline.codes[first]],
+        "session_id": session_numbers(starts, timeline.user_starts)[first],
+        "session_start": timeline.event_time.iloc[first].array,
+        "session_end": timeline.event_time.iloc[last].array,
+        "event_count": last - first + 1,
+    })
+
+
+def finalize_sessions(sessions: pd.DataFrame) -> pd.DataFrame:
+    return encode_events(pd.DataFrame({
+        "user_uuid": sessions["user_uuid"].astype(str).to_numpy(),
+        "session_id": sessions["session_id"].to_numpy(dtype=np.int64),
+        "session_start": pd.array(format_event_timestamps(sessions["session_start"]), dtype="str"),
+        "session_end": pd.array(format_event_timestamps(sessions["session_end"]), dtype="str"),
+        "event_count": sessions["event_count"].to_numpy(dtype=np.int64),
+    }))
+
+
+def summarize_sessions(events: pd.DataFrame, gap_minutes: float = SESSION_GAP_MINUTES) -> pd.DataFrame:
+    return finalize_sessions(aggregate_sessions(events, gap_minutes))
+
+
+def read_event_counts(summary_row: pd.Series) -> Dict[str, int]:
+    return json.loads(summary_row["event_counts"])
+
+
+def _parse_user_summary(summary: pd.DataFrame, tz) -> pd.DataFrame:
+    parsed = {}
+    for col in ["first_event", "last_event"]:
+        parsed[col] = parse_event_time_series(summary[col].astype(object))
+        if parsed[col].dt.tz is not None and tz is not None:
+            parsed[col] = parsed[col].dt.tz_convert(tz)
+    return pd.DataFrame({
+        "user_uuid": summary["user_uuid"].astype(str).to_numpy(),
+        "total_events": summary["total_events"].to_numpy(),
+        "application_events": summary["application_events"].to_numpy(),
+        "first_event": parsed["first_event"].array,
+        "last_event": parsed["last_event"].array,
+        "session_count": summary["session_count"].to_numpy(),
+        "event_counts": [json.loads(counts) for counts in summary["event_counts"]],
+    })
+
+
+def _continues_sessions(previous_last: pd.Series, fresh_first: pd.Series) -> np.ndarray:
+    previous_last = previous_last.reset_index(drop=True)
+    fresh_first = fresh_first.reset_index(drop=True)
+    ordered = (previous_last.notna() & fresh_first.notna() & (fresh_first >= previous_last)).to_numpy()
+    before = local_ns(previous_last)
+    after = local_ns(fresh_first)
+    same_day = before // _NS_PER_DAY == after // _NS_PER_DAY
+    gap = (after // _NS_PER_SECOND - before // _NS_PER_SECOND) / 60
+    return ordered & same_day & (gap <= SESSION_GAP_MINUTES)
+
+
+def merge_user_summaries(previous: pd.DataFrame, fresh: pd.DataFrame) -> pd.DataFrame:
+    fresh = fresh.reset_index(drop=True)
+    rows = pd.Index(previous["user_uuid"]).get_indexer(fresh["user_uuid"])
+    matched = rows >= 0
+    if not matched.any():
+        return fresh
+    old = previous.iloc[np.maximum(rows, 0)].reset_index(drop=True)
+
+    counts = list(fresh["event_counts"])
+    for i in np.flatnonzero(matched):
+        merged = dict(old.at[i, "event_counts"])
+        for name, count in counts[i].items():
+            merged[name] = merged.get(name, 0) + count
+        counts[i] = merged
+
+    old_first = old["first_event"].where(matched)
+    old_last = old["last_event"].where(matched)
+    totals = {
+        col: fresh[col].to_numpy() + np.where(matched, old[col].to_numpy(), 0)
+        for col in ["total_events", "application_events", "session_count"]
+    }
+    return pd.DataFrame({
+        "user_uuid": fresh["user_uuid"],
+        "total_events": totals["total_events"],
+        "application_events": totals["application_events"],
+        "first_event": old_first.where(old_first.notna() & ~(fresh["first_event"] < old_first), fresh["first_event"]),
+        "last_event": old_last.where(old_last.notna() & ~(fresh["last_event"] > old_last), fresh["last_event"]),
+        "session_count": totals["session_count"] - _continues_sessions(old_last, fresh["first_event"]),
+        "event_counts": counts,
+    }, columns=fresh.columns)
+
+
+def update_user_summary(base_dir: str, events: pd.DataFrame, output_format: str = DEFAULT_OUTPUT_FORMAT) -> None:
+    if find_table(base_dir, USER_SUMMARY_TABLE) is None:
+        return
+    fresh = aggregate_users(events)
+
+    def update(summary: pd.DataFrame) -> pd.DataFrame:
+        affected = summary["user_uuid"].astype(str).isin(set(fresh["user_uuid"].astype(str))).to_numpy()
+        previous = _parse_user_summary(summary[affected], events["event_time"].dt.tz)
+        updated = finalize_user_summary(merge_user_summaries(previous, fresh))
+        combined = pd.concat([
+            summary[~affected].astype({"user_uuid": str, "event_counts": str}),
+            updated.astype({"user_uuid": str}),
+        ], ignore_index=True)
+        return encode_events(combined.sort_values("user_uuid", kind="mergesort").reset_index(drop=True))
+
+    update_user_partitions(base_dir, USER_SUMMARY_TABLE, output_format, fresh["user_uuid"], update)
+
+
+def _parse_sessions(sessions: pd.DataFrame, tz) -> pd.DataFrame:
+    parsed = {}
+    for col in ["session_start", "session_end"]:
+        parsed[col] = parse_event_time_series(sessions[col].astype(object))
+        if parsed[col].dt.tz is not None and tz is not None:
+            parsed[col] = parsed[col].dt.tz_convert(tz)
+    return pd.DataFrame({
+        "user_uuid": sessions["user_uuid"].astype(str).to_numpy(),
+        "session_id": sessions["session_id"].to_numpy(),
+        "session_start": parsed["session_start"].array,
+        "session_end": parsed["session_end"].array,
+        "event_count": sessions["event_count"].to_numpy(),
+    })
+
+
+def merge_sessions(previous: pd.DataFrame, fresh: pd.DataFrame) -> pd.DataFrame:
+    previous = previous.reset_index(drop=True)
+    fresh = fresh.reset_index(drop=True)
+    last = previous.groupby("user_uuid", sort=False).tail(1)
+    offset = fresh["user_uuid"].map(previous.groupby("user_uuid")["session_id"].max()).fillna(0).astype(np.int64)
+
+    first = np.flatnonzero(fresh["session_id"].to_numpy() == 1)
+    rows = pd.Index(last["user_uuid"]).get_indexer(fresh["user_uuid"].iloc[first])
+    first, rows = first[rows >= 0], last.index.to_numpy()[rows[rows >= 0]]
+    joined = _continues_sessions(previous["session_end"].iloc[rows], fresh["session_start"].iloc[first])
+    first, rows = first[joined], rows[joined]
+    previous.loc[rows, "session_end"] = fresh["session_end"].iloc[first].array
+    previous.loc[rows, "event_count"] = previous["event_count"].to_numpy()[rows] + fresh["event_count"].to_numpy()[first]
+    offset -= fresh["user_uuid"].isin(fresh["user_uuid"].iloc[first]).to_numpy()
+
+    fresh = fresh.assign(session_id=fresh["session_id"] + offset).drop(index=first)
+    return pd.concat([previous, fresh], ignore_index=True)
+
+
+def update_sessions(base_dir: str, events: pd.DataFrame, output_format: str = DEFAULT_OUTPUT_FORMAT) -> None:
+    if find_table(base_dir, SESSIONS_TABLE) is None:
+        return
+    fresh = aggregate_sessions(events)
+
+    def update(sessions: pd.DataFrame) -> pd.DataFrame:
+        affected = sessions["user_uuid"].astype(str).isin(set(fresh["user_uuid"].astype(str))).to_numpy()
+        previous = _parse_sessions(sessions[affected], events["event_time"].dt.tz)
+        updated = finalize_sessions(merge_sessions(previous, fresh))
+        combined = pd.concat([
+            sessions[~affected].astype({"user_uuid": str}),
+            updated.astype({"user_uuid": str}),
+        ], ignore_index=True)
+        combined = combined.sort_values(["user_uuid", "session_id"], kind="mergesort").reset_index(drop=True)
+        return encode_events(combined)
+
+    update_user_partitions(base_dir, SESSIONS_TABLE, output_format, fresh["user_uuid"], update)
+
+
+class UserSummaryWriter:
+    def __init__(self, base_dir: str, output_format: str = DEFAULT_OUTPUT_FORMAT):
+        self._writer = TableWriter(base_dir, USER_SUMMARY_TABLE, output_format)
+        self._sessions_writer = TableWriter(base_dir, SESSIONS_TABLE, output_format)
+        self._carry: Optional[pd.DataFrame] = None
+        self._wrote = False
+
+    def write(self, events: pd.DataFrame) -> None:
+        if events.empty:
+            return
+        if self._carry is not None:
+            events = pd.concat([self._carry, events], ignore_index=True)
+        users = events["user_uuid"].astype(str).to_numpy()
+        tail = np.flatnonzero(users != users[-1])
+        done = tail[-1] + 1 if len(tail) else 0
+        self._carry = events.iloc[done:]
+        if done:
+            self._write(events.iloc[:done])
+
+    def _write(self, events: pd.DataFrame) -> None:
+        self._writer.write(summarize_users(events))
+        self._sessions_writer.write(summarize_sessions(events))
+        self._wrote = True
+
+    def tee(self, batches: Iterable[pd.DataFrame]) -> Iterator[pd.DataFrame]:
+        for events in batches:
+            self.write(events)
+            yield events
+
+    def close(self) -> None:
+        if self._carry is not None:
+            self._write(self._carry)
+            self._carry = None
+        elif not self._wrote:
+            self._writer.write(pd.DataFrame(columns=USER_SUMMARY_COLUMNS))
+            self._sessions_writer.write(pd.DataFrame(columns=SESSIONS_COLUMNS))
+        self._writer.close()
+        self._sessions_writer.close()
+
+    def __enter__(self) -> "UserSummaryWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
@@ -0,0 +1,20 @@
+import pytest
+
+from benchmarks.diff_backends import run_backend
+from benchmarks.generate_events import EventLogGenerator
+from pipelines.backends import DEFAULT_BACKEND
+
+# Above the 10k-row minimum chunk, so --streaming sorts the log into several runs.
+ROWS = 30_000
+
+
+@pytest.fixture(scope="session")
+def event_log(tmp_path_factory) -> str:
+    path = str(tmp_path_factory.mktemp("input") / "events.csv")
+    EventLogGenerator(users=300, days=3, seed=7).write_csv(path, ROWS)
+    return path
+
+
+@pytest.fixture(scope="session")
+def in_memory_outputs(event_log, tmp_path_factory) -> str:
+    return run_backend(DEFAULT_BACKEND, event_log, str(tmp_path_factory.mktemp("runs") / "in_memory"), [])
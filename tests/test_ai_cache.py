@@ -0,0 +1,117 @@
+from typing import Optional
+
+import pytest
+
+from insights.ai_cache import AiCache, cache_key
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock() -> Clock:
+    return Clock()
+
+
+@pytest.fixture
+def cache(tmp_path, clock) -> AiCache:
+    return AiCache(str(tmp_path / "responses.sqlite3"), max_bytes=2**20, ttl_seconds=3600, clock=clock)
+
+
+def _fetch(calls: list, content: str = "answer", success: bool = True):
+    def fetch():
+        calls.append(content)
+        if not success:
+            return {"success": False, "error": "down"}
+        return {"success": True, "content": content, "provider": "fake"}
+    return fetch
+
+
+def _stream(calls: list, chunks: list, fail_after: Optional[int] = None):
+    def fetch():
+        calls.append(chunks)
+        for i, chunk in enumerate(chunks):
+            if i == fail_after:
+                yield {"success": False, "error": "dropped"}
+                return
+            yield {"success": True, "chunk": chunk, "provider": "fake"}
+    return fetch
+
+
+def test_cache_key_separates_fields():
+    assert cache_key("ab", "c", "m") != cache_key("a", "bc", "m")
+    assert cache_key("t", "p", "m") == cache_key("t", "p", "m")
+
+
+def test_response_is_served_from_cache(cache):
+    calls = []
+    first = cache.response("k", _fetch(calls))
+    second = cache.response("k", _fetch(calls))
+    assert first == {"success": True, "content": "answer", "provider": "fake"}
+    assert second == {"success": True, "content": "answer", "provider": "cache:fake", "cached": True}
+    assert len(calls) == 1
+
+
+def test_failures_are_not_cached(cache):
+    calls = []
+    assert not cache.response("k", _fetch(calls, success=False))["success"]
+    assert cache.response("k", _fetch(calls))["provider"] == "fake"
+    assert len(calls) == 2
+
+
+def test_entries_expire_after_ttl(cache, clock):
+    calls = []
+    cache.response("k", _fetch(calls))
+    clock.now += 3600
+    assert cache.get("k") is not None
+    clock.now += 1
+    assert cache.get("k") is None
+    assert len(cache) == 0
+    cache.response("k", _fetch(calls))
+    assert len(calls) == 2
+
+
+def test_eviction_drops_least_recently_used(tmp_path, clock):
+    entry = len("k0") + 400
+    cache = AiCache(str(tmp_path / "small.sqlite3"), max_bytes=3 * entry, clock=clock)
+    for i in range(3):
+        clock.now += 1
+        cache.put(f"k{i}", "x" * 400)
+    clock.now += 1
+    assert cache.get("k0") is not None
+    clock.now += 1
+    cache.put("k3", "x" * 400)
+    assert cache.size <= cache.max_bytes
+    assert [k for k in ["k0", "k1", "k2", "k3"] if cache.get(k) is not None] == ["k0", "k2", "k3"]
+
+
+def test_oversized_entries_are_skipped(tmp_path, clock):
+    cache = AiCache(str(tmp_path / "small.sqlite3"), max_bytes=100, clock=clock)
+    cache.put("k", "x" * 200)
+    assert len(cache) == 0
+
+
+def test_stream_replays_the_same_chunks(cache):
+    calls = []
+    chunks = ["Hello", ", ", "world"]
+    fresh = list(cache.stream("k", _stream(calls, chunks)))
+    replayed = list(cache.stream("k", _stream(calls, chunks)))
+    assert [c["chunk"] for c in fresh] == chunks
+    assert [c["chunk"] for c in replayed] == chunks
+    assert all(c["cached"] and c["provider"] == "cache:fake" for c in replayed)
+    assert len(calls) == 1
+    assert cache.response("k", _fetch(calls))["content"] == "Hello, world"
+
+
+def test_interrupted_stream_is_not_cached(cache):
+    calls = []
+    chunks = ["Hello", ", ", "world"]
+    assert [c["success"] for c in cache.stream("k", _stream(calls, chunks, fail_after=2))] == [True, True, False]
+    assert cache.get("k") is None
+    list(cache.stream("k", _stream(calls, chunks)))
+    assert len(calls) == 2
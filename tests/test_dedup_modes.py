@@ -0,0 +1,89 @@
+import pandas as pd
+import numpy as np
+import filecmp
+import os
+import subprocess
+import sys
+
+import pytest
+
+from benchmarks.diff_backends import OUTPUT_DIR, REPO_DIR, compare_outputs, run_backend
+from benchmarks.diff_offsets import write_split_offsets_log
+from pipelines.backends import DEFAULT_BACKEND
+from pipelines.timestamps import parse_event_times
+
+
+def test_duckdb_backend_matches_default(event_log, in_memory_outputs, tmp_path):
+    pytest.importorskip("duckdb")
+    actual = run_backend("duckdb", event_log, str(tmp_path / "duckdb"), ["--memory-budget", "64MB"])
+    assert compare_outputs(in_memory_outputs, actual) == []
+
+
+def test_streaming_matches_in_memory(event_log, in_memory_outputs, tmp_path):
+    actual = run_backend(DEFAULT_BACKEND, event_log, str(tmp_path / "streaming"), ["--streaming", "--memory-budget", "1KB"])
+    assert compare_outputs(in_memory_outputs, actual) == []
+
+
+@pytest.mark.parametrize("workers", [2, 3])
+def test_workers_match_in_memory(event_log, in_memory_outputs, tmp_path, workers):
+    actual = run_backend(DEFAULT_BACKEND, event_log, str(tmp_path / "workers"), ["--workers", str(workers)])
+    assert compare_outputs(in_memory_outputs, actual) == []
+
+
+@pytest.fixture(scope="module")
+def split_offsets_run(tmp_path_factory):
+    tmp = tmp_path_factory.mktemp("split_offsets")
+    input_file = str(tmp / "events.csv")
+    write_split_offsets_log(input_file, 30_000, ["+05:30", "-03:00"], seed=7)
+    return input_file, run_backend(DEFAULT_BACKEND, input_file, str(tmp / "in_memory"), [])
+
+
+@pytest.mark.parametrize("mode", [["--streaming", "--memory-budget", "1KB"], ["--workers", "2"]])
+def test_split_offsets_match_in_memory(split_offsets_run, tmp_path, mode):
+    # Users are grouped by offset, so single chunks and shards only see one of them.
+    input_file, expected = split_offsets_run
+    actual = run_backend(DEFAULT_BACKEND, input_file, str(tmp_path / "run"), mode)
+    assert compare_outputs(expected, actual) == []
+
+
+def _rows(path: str) -> pd.DataFrame:
+    df = (pd.read_parquet(path) if path.endswith(".parquet") else pd.read_csv(path)).astype(str)
+    df = df[sorted(df.columns)]
+    return df.sort_values(list(df.columns)).reset_index(drop=True)
+
+
+@pytest.mark.parametrize("output_format", ["csv", "parquet"])
+def test_incremental_matches_in_memory(event_log, tmp_path, output_format):
+    events = pd.read_csv(event_log)
+    utc_ns = parse_event_times(events["event_time"]).utc_ns
+    cutoff = np.median(utc_ns)
+    drops = [str(tmp_path / "history.csv"), str(tmp_path / "drop.csv")]
+    events[utc_ns < cutoff].to_csv(drops[0], index=False)
+    events[utc_ns >= cutoff].to_csv(drops[1], index=False)
+
+    args = ["--format", output_format]
+    expected = run_backend(DEFAULT_BACKEND, event_log, str(tmp_path / "full"), args)
+    run_dir = str(tmp_path / "incremental")
+    os.makedirs(run_dir)
+    for drop in drops:
+        subprocess.run(
+            [sys.executable, os.path.join(REPO_DIR, "pipeline_deduplication.py"), "--input", drop, "--incremental"] + args,
+            cwd=run_dir,
+            check=True
+        )
+    actual = os.path.join(run_dir, OUTPUT_DIR)
+
+    tables = sorted(name for name in os.listdir(expected) if name.endswith("." + output_format))
+    assert tables == sorted(name for name in os.listdir(actual) if name.endswith("." + output_format))
+    for name in tables:
+        if output_format == "csv":
+            assert os.path.isfile(os.path.join(actual, name))
+        pd.testing.assert_frame_equal(_rows(os.path.join(expected, name)), _rows(os.path.join(actual, name)), obj=name)
+
+    per_user = os.path.join(expected, "per_user_cleaned_events")
+    if os.path.isdir(per_user):
+        names = os.listdir(per_user)
+        _, mismatched, errors = filecmp.cmpfiles(
+            per_user, os.path.join(actual, "per_user_cleaned_events"), names, shallow=False
+        )
+        assert mismatched == [] and errors == []
@@ -0,0 +1,96 @@
+import pandas as pd
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+from insights.payload_builder import build_ai_payload, compact_payload, payload_to_json, payload_to_prompt
+from pipelines.timestamps import parse_event_time_series
+
+EVENTS = [
+    ("2026-01-02 09:00:00.120000 +05:30", "App Opened", "application"),
+    ("2026-01-02 09:00:05.000000 +05:30", "Search", "application"),
+    ("2026-01-02 09:00:07.000000 +05:30", "Search", "application"),
+    ("2026-01-02 09:00:09.000000 +05:30", "Search", "application"),
+    ("2026-01-02 09:02:00.000000 +05:30", "Ticket Booked", "application"),
+    ("2026-01-02 11:30:00.000000 +05:30", "App Opened", "application"),
+    ("2026-01-02 11:30:01.000000 +05:30", "Push Received", "system"),
+    ("2026-01-03 00:10:00.000000 +05:30", "App Opened", "application"),
+]
+
+
+def _user_df(rows: List[Tuple[str, str, str]]) -> pd.DataFrame:
+    df = pd.DataFrame(rows, columns=["event_time", "event_name", "category"])
+    df["event_time"] = parse_event_time_series(df["event_time"])
+    return df.iloc[::-1].reset_index(drop=True)
+
+
+def _repetitions() -> pd.DataFrame:
+    return pd.DataFrame({"event_name": ["Search", "App Opened"], "frequency": [3, 3], "repetitions_removed": [4, 0]})
+
+
+def _expand(compact: Dict[str, Any]) -> List[Tuple[str, Optional[str], str, str]]:
+    names, categories = compact["event_names"], compact["categories"]
+    events = []
+    for day in compact["days"]:
+        for session in day["sessions"]:
+            h, m, s = (int(x) for x in session["start"].split(":"))
+            for run in session["events"]:
+                seconds = h * 3600 + m * 60 + s + run[1]
+                clock = f"{seconds // 3600:02d}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+                count = run[2] if len(run) > 2 else 1
+                category = categories[run[3]] if len(run) > 3 else categories[0]
+                events.append((day["date"], clock, names[run[0]], category))
+                events.extend([(day["date"], None, names[run[0]], category)] * (count - 1))
+    return events
+
+
+def test_compact_payload_round_trips_events():
+    payload = build_ai_payload(_user_df(EVENTS), _repetitions(), "user-1")
+    compact = compact_payload(payload)
+    expanded = _expand(compact)
+    verbose = payload["events_ordered"]
+    assert len(expanded) == len(verbose) == len(EVENTS)
+    for (date, clock, name, category), event in zip(expanded, verbose):
+        assert (date, name, category) == (event["event_date"], event["event_name"], event["category"])
+        assert clock in (None, event["event_time"][:8])
+
+    first_day = compact["days"][0]
+    assert [(s["start"], s["end"]) for s in first_day["sessions"]] == [("09:00:00", "09:02:00"), ("11:30:00", "11:30:01")]
+    assert [d["date"] for d in compact["days"]] == ["2026-01-02", "2026-01-03"]
+
+
+def test_compact_repetition_summary_round_trips():
+    payload = build_ai_payload(_user_df(EVENTS), _repetitions(), "user-1")
+    compact = compact_payload(payload)
+    summary = compact["repetition_summary"]
+    names = compact["event_names"]
+    assert [
+        {"event_name": names[i], "frequency": f, "repetitions_removed": r} for i, f, r in summary["repeated_events"]
+    ] == payload["repetition_summary"]["repeated_events"]
+    assert {k: v for k, v in summary.items() if k != "repeated_events"} == {
+        k: v for k, v in payload["repetition_summary"].items() if k != "repeated_events"
+    }
+
+
+def test_single_category_drops_category_and_unit_counts():
+    rows = [row for row in EVENTS if row[2] == "application"]
+    compact = build_ai_payload(_user_df(rows), _repetitions(), "user-1", payload_format="compact")
+    assert compact["categories"] == ["application"]
+    runs = [run for day in compact["days"] for s in day["sessions"] for run in s["events"]]
+    assert runs[:3] == [[0, 0], [1, 5, 3], [2, 120]]
+    assert len(_expand(compact)) == len(rows)
+
+
+def test_compact_json_and_prompt():
+    payload = build_ai_payload(_user_df(EVENTS), _repetitions(), "user-1")
+    compact = compact_payload(payload)
+    assert compact_payload(compact) is compact
+    assert json.loads(payload_to_json(compact)) == compact
+    assert payload_to_prompt(payload, "compact").endswith(payload_to_json(compact))
+    assert payload_to_prompt(payload) == payload_to_json(payload)
+
+
+def test_empty_user():
+    empty = _user_df([]).astype({"event_time": "datetime64[ns, UTC]"})
+    compact = build_ai_payload(empty, pd.DataFrame(), "user-1", payload_format="compact")
+    assert compact["days"] == [] and compact["event_names"] == []
+    assert compact["repetition_summary"]["total_events"] == 0
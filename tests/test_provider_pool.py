@@ -0,0 +1,127 @@
+from typing import Iterator, List
+
+from insights.provider_pool import CircuitBreaker, Provider, ProviderPool
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class StatusError(RuntimeError):
+    def __init__(self, status_code: int):
+        super().__init__(f"status {status_code}")
+        self.status_code = status_code
+
+
+class ScriptedProvider(Provider):
+    def __init__(self, name: str, outcomes: List[int]):
+        self.name = name
+        self.outcomes = list(outcomes)
+        self.calls = 0
+
+    def complete(self, prompt: str) -> str:
+        self.calls += 1
+        status = self.outcomes.pop(0) if self.outcomes else 200
+        if status != 200:
+            raise StatusError(status)
+        return f"{self.name}: {prompt}"
+
+    def stream(self, prompt: str) -> Iterator[str]:
+        text = self.complete(prompt)
+        yield text[:3]
+        yield text[3:]
+
+
+def test_breaker_opens_probes_and_closes():
+    clock = Clock()
+    breaker = CircuitBreaker(failure_threshold=2, base_delay=10, max_delay=100, clock=clock)
+    assert breaker.acquire() == "closed"
+    breaker.record_failure()
+    assert breaker.state == "closed"
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert breaker.acquire() is None
+    assert breaker.retry_in() == 10
+
+    clock.now = 10
+    assert breaker.acquire() == "probe"
+    assert breaker.state == "half_open"
+    assert breaker.acquire() is None, "only one probe at a time"
+    breaker.record_success()
+    assert breaker.state == "closed"
+    assert breaker.acquire() == "closed"
+
+
+def test_failed_probe_reopens_with_backoff():
+    clock = Clock()
+    breaker = CircuitBreaker(failure_threshold=1, base_delay=10, max_delay=25, clock=clock)
+    breaker.record_failure()
+    clock.now = 10
+    assert breaker.acquire() == "probe"
+    breaker.record_failure()
+    assert breaker.state == "open" and breaker.retry_in() == 20
+    clock.now = 30
+    assert breaker.acquire() == "probe"
+    breaker.record_failure()
+    assert breaker.retry_in() == 25
+
+
+def test_released_probe_can_be_retried():
+    clock = Clock()
+    breaker = CircuitBreaker(failure_threshold=1, base_delay=10, clock=clock)
+    breaker.record_failure()
+    clock.now = 10
+    assert breaker.acquire() == "probe"
+    breaker.release()
+    assert breaker.acquire() == "probe"
+
+
+def _pool(providers: List[ScriptedProvider], clock: Clock) -> ProviderPool:
+    breakers = {p.name: CircuitBreaker(failure_threshold=2, base_delay=10, clock=clock) for p in providers}
+    return ProviderPool(providers, breakers=breakers)
+
+
+def test_pool_skips_open_circuit_and_probes_after_delay():
+    clock = Clock()
+    flaky = ScriptedProvider("flaky", [503, 503])
+    backup = ScriptedProvider("backup", [])
+    pool = _pool([flaky, backup], clock)
+
+    for _ in range(2):
+        assert pool.response("hi")["provider"] == "backup"
+    assert pool.breakers["flaky"].state == "open"
+
+    result = pool.response("hi")
+    assert result["content"] == "backup: hi"
+    assert result["provider"] == "backup [skipped flaky circuit open, retry in 10s]"
+    assert flaky.calls == 2
+
+    clock.now = 10
+    result = pool.response("hi")
+    assert result == {"success": True, "content": "flaky: hi", "provider": "flaky (half-open probe)"}
+    assert pool.breakers["flaky"].state == "closed"
+    assert pool.response("hi")["provider"] == "flaky"
+
+
+def test_key_error_opens_circuit_at_once():
+    clock = Clock()
+    revoked = ScriptedProvider("revoked", [401])
+    backup = ScriptedProvider("backup", [])
+    pool = _pool([revoked, backup], clock)
+    assert [c["chunk"] for c in pool.stream("hi")] == ["bac", "kup: hi"]
+    assert pool.breakers["revoked"].state == "open"
+    pool.response("hi")
+    assert revoked.calls == 1
+
+
+def test_all_circuits_open():
+    clock = Clock()
+    pool = _pool([ScriptedProvider("only", [429])], clock)
+    assert pool.response("hi") == {"success": False, "error": "All providers failed: only: status 429"}
+    result = pool.response("hi")
+    assert not result["success"]
+    assert result["error"] == "All providers unavailable: only circuit open, retry in 10s"
@@ -0,0 +1,41 @@
+import pandas as pd
+import numpy as np
+from datetime import timedelta, timezone
+
+from pipelines.timestamps import combine_parsed, common_timezone, event_timezone, parse_event_times, to_datetime_series
+
+MIXED = pd.Series([
+    "2026-01-02 14:16:14.476000 +05:30",
+    "2026-01-02 14:16:14.476000-03:00",
+    "2026-01-02 08:46:14 +00:00",
+    "2026-01-02 14:16:14+05:45",
+    "2026-01-02T14:16:14.5+05:30",
+    None,
+])
+
+
+def test_mixed_offsets_parse_to_utc():
+    parsed = parse_event_times(MIXED)
+    expected = pd.to_datetime(MIXED, format="ISO8601", utc=True).dt.as_unit("ns")
+    assert parsed.fallback_rows == 1
+    assert parsed.utc_ns[:-1].tolist() == expected[:-1].astype("int64").tolist()
+    assert parsed.offset_minutes[:-1].tolist() == [330, -180, 0, 345, 330]
+
+
+def test_mixed_offsets_convert_to_utc():
+    parsed = parse_event_times(MIXED)
+    assert event_timezone(parsed) == timezone.utc
+    series = to_datetime_series(parsed)
+    assert str(series.dt.tz) == "UTC"
+    assert series.iloc[0] == pd.Timestamp("2026-01-02 08:46:14.476", tz="UTC")
+    assert series.isna().tolist() == [False] * 5 + [True]
+
+
+def test_one_offset_per_chunk_is_not_one_offset_per_run():
+    ist = parse_event_times(MIXED[:1])
+    brt = parse_event_times(MIXED[1:2])
+    assert event_timezone(ist) == timezone(timedelta(hours=5, minutes=30))
+    assert common_timezone([event_timezone(ist), event_timezone(ist)]) == event_timezone(ist)
+    assert common_timezone([event_timezone(ist), event_timezone(brt)]) == timezone.utc
+    assert event_timezone(combine_parsed([ist, brt])) == timezone.utc
+    assert np.array_equal(combine_parsed([ist, brt]).utc_ns, parse_event_times(MIXED[:2]).utc_ns)